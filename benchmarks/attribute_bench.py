@@ -0,0 +1,58 @@
+'''
+    有很多动态属性的标签的渲染时间
+    每个动态属性是一次attribute调用, 包括转义和引号
+    常量属性在编译期就转换成了静态文本
+'''
+import time
+
+import hbml
+
+ROWS = 1000
+
+TEMPLATE = (
+    "- for item in items:\n"
+    "  %a(href = item['href'], title = item['title'], "
+    "data-id = item['id'], class = item['class'], rel = \"nofollow\") x\n"
+)
+
+CASES = [
+    ('plain strings', lambda i: {
+        'href': '/item/%d' % i, 'title': 'item %d' % i, 'id': str(i), 'class': 'row',
+    }),
+    ('need escaping', lambda i: {
+        'href': '/item?a=%d&b=2' % i, 'title': '"item" <%d>' % i, 'id': str(i),
+        'class': 'row',
+    }),
+    ('mixed types', lambda i: {
+        'href': '/item/%d' % i, 'title': None if i % 2 else 'item', 'id': i,
+        'class': ['row', 'odd' if i % 2 else None],
+    }),
+]
+
+
+def _best(function, repeat, number):
+    best = None
+    for i in range(repeat):
+        start = time.perf_counter()
+        for j in range(number):
+            function()
+        elapsed = (time.perf_counter() - start) / number
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main():
+    template = hbml.compile_template(TEMPLATE)
+
+    print('%-16s %10s %10s' % ('case', 'render ms', 'ns/attr'))
+    for name, factory in CASES:
+        items = [factory(i) for i in range(ROWS)]
+
+        elapsed = _best(lambda: template.render(dict(items=items)), 5, 20)
+        print('%-16s %10.3f %10.1f' % (
+            name, elapsed * 1e3, elapsed * 1e9 / (ROWS * 4)
+        ))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,54 @@
+'''
+    批量编译大量小模板, 例如每个语言一个的邮件模板
+    统计每个模板的编译时间和编译后常驻的内存
+'''
+import gc
+import time
+import tracemalloc
+
+import hbml
+
+COUNT = 10000
+
+
+def _sources():
+    return [
+        '%%p(class="greeting") hello %d\n  = name\n' % i
+        for i in range(COUNT)
+    ]
+
+
+def main():
+    sources = _sources()
+    env = hbml.Environment()
+
+    # 第一次编译会创建yacc分析表, 不计入
+    env.compile_template('%p')
+
+    gc.collect()
+    start = time.perf_counter()
+    templates = [
+        env.compile_template(source, name='mail/%d.hbml' % i)
+        for i, source in enumerate(sources)
+    ]
+    elapsed = time.perf_counter() - start
+    del templates
+
+    gc.collect()
+    tracemalloc.start()
+    templates = [
+        env.compile_template(source, name='mail/%d.hbml' % i)
+        for i, source in enumerate(sources)
+    ]
+    gc.collect()
+    retained = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    print('%d templates: %.1f us/compile, %.0f bytes retained per template' % (
+        COUNT, elapsed / COUNT * 1e6, retained / COUNT
+    ))
+    print(templates[-1].render(dict(name='world')))
+
+
+if __name__ == '__main__':
+    main()
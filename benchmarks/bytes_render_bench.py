@@ -0,0 +1,54 @@
+'''
+    对比两种得到bytes输出的方式:
+    渲染成str再整体encode, 和直接渲染进复用的bytearray
+'''
+import timeit
+
+import hbml
+from hbml.sinks import BytearrayPool
+
+SOURCE = '''%html(lang="zh")
+  %head
+    %title 性能测试页面
+  %body
+    %h1 hbml - 一个Python写的html模板
+    #container.col
+      - for i in range(200):
+        %div(data-id = i)
+          %span 第
+          = i + 1
+          %span 行
+'''
+
+NUMBER = 200
+
+
+def main():
+    str_template = hbml.compile_template(SOURCE)
+    bytes_template = hbml.compile_template(SOURCE, encoding='utf-8')
+    pool = BytearrayPool()
+
+    assert str_template.render().encode('utf-8') == bytes_template.render()
+
+    def render_then_encode():
+        return str_template.render().encode('utf-8')
+
+    def render_bytes():
+        return bytes_template.render()
+
+    def render_pooled():
+        with pool.sink() as sink:
+            bytes_template.render(None, sink)
+            return len(sink.getbuffer())
+
+    for name, func in [
+        ('str + encode', render_then_encode),
+        ('bytes', render_bytes),
+        ('pooled bytearray', render_pooled),
+    ]:
+        seconds = min(timeit.repeat(func, number=NUMBER, repeat=5))
+        print('%-20s %8.3f ms/render' % (name, seconds * 1000 / NUMBER))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,88 @@
+'''
+    对比直接编译模板和从共享缓存加载模板的时间
+    另外测量一个新进程从缓存加载全部模板(不导入ply)和全部重新编译的总时间
+'''
+import glob
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+import hbml
+from hbml.cache import SharedCodeCache
+
+ROOT = os.path.dirname(os.path.dirname(os.path.realpath(__file__)))
+TEMPLATES = sorted(
+    glob.glob(os.path.join(ROOT, 'tests', 'templates', '*.hbml'))
+)
+
+_PROCESS = '''
+import sys, time
+start = time.perf_counter()
+import hbml
+from hbml.cache import SharedCodeCache
+cache = SharedCodeCache(sys.argv[1]) if sys.argv[1] else None
+for path in sys.argv[2:]:
+    if cache is None:
+        hbml.compile_template_file(path)
+    else:
+        cache.compile_template_file(path)
+print(time.perf_counter() - start)
+'''
+
+
+def _best(function, repeat, number):
+    best = None
+    for i in range(repeat):
+        start = time.perf_counter()
+        for j in range(number):
+            function()
+        elapsed = (time.perf_counter() - start) / number
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def _process_time(directory):
+    env = dict(os.environ, PYTHONPATH=ROOT)
+    best = None
+    for i in range(5):
+        output = subprocess.check_output(
+            [sys.executable, '-c', _PROCESS, directory] + TEMPLATES,
+            env=env, universal_newlines=True
+        )
+        best = float(output) if best is None else min(best, float(output))
+    return best
+
+
+def main():
+    directory = tempfile.mkdtemp()
+    try:
+        with SharedCodeCache(directory) as cache:
+            for path in TEMPLATES:
+                cache.compile_template_file(path)
+
+        print('%-34s %12s %12s' % ('template', 'compile us', 'cache us'))
+        with SharedCodeCache(directory) as cache:
+            for path in TEMPLATES:
+                print('%-34s %12.1f %12.1f' % (
+                    os.path.basename(path),
+                    _best(lambda: hbml.compile_template_file(path), 5, 50)
+                    * 1e6,
+                    _best(lambda: cache.compile_template_file(path), 5, 50)
+                    * 1e6,
+                ))
+
+        print('new process, import + %d templates: compile %.1f ms, '
+              'cache %.1f ms' % (
+                  len(TEMPLATES),
+                  _process_time('') * 1000,
+                  _process_time(directory) * 1000
+              ))
+    finally:
+        shutil.rmtree(directory)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,61 @@
+'''
+    功能开关作为渲染时的变量和作为编译期常量(constants选项)的渲染时间
+    常量的if在编译期就选定了分支, 循环内不再判断
+'''
+import time
+
+import hbml
+
+TEMPLATE = (
+    "%ul\n"
+    "  - for item in items:\n"
+    "    %li\n"
+    "      - if DEBUG:\n"
+    "        %code\n"
+    "          = repr(item)\n"
+    "      - if LOCALE == 'en':\n"
+    "        = item\n"
+    "      - elif LOCALE == 'fr':\n"
+    "        %span.fr\n"
+    "      - else:\n"
+    "        = item\n"
+    "      - if SHOW_BADGE and item % 2:\n"
+    "        %span.badge odd\n"
+)
+
+FLAGS = dict(DEBUG=False, LOCALE='fr', SHOW_BADGE=False)
+
+
+def _best(function, repeat, number):
+    best = None
+    for i in range(repeat):
+        start = time.perf_counter()
+        for j in range(number):
+            function()
+        elapsed = (time.perf_counter() - start) / number
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main():
+    items = list(range(1000))
+
+    variables = hbml.compile_template(TEMPLATE)
+    constants = hbml.compile_template(TEMPLATE, constants=FLAGS)
+
+    assert (
+        variables.render(dict(FLAGS, items=items)) ==
+        constants.render(dict(items=items))
+    )
+
+    print('%-12s %10s' % ('flags', 'render ms'))
+    print('%-12s %10.3f' % ('variables', _best(
+        lambda: variables.render(dict(FLAGS, items=items)), 5, 50
+    ) * 1e3))
+    print('%-12s %10.3f' % ('constants', _best(
+        lambda: constants.render(dict(items=items)), 5, 50
+    ) * 1e3))
+
+
+if __name__ == '__main__':
+    main()
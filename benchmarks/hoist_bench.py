@@ -0,0 +1,57 @@
+'''
+    嵌套循环中反复读取的属性链, 打开和关闭hoist_invariants的渲染时间
+    提出去之后每个循环只在第一次迭代时读取一次
+'''
+import time
+
+import hbml
+
+TEMPLATE = (
+    "%table\n"
+    "  - for row in rows:\n"
+    "    %tr(class=page.theme.row_class)\n"
+    "      - for cell in row:\n"
+    "        %td(title=user.profile.name)\n"
+    "          = page.theme.prefix\n"
+    "          = cell\n"
+    "          = user.profile.name\n"
+)
+
+
+class Namespace(object):
+    def __init__(self, **attributes):
+        self.__dict__.update(attributes)
+
+
+def _best(function, repeat, number):
+    best = None
+    for i in range(repeat):
+        start = time.perf_counter()
+        for j in range(number):
+            function()
+        elapsed = (time.perf_counter() - start) / number
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main():
+    variables = dict(
+        rows=[list(range(20)) for i in range(100)],
+        page=Namespace(theme=Namespace(row_class='row', prefix='#')),
+        user=Namespace(profile=Namespace(name='Tom')),
+    )
+
+    plain = hbml.compile_template(TEMPLATE)
+    hoisted = hbml.compile_template(TEMPLATE, hoist_invariants=True)
+
+    assert plain.render(variables) == hoisted.render(variables)
+
+    print('%-12s %10s' % ('template', 'render ms'))
+    for name, template in [('plain', plain), ('hoisted', hoisted)]:
+        print('%-12s %10.3f' % (name, _best(
+            lambda: template.render(variables), 5, 20
+        ) * 1e3))
+
+
+if __name__ == '__main__':
+    main()
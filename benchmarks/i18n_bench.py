@@ -0,0 +1,76 @@
+'''
+    本地化文本的渲染时间:
+    渲染时用 _() 调用gettext查找, 和按语言编译、译文在编译期替换为静态文本
+    没有本地化的模板作为对照
+'''
+import gettext
+import time
+
+import hbml
+from hbml.i18n import LocalizedTemplate
+
+MESSAGES = ['Home', 'Products', 'About us', 'Contact', 'Sign in', 'Help']
+
+TEMPLATE = (
+    "%ul\n"
+    "  - for item in items:\n"
+    "    %li\n"
+    + ''.join("      %%span\n        = _(%r)\n" % m for m in MESSAGES)
+)
+
+PLAIN_TEMPLATE = (
+    "%ul\n"
+    "  - for item in items:\n"
+    "    %li\n"
+    + ''.join("      %%span %s\n" % m for m in MESSAGES)
+)
+
+
+class Translations(gettext.NullTranslations):
+    def __init__(self, catalog):
+        super().__init__()
+        self.catalog = catalog
+
+    def gettext(self, message):
+        return self.catalog.get(message, message)
+
+
+def _best(function, repeat, number):
+    best = None
+    for i in range(repeat):
+        start = time.perf_counter()
+        for j in range(number):
+            function()
+        elapsed = (time.perf_counter() - start) / number
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main():
+    translations = Translations(dict((m, m.upper()) for m in MESSAGES))
+    items = list(range(500))
+
+    runtime = hbml.compile_template(TEMPLATE)
+    localized = LocalizedTemplate(TEMPLATE, {'de': translations})
+    plain = hbml.compile_template(PLAIN_TEMPLATE)
+
+    assert (
+        runtime.render(dict(items=items, _=translations.gettext)) ==
+        localized.render('de', dict(items=items))
+    )
+
+    print('%-12s %10s' % ('template', 'render ms'))
+    print('%-12s %10.3f' % ('runtime _()', _best(
+        lambda: runtime.render(dict(items=items, _=translations.gettext)),
+        5, 20
+    ) * 1e3))
+    print('%-12s %10.3f' % ('localized', _best(
+        lambda: localized.render('de', dict(items=items)), 5, 20
+    ) * 1e3))
+    print('%-12s %10.3f' % ('plain', _best(
+        lambda: plain.render(dict(items=items)), 5, 20
+    ) * 1e3))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,80 @@
+'''
+    用python -X importtime测量冷启动时导入hbml的时间
+    只导入hbml(渲染已编译模板的进程)和导入后第一次编译各测一次,
+    后者包含按需导入ply和语法分析相关模块的时间
+    加上 --before 可以和指定的git版本对比, 例如:
+        python benchmarks/import_time_bench.py --before HEAD~1
+'''
+import os
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.realpath(__file__)))
+
+REPEAT = 7
+
+CASES = [
+    ('import hbml', 'import hbml'),
+    ('import + first compile', 'import hbml; hbml.compile("%p")'),
+]
+
+
+def _import_time(code, root):
+    '''
+        最外层模块的累计导入时间(微秒)之和, 取多次运行的最小值
+        只统计导入, 不包括之后执行代码的时间
+    '''
+    env = dict(os.environ, PYTHONPATH=root)
+    best = None
+    for i in range(REPEAT):
+        stderr = subprocess.run(
+            [sys.executable, '-X', 'importtime', '-c', code],
+            cwd=root, env=env, stderr=subprocess.PIPE,
+            universal_newlines=True, check=True
+        ).stderr
+
+        total = 0
+        for line in stderr.splitlines():
+            if not line.startswith('import time:'):
+                continue
+            self_time, cumulative, name = line[12:].split('|')
+            # 缩进一级(顶层)的模块的累计时间不重复计算
+            if cumulative.strip().isdigit() and name[1:2] != ' ':
+                total += int(cumulative)
+
+        best = total if best is None else min(best, total)
+    return best
+
+
+def _checkout(revision, path):
+    archive = subprocess.run(
+        ['git', 'archive', revision, 'hbml'],
+        cwd=ROOT, stdout=subprocess.PIPE, check=True
+    ).stdout
+    subprocess.run(['tar', '-x', '-C', path], input=archive, check=True)
+
+
+def main():
+    roots = [('current', ROOT)]
+
+    tmp = None
+    if '--before' in sys.argv:
+        revision = sys.argv[sys.argv.index('--before') + 1]
+        tmp = tempfile.TemporaryDirectory()
+        _checkout(revision, tmp.name)
+        roots.insert(0, (revision, tmp.name))
+
+    print('%-26s' % '' + ''.join('%14s' % name for name, root in roots))
+    for title, code in CASES:
+        print('%-26s' % title + ''.join(
+            '%11.1f ms' % (_import_time(code, root) / 1000.0)
+            for name, root in roots
+        ))
+
+    if tmp is not None:
+        tmp.cleanup()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,53 @@
+'''
+    10000行模板修改一行之后, 从编译到渲染完成的延迟:
+    完整重新编译 vs 增量编译
+'''
+import time
+
+import hbml
+from hbml.incremental import IncrementalCompiler
+
+BLOCK = '''%section.item(data-id = %d)
+  %h2 section %d
+  - for i in range(2):
+    %p
+      = i
+'''
+
+BLOCK_COUNT = 2000
+
+
+def _source(edited=None):
+    blocks = [BLOCK.replace('%d', str(i)) for i in range(BLOCK_COUNT)]
+    if edited is not None:
+        blocks[edited] = blocks[edited].replace('%h2', '%h3')
+    return ''.join(blocks)
+
+
+def _timeit(func):
+    start = time.perf_counter()
+    func()
+    return time.perf_counter() - start
+
+
+def main():
+    source = _source()
+    edited = _source(edited=BLOCK_COUNT // 2)
+    print('template: %d lines' % source.count('\n'))
+
+    full = _timeit(lambda: hbml.compile_template(edited).render())
+
+    compiler = IncrementalCompiler()
+    cold = _timeit(lambda: compiler.compile(source).render())
+    warm = _timeit(lambda: compiler.compile(edited).render())
+
+    assert compiler.compiled_count == 1
+    assert hbml.compile(edited) == compiler.compile(edited).render()
+
+    print('full recompile:          %8.1f ms' % (full * 1000))
+    print('incremental (cold):      %8.1f ms' % (cold * 1000))
+    print('incremental (one edit):  %8.1f ms' % (warm * 1000))
+
+
+if __name__ == '__main__':
+    main()
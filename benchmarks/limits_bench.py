@@ -0,0 +1,56 @@
+'''
+    max_output_size和max_render_time的开销
+    同一个循环模板在不限制和限制输出大小、渲染时间时的渲染时间
+'''
+import time
+
+import hbml
+
+TEMPLATE = (
+    "%table\n"
+    "  - for row in rows:\n"
+    "    %tr\n"
+    "      - for cell in row:\n"
+    "        %td\n"
+    "          = cell\n"
+)
+
+CASES = [
+    ('no limits', {}),
+    ('max_output_size', dict(max_output_size=64 * 1024 * 1024)),
+    ('both limits', dict(
+        max_output_size=64 * 1024 * 1024, max_render_time=60
+    )),
+]
+
+
+def _best(function, repeat, number):
+    best = None
+    for i in range(repeat):
+        start = time.perf_counter()
+        for j in range(number):
+            function()
+        elapsed = (time.perf_counter() - start) / number
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main():
+    rows = [list(range(10)) for i in range(1000)]
+    variables = dict(rows=rows)
+
+    expected = None
+    print('%-16s %10s' % ('case', 'render ms'))
+    for name, options in CASES:
+        template = hbml.compile_template(TEMPLATE, **options)
+        result = template.render(variables)
+        assert expected is None or result == expected
+        expected = result
+
+        print('%-16s %10.3f' % (
+            name, _best(lambda: template.render(variables), 5, 20) * 1e3
+        ))
+
+
+if __name__ == '__main__':
+    main()
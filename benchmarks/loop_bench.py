@@ -0,0 +1,59 @@
+'''
+    100000行的循环, 对比开启和关闭optimize_loops的渲染时间
+    每次迭代合并成一次_write之后, write越贵(文件, socket, 计数等),
+    节省的越多; 对于list.append这样的内置方法, 收益主要来自局部变量绑定
+'''
+import io
+import time
+
+import hbml
+from hbml.sinks import JoinSink, BufferedFileSink, CountingSink
+
+SOURCE = '''%table
+  - for row in rows:
+    %tr(data-id = row[0], class="row")
+      %td
+        = row[0]
+      %td
+        =% row[1]
+      %td done
+'''
+
+ROWS = [(i, 'name <%d>' % i) for i in range(100000)]
+
+SINKS = [
+    ('JoinSink', JoinSink),
+    ('BufferedFileSink', lambda: BufferedFileSink(io.StringIO())),
+    ('CountingSink', lambda: CountingSink(JoinSink())),
+]
+
+
+def _timeit(template, sink_factory):
+    best = None
+    for i in range(3):
+        sink = sink_factory()
+        start = time.perf_counter()
+        template.render(dict(rows=ROWS), sink)
+        sink.flush()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main():
+    plain = hbml.compile_template(SOURCE)
+    optimized = hbml.compile_template(SOURCE, optimize_loops=True)
+    assert plain.render(dict(rows=ROWS)) == optimized.render(dict(rows=ROWS))
+
+    print('%d rows' % len(ROWS))
+    print('%-18s %12s %12s %8s' % ('sink', 'plain', 'optimized', 'speedup'))
+    for name, sink_factory in SINKS:
+        before = _timeit(plain, sink_factory)
+        after = _timeit(optimized, sink_factory)
+        print('%-18s %9.1f ms %9.1f ms %7.2fx' % (
+            name, before * 1000, after * 1000, before / after
+        ))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,83 @@
+'''
+    对比1000个编译后的模板常驻内存的大小:
+    Template对象只保留函数,
+    旧的CompileWrapper会连同源代码、语法树和中间代码一起保留
+'''
+import gc
+import tracemalloc
+
+import hbml
+from hbml.compiler import CompileWrapper, _fill_options
+from hbml.parser.parser import Parser
+from hbml import lang_struct
+
+COUNT = 1000
+
+SOURCE = '''%html(lang="en")
+  %head
+    %title page %d
+  %body
+    #container.col
+      - for i in range(%d):
+        %div(data-id = i)
+          = i + 1
+      %p:plain
+        hbml is a simple templating
+        language writen by Python
+'''
+
+
+def _sources():
+    return [SOURCE.replace('%d', str(i)) for i in range(COUNT)]
+
+
+def _measure(build):
+    sources = _sources()
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    retained = [build(source) for source in sources]
+    gc.collect()
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+
+    size = sum(
+        stat.size_diff for stat in after.compare_to(before, 'filename')
+    )
+    del retained
+    return size
+
+
+def _build_template(source):
+    return hbml.compile_template(source)
+
+
+def _build_full(source):
+    '模拟旧行为: 同时保留函数、源代码、语法树和生成的代码'
+    options = _fill_options({})
+    function_code = CompileWrapper(source, options).generate()[1]
+    parse_tree = Parser().parse(source + '\n')
+    return (
+        CompileWrapper(source, options).compile(),
+        source,
+        parse_tree,
+        lang_struct.create(parse_tree),
+        function_code,
+        options,
+    )
+
+
+def main():
+    full = _measure(_build_full)
+    template = _measure(_build_template)
+
+    print('retained by %d templates:' % COUNT)
+    print('  function + source + tree + code: %10d bytes' % full)
+    print('  Template:                        %10d bytes' % template)
+    print('  saving:                          %9.1f %%' % (
+        100.0 * (full - template) / full
+    ))
+
+
+if __name__ == '__main__':
+    main()
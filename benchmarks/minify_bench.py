@@ -0,0 +1,59 @@
+'''
+    tests/templates中的模板在compress_output和minify下的输出字节数和渲染时间
+    minify的工作都在编译期完成, 渲染时间不应变长
+'''
+import glob
+import os
+import time
+
+import hbml
+
+TEMPLATES = os.path.join(
+    os.path.dirname(os.path.realpath(__file__)),
+    '..', 'tests', 'templates'
+)
+
+
+def _best(function, repeat, number):
+    best = None
+    for i in range(repeat):
+        start = time.perf_counter()
+        for j in range(number):
+            function()
+        elapsed = (time.perf_counter() - start) / number
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main():
+    print('%-34s %8s %8s %10s %10s' % (
+        'template', 'bytes', 'minify', 'render us', 'minify us'
+    ))
+
+    total = total_minified = 0
+    for path in sorted(glob.glob(os.path.join(TEMPLATES, '*.hbml'))):
+        with open(path, encoding='utf-8') as f:
+            source = f.read()
+
+        compressed = hbml.compile_template(source)
+        minified = hbml.compile_template(source, minify=True)
+
+        size = len(compressed.render().encode('utf-8'))
+        minified_size = len(minified.render().encode('utf-8'))
+        total += size
+        total_minified += minified_size
+
+        print('%-34s %8d %8d %10.2f %10.2f' % (
+            os.path.basename(path), size, minified_size,
+            _best(compressed.render, 5, 2000) * 1e6,
+            _best(minified.render, 5, 2000) * 1e6,
+        ))
+
+    print('%-34s %8d %8d   (%.1f%% smaller)' % (
+        'total', total, total_minified,
+        100.0 * (total - total_minified) / total
+    ))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,90 @@
+'''
+    预渲染一组页面: 第一次全部渲染(单进程和进程池), 没有变化时再次运行,
+    以及只有一个页面的数据变化时再次运行
+'''
+import concurrent.futures
+import os
+import shutil
+import tempfile
+import time
+
+from hbml.prerender import Page, Prerenderer
+
+TEMPLATE = (
+    "%html\n"
+    "  %body\n"
+    "    %h1\n"
+    "      = title\n"
+    "    %ul\n"
+    "      - for item in items:\n"
+    "        %li(class='item', data-id=item)\n"
+    "          = item\n"
+)
+
+PAGE_COUNT = 500
+
+
+def _pages(template, changed=None):
+    pages = []
+    for i in range(PAGE_COUNT):
+        title = 'page %d' % i
+        if i == changed:
+            title += ' (edited)'
+        pages.append(Page(
+            'pages/%d.html' % i, template,
+            dict(title=title, items=list(range(i % 50, i % 50 + 200)))
+        ))
+    return pages
+
+
+def _time(function):
+    start = time.perf_counter()
+    function()
+    return time.perf_counter() - start
+
+
+def main():
+    directory = tempfile.mkdtemp()
+    try:
+        template = os.path.join(directory, 'page.hbml')
+        with open(template, 'w', encoding='utf-8') as f:
+            f.write(TEMPLATE)
+
+        pages = _pages(template)
+        serial = os.path.join(directory, 'serial')
+        parallel = os.path.join(directory, 'parallel')
+
+        print('%-22s %10s %9s' % ('run', 'ms', 'rendered'))
+
+        renderer = Prerenderer(serial)
+        elapsed = _time(lambda: renderer.render(pages))
+        print('%-22s %10.1f %9d' % (
+            'full, 1 process', elapsed * 1e3, len(renderer.rendered)
+        ))
+
+        with concurrent.futures.ProcessPoolExecutor() as executor:
+            renderer = Prerenderer(parallel)
+            elapsed = _time(lambda: renderer.render(pages, executor))
+            print('%-22s %10.1f %9d' % (
+                'full, %d processes' % os.cpu_count(), elapsed * 1e3,
+                len(renderer.rendered)
+            ))
+
+        renderer = Prerenderer(serial)
+        elapsed = _time(lambda: renderer.render(pages))
+        print('%-22s %10.1f %9d' % (
+            'unchanged', elapsed * 1e3, len(renderer.rendered)
+        ))
+
+        changed = _pages(template, changed=7)
+        renderer = Prerenderer(serial)
+        elapsed = _time(lambda: renderer.render(changed))
+        print('%-22s %10.1f %9d' % (
+            'one page changed', elapsed * 1e3, len(renderer.rendered)
+        ))
+    finally:
+        shutil.rmtree(directory)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,40 @@
+'''
+    对比压缩输出和不压缩(带缩进)输出的渲染开销
+'''
+import timeit
+
+import hbml
+from hbml.sinks import JoinSink
+
+SOURCE = '''%html(lang="en")
+  %body
+    #container.col
+      - for i in range(300):
+        %div.row
+          %span.index
+            = i
+          %span.label row
+'''
+
+NUMBER = 100
+
+
+def main():
+    for name, options in [
+        ('compressed', dict()),
+        ('pretty', dict(compress_output=False)),
+    ]:
+        template = hbml.compile_template(SOURCE, debug=True, **options)
+        sink = JoinSink()
+        template.render(None, sink)
+
+        seconds = min(timeit.repeat(
+            template.render, number=NUMBER, repeat=5
+        ))
+        print('%-12s %8.3f ms/render %6d writes/render' % (
+            name, seconds * 1000 / NUMBER, len(sink.parts)
+        ))
+
+
+if __name__ == '__main__':
+    main()
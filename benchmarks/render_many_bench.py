@@ -0,0 +1,67 @@
+'''
+    同一个模板渲染10000组变量:
+    逐个调用render vs 批量渲染函数 vs 线程池/进程池分块
+'''
+import concurrent.futures
+import time
+
+import hbml
+
+SOURCE = '''.card(data-id = id)
+  %h2
+    =% name
+  %p
+    = email
+  %ul
+    - for tag in tags:
+      %li
+        = tag
+'''
+
+RECORDS = [
+    dict(
+        id=i,
+        name='user <%d>' % i,
+        email='user%d@example.com' % i,
+        tags=['a', 'b', 'c'],
+    )
+    for i in range(10000)
+]
+
+
+def _timeit(func):
+    best = None
+    for i in range(3):
+        start = time.perf_counter()
+        func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main():
+    template = hbml.compile_template(SOURCE, batch=True)
+    expected = [template.render(r) for r in RECORDS]
+    assert template.render_many(RECORDS) == expected
+
+    print('%d records' % len(RECORDS))
+    print('  render() per record: %8.1f ms' % (1000 * _timeit(
+        lambda: [template.render(r) for r in RECORDS]
+    )))
+    print('  render_many():       %8.1f ms' % (1000 * _timeit(
+        lambda: template.render_many(RECORDS)
+    )))
+
+    with concurrent.futures.ThreadPoolExecutor(4) as executor:
+        print('  4 threads:           %8.1f ms' % (1000 * _timeit(
+            lambda: template.render_many(RECORDS, executor)
+        )))
+
+    with concurrent.futures.ProcessPoolExecutor(4) as executor:
+        print('  4 processes:         %8.1f ms' % (1000 * _timeit(
+            lambda: hbml.render_many(SOURCE, RECORDS, executor)
+        )))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,54 @@
+'''
+    对比开启和关闭sandbox的编译与渲染时间
+    sandbox的检查都在编译期完成, 渲染时只是换了一份__builtins__,
+    渲染时间应该基本相同, 编译时多出的是一次语法树遍历
+'''
+import time
+
+import hbml
+
+SOURCE = '''%table
+  - for row in rows:
+    %tr(data-id = row[0], class="row")
+      %td
+        = len(row[1])
+      %td
+        =% row[1].upper()
+      %td done
+'''
+
+ROWS = [(i, 'name <%d>' % i) for i in range(100000)]
+
+
+def _best(function, repeat):
+    best = None
+    for i in range(repeat):
+        start = time.perf_counter()
+        function()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main():
+    plain = hbml.compile_template(SOURCE)
+    sandboxed = hbml.compile_template(SOURCE, sandbox=True)
+    variables = dict(rows=ROWS)
+    assert plain.render(variables) == sandboxed.render(variables)
+
+    print('%-10s %14s %14s' % ('', 'compile', 'render'))
+    for name, template, options in [
+        ('plain', plain, {}),
+        ('sandbox', sandboxed, dict(sandbox=True)),
+    ]:
+        compile_time = _best(
+            lambda: hbml.compile_template(SOURCE, **options), 50
+        )
+        render_time = _best(lambda: template.render(variables), 5)
+        print('%-10s %11.3f ms %11.1f ms' % (
+            name, compile_time * 1000, render_time * 1000
+        ))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,92 @@
+'''
+    对比逐片段直接写文件/socket和通过带缓冲的OutputSink输出
+'''
+import io
+import os
+import socket
+import tempfile
+import threading
+import timeit
+
+import hbml
+from hbml.sinks import (
+    JoinSink, BufferedFileSink, SocketSink, DiscardSink
+)
+
+SOURCE = '''%table
+  - for i in range(500):
+    %tr(data-id = i)
+      %td
+        = i
+      %td row
+'''
+
+NUMBER = 20
+
+
+class _RawSocketWriter(object):
+    '每个片段直接sendall一次'
+    def __init__(self, sock):
+        self.write = sock.sendall
+
+
+def _drain(sock):
+    while sock.recv(1 << 20):
+        pass
+
+
+def main():
+    str_template = hbml.compile_template(SOURCE)
+    bytes_template = hbml.compile_template(SOURCE, encoding='utf-8')
+
+    fd, path = tempfile.mkstemp()
+    os.close(fd)
+    a, b = socket.socketpair()
+    drainer = threading.Thread(target=_drain, args=(b,), daemon=True)
+    drainer.start()
+
+    def raw_file():
+        # buffering=0: 每次write都是一次系统调用
+        with open(path, 'wb', buffering=0) as f:
+            bytes_template.render(None, f)
+
+    def buffered_file():
+        with open(path, 'wb', buffering=0) as f:
+            with BufferedFileSink(f, empty=b'') as sink:
+                bytes_template.render(None, sink)
+
+    def raw_socket():
+        bytes_template.render(None, _RawSocketWriter(a))
+
+    def buffered_socket():
+        with SocketSink(a) as sink:
+            bytes_template.render(None, sink)
+
+    def string_io():
+        str_template.render(None, io.StringIO())
+
+    def join_sink():
+        str_template.render(None, JoinSink())
+
+    def discard():
+        str_template.render(None, DiscardSink())
+
+    try:
+        for name, func in [
+            ('raw file', raw_file),
+            ('BufferedFileSink', buffered_file),
+            ('raw socket', raw_socket),
+            ('SocketSink', buffered_socket),
+            ('io.StringIO', string_io),
+            ('JoinSink', join_sink),
+            ('DiscardSink', discard),
+        ]:
+            seconds = min(timeit.repeat(func, number=NUMBER, repeat=5))
+            print('%-20s %8.3f ms/render' % (name, seconds * 1000 / NUMBER))
+    finally:
+        a.close()
+        os.remove(path)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,78 @@
+'''
+    行号映射的开销
+    正常渲染: Template.render和直接调用模板函数的时间对比
+    映射本身: 每行生成代码占用的字节数
+    出错时: 附加模板位置的耗时
+'''
+import time
+
+import hbml
+from hbml.sinks import JoinSink
+
+SOURCE = '''%table
+  - for row in rows:
+    %tr(data-id = row[0], class="row")
+      %td
+        = row[0]
+      %td
+        =% row[1]
+'''
+
+SMALL = '%p\n  = name\n'
+
+
+def _best(function, repeat, number=1):
+    best = None
+    for i in range(repeat):
+        start = time.perf_counter()
+        for j in range(number):
+            function()
+        elapsed = (time.perf_counter() - start) / number
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main():
+    rows = [(i, 'name <%d>' % i) for i in range(100000)]
+    template = hbml.compile_template(SOURCE, name='rows.hbml')
+    lines = template.source_map.lines
+    print('line map: %d lines, %d bytes' % (
+        len(lines), len(lines) * lines.itemsize
+    ))
+
+    def direct():
+        sink = JoinSink()
+        template.function(sink, rows=rows)
+        return sink.getvalue()
+
+    print('100000 rows   render %8.1f ms   direct %8.1f ms' % (
+        _best(lambda: template.render(dict(rows=rows)), 5) * 1000,
+        _best(direct, 5) * 1000
+    ))
+
+    small = hbml.compile_template(SMALL)
+    variables = dict(name='x')
+
+    def small_direct():
+        sink = JoinSink()
+        small.function(sink, **variables)
+        return sink.getvalue()
+
+    print('small         render %8.2f us   direct %8.2f us' % (
+        _best(lambda: small.render(variables), 5, 20000) * 1e6,
+        _best(small_direct, 5, 20000) * 1e6
+    ))
+
+    broken = hbml.compile_template('%p\n  = 1 / zero\n')
+
+    def failing():
+        try:
+            broken.render(dict(zero=0))
+        except ZeroDivisionError:
+            pass
+
+    print('error path    render %8.2f us' % (_best(failing, 5, 2000) * 1e6))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,56 @@
+'''
+    大表格渲染: 行模板循环 vs 按列渲染
+'''
+import time
+
+import hbml
+from hbml.table import compile_row
+
+ROW = '''%tr(data-id = id)
+  %td
+    = id
+  %td
+    =% name
+  %td
+    = score
+'''
+
+LOOP = '- for id, name, score in zip(ids, names, scores):\n' + ''.join(
+    '  ' + line + '\n' for line in ROW.splitlines()
+)
+
+
+def _timeit(func):
+    best = None
+    for i in range(3):
+        start = time.perf_counter()
+        func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main():
+    loop = hbml.compile_template(LOOP)
+    row = compile_row(ROW)
+
+    for count in (10000, 100000, 1000000):
+        ids = list(range(count))
+        names = ['name <%d>' % i for i in ids]
+        scores = [i * 3 for i in ids]
+
+        loop_result = loop.render(dict(ids=ids, names=names, scores=scores))
+        columns = dict(id=ids, name=names, score=scores)
+        assert row.render(columns) == loop_result
+
+        print('%d rows' % count)
+        print('  loop template:  %8.1f ms' % (1000 * _timeit(
+            lambda: loop.render(dict(ids=ids, names=names, scores=scores))
+        )))
+        print('  columns:        %8.1f ms' % (1000 * _timeit(
+            lambda: row.render(columns)
+        )))
+
+
+if __name__ == '__main__':
+    main()
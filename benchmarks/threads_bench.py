@@ -0,0 +1,95 @@
+'''
+    多个线程同时渲染同一个模板的吞吐量
+    每个线程渲染时使用自己的池中的输出目标, 生成的函数没有共享的可变状态
+    普通的CPython受GIL限制, 线程数增加吞吐量基本不变;
+    free-threaded的CPython(python3.13t等)可以随线程数增加
+    找到free-threaded的解释器时, 用它再运行一次:
+        python benchmarks/threads_bench.py
+        python benchmarks/threads_bench.py --python python3.13t
+'''
+import concurrent.futures
+import os
+import shutil
+import subprocess
+import sys
+import time
+
+import hbml
+
+ROOT = os.path.dirname(os.path.dirname(os.path.realpath(__file__)))
+
+TEMPLATE = (
+    "%ul(class=css)\n"
+    "  - for i in range(count):\n"
+    "    %li(data-i=i)\n"
+    "      = '%s-%d' % (name, i)\n"
+)
+
+RENDERS = 20000
+THREADS = [1, 2, 4, 8]
+
+FREE_THREADED_PYTHONS = ['python3.14t', 'python3.13t']
+
+
+def _throughput(template, records, threads):
+    expected = [template.render(variables) for variables in records[:100]]
+
+    with concurrent.futures.ThreadPoolExecutor(threads) as executor:
+        start = time.perf_counter()
+        results = list(executor.map(template.render, records, chunksize=100))
+        elapsed = time.perf_counter() - start
+
+    assert results[:100] == expected
+    return len(records) / elapsed
+
+
+def main():
+    gil = getattr(sys, '_is_gil_enabled', lambda: True)()
+    print('%s, GIL %s' % (
+        sys.version.split()[0], 'enabled' if gil else 'disabled'
+    ))
+
+    template = hbml.compile_template(TEMPLATE)
+    records = [
+        dict(css=['list'], count=n % 10, name='user%d' % n)
+        for n in range(RENDERS)
+    ]
+
+    print('%-8s %14s' % ('threads', 'renders/s'))
+    for threads in THREADS:
+        print('%-8d %14.0f' % (
+            threads, _throughput(template, records, threads)
+        ))
+
+
+def _free_threaded_python():
+    if '--python' in sys.argv:
+        return sys.argv[sys.argv.index('--python') + 1]
+
+    # 自己已经是free-threaded的解释器时不再重复运行
+    if not getattr(sys, '_is_gil_enabled', lambda: True)():
+        return None
+
+    for name in FREE_THREADED_PYTHONS:
+        python = shutil.which(name)
+        if python:
+            return python
+
+
+def _run(python):
+    'free-threaded的解释器里需要能导入ply'
+    print()
+    result = subprocess.run(
+        [python, os.path.realpath(__file__)],
+        cwd=ROOT, env=dict(os.environ, PYTHONPATH=ROOT)
+    )
+    if result.returncode:
+        print('%s failed, is ply installed for it?' % python)
+
+
+if __name__ == '__main__':
+    main()
+
+    python = _free_threaded_python()
+    if python:
+        _run(python)
@@ -1,3 +1,8 @@
 version = '0.1.0.0'
 
-from .compiler import compile, compile_file
+from .compiler import (
+    Environment, compile, compile_file, compile_template,
+    compile_template_file, render_many
+)
+from .filters import register_filter
+from .template import Template
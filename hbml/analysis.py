@@ -0,0 +1,501 @@
+'''
+    模板中Python代码的编译期分析
+
+    =、=%、- 行和属性值里的Python代码在编译时先用ast解析一遍:
+    语法错误在编译期就报出, 并且带有模板中的行号;
+    解析得到的语法树还可以用来判断常量、提取自由变量、判断表达式是否没有副作用,
+    供编译器做常量折叠等优化
+'''
+import ast
+import copy
+
+from . import exceptions
+
+
+def parse_expression(source, lineno=None):
+    '''
+        解析一个Python表达式, 返回表达式的语法树(ast.expr)
+        生成的代码里表达式总是出现在一对括号之内,
+        所以这里也按括号内的写法解析, 允许前导空白和换行
+    '''
+    try:
+        tree = ast.parse('(%s\n)' % source, mode='eval')
+    except SyntaxError as e:
+        raise _syntax_error(e, source, lineno)
+
+    return tree.body
+
+
+# 不能单独成为一条语句的子句, 解析时补上它前面的部分
+_CLAUSE_PREFIXES = {
+    'else': 'if 1: pass\n',
+    'elif': 'if 1: pass\n',
+    'except': 'try: pass\n',
+    'finally': 'try: pass\n',
+}
+
+# 必须跟着其他子句的语句, 解析时补上它后面的部分
+_CLAUSE_SUFFIXES = {
+    'try': '\nfinally: pass',
+}
+
+
+def parse_statement(source, lineno=None):
+    '''
+        解析 - 行的Python语句
+        返回(node, compound):
+        node是语句的语法树, elif子句是ast.If, except子句是ast.ExceptHandler,
+        else和finally子句没有自己的语法树, 返回None
+        一行中有多条用分号分隔的简单语句时, node是包含全部语句的ast.Module,
+        检查和分析都要覆盖每一条语句
+        只有注释的行没有语句, 返回(None, False)
+        compound表示这是一个以冒号结尾、需要子block的复合语句的开头
+    '''
+    source = source.strip()
+    keyword = source.split(None, 1)[0].rstrip(':') if source else ''
+    prefix = _CLAUSE_PREFIXES.get(keyword)
+
+    if prefix is None:
+        try:
+            tree = ast.parse(source)
+        except SyntaxError:
+            pass
+        else:
+            if not tree.body:
+                return None, False
+            if len(tree.body) == 1:
+                return tree.body[0], False
+            return tree, False
+
+    try:
+        tree = ast.parse('%s%s pass%s' % (
+            prefix or '', source, _CLAUSE_SUFFIXES.get(keyword, '')
+        ))
+    except SyntaxError as e:
+        if prefix:
+            e.lineno -= 1
+        raise _syntax_error(e, source, lineno)
+
+    node = tree.body[0]
+    if keyword == 'elif':
+        node = node.orelse[0]
+    elif keyword == 'except':
+        node = node.handlers[0]
+    elif prefix:
+        node = None
+
+    return node, True
+
+
+def unparse_statement(node):
+    '''
+        由parse_statement得到的简单语句重新生成一行源代码
+        多条语句仍然用分号连接写在一行
+    '''
+    if isinstance(node, ast.Module):
+        return '; '.join(ast.unparse(statement) for statement in node.body)
+
+    return ast.unparse(node)
+
+
+def _syntax_error(error, source, lineno):
+    # 错误可能出现在补上的括号或子句处, 行号不超出源代码本身
+    if lineno is not None and error.lineno:
+        lineno += min(max(error.lineno, 1), source.count('\n') + 1) - 1
+
+    return exceptions.TemplateSyntaxError(error.msg, lineno, source.strip())
+
+
+# 可以在编译期折叠的常量类型
+# 容器类型不折叠: 生成的代码是str(expr), 元组会被展开成多个参数
+_SCALAR_TYPES = (str, bytes, int, float, complex, bool, type(None))
+
+
+def is_constant(node):
+    '结果在编译期就能确定的表达式: 标量字面量及其简单运算'
+    try:
+        value = ast.literal_eval(node)
+    except (ValueError, TypeError, SyntaxError, MemoryError, RecursionError):
+        return False
+
+    return isinstance(value, _SCALAR_TYPES)
+
+
+def constant_value(node):
+    '常量表达式的值, 只能对is_constant为真的表达式调用'
+    return ast.literal_eval(node)
+
+
+def free_names(node):
+    '''
+        表达式中引用的、需要从外部得到的变量名
+        推导式和lambda自己绑定的名字不算在内
+    '''
+    loaded = set()
+    bound = set()
+
+    for child in ast.walk(node):
+        if isinstance(child, ast.Name):
+            if isinstance(child.ctx, ast.Load):
+                loaded.add(child.id)
+            else:
+                bound.add(child.id)
+        elif isinstance(child, ast.arg):
+            bound.add(child.arg)
+
+    return frozenset(loaded - bound)
+
+
+def variable_names(node):
+    '''
+        代码中读取的所有变量名
+        和free_names不同, 代码自己也赋值的名字(例如 x = x + 1)同样算在内
+    '''
+    return frozenset(
+        child.id for child in ast.walk(node)
+        if isinstance(child, ast.Name) and isinstance(child.ctx, ast.Load)
+    )
+
+
+def substitute_constants(node, constants):
+    '''
+        把表达式中的常量名替换为常量的值,
+        再折叠只由常量组成的比较、逻辑运算和条件表达式
+        constants是名字 -> 值的dict; 没有用到常量时原样返回node
+    '''
+    if not constants or not (variable_names(node) & constants.keys()):
+        return node
+
+    node = _ConstantFolder(constants).visit(copy.deepcopy(node))
+    return ast.fix_missing_locations(node)
+
+
+# 只由这些节点组成的比较在编译期求值
+# 不包括算术运算, 避免 'x' * 10 ** 9 这样的表达式在编译期耗尽内存
+_COMPARABLE_NODES = (
+    ast.Compare, ast.Constant, ast.Tuple, ast.List, ast.Set,
+    ast.Load, ast.cmpop,
+)
+
+
+class _ConstantFolder(ast.NodeTransformer):
+    def __init__(self, constants):
+        self.constants = constants
+
+    def visit(self, node):
+        if not isinstance(node, _SCOPE_NODES):
+            return super().visit(node)
+
+        # lambda的参数和推导式的目标在内部遮住同名的常量
+        bound = _scope_parameters(node) & self.constants.keys()
+        if not bound:
+            return super().visit(node)
+
+        # 第一个for的可迭代对象和参数默认值在外层作用域中求值
+        if isinstance(node, ast.Lambda):
+            node.args = self.visit(node.args)
+        else:
+            node.generators[0].iter = self.visit(node.generators[0].iter)
+
+        constants = self.constants
+        self.constants = dict(
+            (name, value) for name, value in constants.items()
+            if name not in bound
+        )
+        try:
+            return super().visit(node)
+        finally:
+            self.constants = constants
+
+    def visit_Name(self, node):
+        if isinstance(node.ctx, ast.Load) and node.id in self.constants:
+            return ast.copy_location(
+                ast.Constant(self.constants[node.id]), node
+            )
+        return node
+
+    def visit_UnaryOp(self, node):
+        self.generic_visit(node)
+        if isinstance(node.op, ast.Not) and isinstance(
+            node.operand, ast.Constant
+        ):
+            return ast.copy_location(
+                ast.Constant(not node.operand.value), node
+            )
+        return node
+
+    def visit_Compare(self, node):
+        self.generic_visit(node)
+        if not all(
+            isinstance(child, _COMPARABLE_NODES) for child in ast.walk(node)
+        ):
+            return node
+
+        expression = ast.fix_missing_locations(ast.Expression(node))
+        try:
+            value = eval(
+                compile(expression, '<constant>', 'eval'),
+                {'__builtins__': {}}
+            )
+        except Exception:
+            return node
+
+        return ast.copy_location(ast.Constant(value), node)
+
+    def visit_BoolOp(self, node):
+        self.generic_visit(node)
+
+        # and在第一个假值处短路, or在第一个真值处短路
+        stop = isinstance(node.op, ast.Or)
+        values = []
+        for i, value in enumerate(node.values):
+            if isinstance(value, ast.Constant):
+                if bool(value.value) is stop:
+                    values.append(value)
+                    break
+                # 不短路的常量不影响结果, 除非它是最后一个
+                if i + 1 < len(node.values):
+                    continue
+            values.append(value)
+
+        if len(values) == 1:
+            return values[0]
+
+        node.values = values
+        return node
+
+    def visit_IfExp(self, node):
+        self.generic_visit(node)
+        if isinstance(node.test, ast.Constant):
+            return node.body if node.test.value else node.orelse
+        return node
+
+
+# 求值没有副作用的节点
+# 函数调用、属性访问(可能是property)、海象运算等都不在其中
+_PURE_NODES = (
+    ast.Expression, ast.Constant, ast.Name, ast.Load,
+    ast.BoolOp, ast.BinOp, ast.UnaryOp, ast.Compare, ast.IfExp,
+    ast.Tuple, ast.List, ast.Set, ast.Dict,
+    ast.boolop, ast.operator, ast.unaryop, ast.cmpop,
+)
+
+
+def is_pure(node):
+    '''
+        表达式求值是否没有副作用
+        只由变量、字面量和运算符组成的表达式,
+        在变量不变时可以安全地折叠或者提到循环外面
+    '''
+    return all(isinstance(child, _PURE_NODES) for child in ast.walk(node))
+
+
+def assigned_names(node):
+    '''
+        代码中赋值或删除的所有变量名
+        包括for的目标、海象运算、except ... as、import和with ... as
+        node为None时返回空集合
+    '''
+    if node is None:
+        return frozenset()
+
+    return _assigned_names(ast.walk(node))
+
+
+def scope_assigned_names(node):
+    '''
+        和assigned_names相同, 但只算代码所在作用域中的名字:
+        lambda的参数、推导式的目标等内部的名字不算, 推导式中的海象运算算在内
+    '''
+    if node is None:
+        return frozenset()
+
+    return _assigned_names(_walk_scope(node))
+
+
+def _walk_scope(node):
+    'ast.walk, 不进入lambda和推导式'
+    nodes = [node]
+    while nodes:
+        node = nodes.pop()
+        if isinstance(node, _SCOPE_NODES):
+            if not isinstance(node, ast.Lambda):
+                for child in ast.walk(node):
+                    if isinstance(child, ast.NamedExpr):
+                        yield child.target
+            continue
+
+        yield node
+        nodes.extend(ast.iter_child_nodes(node))
+
+
+def _scope_parameters(node):
+    'lambda的参数或推导式的目标'
+    if isinstance(node, ast.Lambda):
+        args = node.args
+        return frozenset(
+            arg.arg for arg in (
+                args.posonlyargs + args.args + args.kwonlyargs +
+                [args.vararg, args.kwarg]
+            ) if arg is not None
+        )
+
+    return frozenset().union(*(
+        assigned_names(generator.target) for generator in node.generators
+    ))
+
+
+def _assigned_names(nodes):
+    names = set()
+    for child in nodes:
+        if isinstance(child, ast.Name):
+            if not isinstance(child.ctx, ast.Load):
+                names.add(child.id)
+        elif isinstance(child, ast.ExceptHandler):
+            if child.name:
+                names.add(child.name)
+        elif isinstance(child, ast.alias):
+            names.add((child.asname or child.name).split('.', 1)[0])
+        elif isinstance(child, (
+            ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef
+        )):
+            names.add(child.name)
+
+    return frozenset(names)
+
+
+# 有自己的作用域的节点, 其中的名字可能被重新绑定
+_SCOPE_NODES = (
+    ast.Lambda, ast.ListComp, ast.SetComp, ast.DictComp, ast.GeneratorExp,
+)
+
+
+def attribute_chains(node):
+    '''
+        表达式每次求值都一定会求值的属性链, 例如 user.profile.name
+        返回[(链的源代码, 链的根变量名, 属性访问的次数)]
+        条件表达式的分支、and/or第一项之后的部分、lambda和推导式中的链不算在内;
+        a.b.c 只算一次, 不再单独算其中的 a.b
+    '''
+    chains = []
+    _collect_chains(node, chains)
+    return chains
+
+
+def _collect_chains(node, chains):
+    if isinstance(node, _SCOPE_NODES):
+        return
+
+    if isinstance(node, ast.Attribute) and isinstance(node.ctx, ast.Load):
+        root, depth = _chain_root(node)
+        if root is not None:
+            chains.append((ast.unparse(node), root, depth))
+            return
+
+    if isinstance(node, ast.IfExp):
+        _collect_chains(node.test, chains)
+        return
+    if isinstance(node, ast.BoolOp):
+        _collect_chains(node.values[0], chains)
+        return
+
+    for child in ast.iter_child_nodes(node):
+        _collect_chains(child, chains)
+
+
+def _chain_root(node):
+    '属性链的根变量名和属性访问的次数, 不是 name.attr.attr 的形式时返回(None, 0)'
+    depth = 0
+    while isinstance(node, ast.Attribute):
+        node = node.value
+        depth += 1
+
+    if isinstance(node, ast.Name):
+        return node.id, depth
+
+    return None, 0
+
+
+def replace_chains(node, replacements):
+    '''
+        把表达式中的属性链替换为变量
+        replacements是链的源代码 -> 变量名的dict, 见: attribute_chains
+        lambda和推导式中的链不替换, 其中的名字可能指向别的对象
+        没有替换时原样返回node
+    '''
+    replacer = _ChainReplacer(replacements)
+    result = replacer.visit(copy.deepcopy(node))
+    if not replacer.replaced:
+        return node
+
+    return ast.fix_missing_locations(result)
+
+
+class _ChainReplacer(ast.NodeTransformer):
+    def __init__(self, replacements):
+        self.replacements = replacements
+        self.replaced = False
+
+    def visit(self, node):
+        if isinstance(node, _SCOPE_NODES):
+            return node
+        return super().visit(node)
+
+    def visit_Attribute(self, node):
+        if isinstance(node.ctx, ast.Load):
+            name = self.replacements.get(ast.unparse(node))
+            if name is not None:
+                self.replaced = True
+                return ast.copy_location(ast.Name(name, ast.Load()), node)
+
+        return self.generic_visit(node)
+
+
+# 标记要翻译的文本的函数名, 见: hbml.i18n
+MESSAGE_FUNCTION = '_'
+
+
+def _message_call(node):
+    '_("...") 调用中的原文, 不是这种形式时返回None'
+    if (
+        isinstance(node, ast.Call) and isinstance(node.func, ast.Name) and
+        node.func.id == MESSAGE_FUNCTION and len(node.args) == 1 and
+        not node.keywords and isinstance(node.args[0], ast.Constant) and
+        isinstance(node.args[0].value, str)
+    ):
+        return node.args[0].value
+
+
+def messages(node):
+    '代码中 _("...") 调用的原文, 按出现的顺序'
+    return [
+        message for message in map(_message_call, ast.walk(node))
+        if message is not None
+    ]
+
+
+def translate_messages(node, translations):
+    '''
+        把 _("...") 调用替换为译文的字符串字面量
+        translations是原文 -> 译文的dict, 没有译文时替换为原文
+        没有这样的调用时原样返回node
+    '''
+    if MESSAGE_FUNCTION not in variable_names(node) or not messages(node):
+        return node
+
+    node = _MessageTranslator(translations).visit(copy.deepcopy(node))
+    return ast.fix_missing_locations(node)
+
+
+class _MessageTranslator(ast.NodeTransformer):
+    def __init__(self, translations):
+        self.translations = translations
+
+    def visit_Call(self, node):
+        message = _message_call(node)
+        if message is None:
+            return self.generic_visit(node)
+
+        return ast.copy_location(
+            ast.Constant(self.translations.get(message, message)), node
+        )
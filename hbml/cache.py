@@ -0,0 +1,306 @@
+'''
+    多进程共享的模板缓存
+
+    同一台机器上的多个工作进程编译同样的模板时,
+    只有第一个进程真正编译, 把模板函数的code对象用marshal序列化后
+    追加到缓存目录下的一个文件里; 其他进程用mmap映射这个文件,
+    直接从映射的内存中反序列化code对象, 不需要再做语法分析和代码生成
+
+    缓存以模板源代码和编译选项的hash为key
+    文件只追加: 写入时持有排他锁(fcntl.flock), 同一时刻只有一个写者;
+    读者只在为新追加的记录建立索引时持有共享锁, 读取已索引的记录不加锁
+    每条记录带有crc32, 写者异常退出留下的不完整记录由下一个写者截掉
+
+        cache = SharedCodeCache('/var/cache/hbml')
+        template = cache.compile_template(source)
+
+    注意: static过滤器的结果嵌入在缓存的代码里,
+    修改了已注册的过滤器的实现后要换一个缓存目录或者删除缓存文件
+    hbml的版本和生成代码的格式版本计入key, 升级hbml后不会读到旧的代码
+
+    安全: 缓存中的code对象加载后直接执行, 能写入缓存文件就能在渲染模板的进程里
+    执行任意代码, 缓存目录只能由运行这些进程的可信用户写入
+    打开缓存时检查目录和缓存文件: 必须属于当前用户, 并且组和其他用户不可写,
+    否则抛出PermissionError; 新建的目录和文件只有当前用户可以访问
+'''
+import functools
+import marshal
+import mmap
+import os
+import stat
+import struct
+import sys
+import threading
+import zlib
+from array import array
+
+from . import version
+from .compiler import (
+    CODE_VERSION, CompileWrapper, _create_template, _fill_options,
+    _generate_code, _generate_file_code, code_filename
+)
+from .source_map import SourceMap
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+_MAGIC = b'HBMLC001'
+
+# 记录头: key, 数据长度, 数据的crc32
+_RECORD_HEADER = struct.Struct('<16sII')
+
+# 只影响Template对象、不影响生成的代码的选项, 不计入key
+# name决定生成的函数名, 要计入key, 否则缓存命中时函数名和traceback指向别的模板
+_IGNORED_OPTIONS = ('debug', )
+
+
+class SharedCodeCache(object):
+    '''
+        基于本地目录的共享缓存, 每个进程各自创建一个实例
+        hits和misses记录本实例从缓存中读到和自己编译的模板数
+        文件锁不能在同一个进程的线程之间互斥, 实例内部另用一个线程锁,
+        一个实例可以由多个线程共用
+    '''
+    def __init__(self, directory):
+        if fcntl is None:
+            raise RuntimeError('SharedCodeCache requires fcntl')
+
+        os.makedirs(directory, mode=0o700, exist_ok=True)
+        _check_trusted(directory, os.stat(directory))
+
+        # 不同Python版本的code对象不兼容, 各用各的文件
+        self.path = os.path.join(
+            directory, 'hbml-%s.cache' % sys.implementation.cache_tag
+        )
+        self.__file = os.fdopen(
+            os.open(self.path, os.O_RDWR | os.O_APPEND | os.O_CREAT, 0o600),
+            'a+b'
+        )
+        try:
+            # 检查已经打开的文件, 检查之后文件不会再被替换
+            _check_trusted(self.path, os.fstat(self.__file.fileno()))
+        except PermissionError:
+            self.__file.close()
+            raise
+
+        self.__map = None
+
+        # 保护映射和索引: 重新映射时不能有其他线程正在读旧的映射
+        self.__lock = threading.Lock()
+
+        # key -> (数据的起始位置, 长度)
+        self.__index = {}
+        # 已经建立索引的文件长度
+        self.__scanned = 0
+
+        self.hits = 0
+        self.misses = 0
+
+    def close(self):
+        with self.__lock:
+            if self.__map is not None:
+                self.__map.close()
+                self.__map = None
+            self.__file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    @staticmethod
+    def key(source, options):
+        '模板源代码和编译选项的hash'
+        import hashlib
+        import importlib.util
+
+        digest = hashlib.blake2b(digest_size=16)
+        digest.update(importlib.util.MAGIC_NUMBER)
+        digest.update(('%s/%d' % (version, CODE_VERSION)).encode('utf-8'))
+        digest.update(repr(sorted(
+            (k, v) for k, v in options.items() if k not in _IGNORED_OPTIONS
+        )).encode('utf-8'))
+        digest.update(source.encode('utf-8'))
+        return digest.digest()
+
+    def compile_template(self, source, **options):
+        '''
+            和hbml.compile_template相同,
+            缓存中已经有这个模板时直接加载, 否则编译后写入缓存
+        '''
+        options = _fill_options(options)
+
+        loader = None
+        if options['debug']:
+            loader = functools.partial(_generate_code, source, options)
+
+        return self.__load(
+            source, options, options['name'] or '<template>', loader,
+            source if options['debug'] else None
+        )
+
+    def compile_template_file(self, path, **options):
+        '和hbml.compile_template_file相同, 使用缓存'
+        options = _fill_options(options)
+
+        with open(path, 'r', encoding='utf-8') as f:
+            source = f.read()
+
+        return self.__load(
+            source, options, options['name'] or path,
+            functools.partial(_generate_file_code, path, options)
+        )
+
+    def __load(self, source, options, name, loader, template_source=None):
+        key = self.key(source, options)
+
+        entry = self.get(key)
+        compiled = False
+        if entry is None:
+            entry, compiled = self.__compile(key, source, options)
+
+        with self.__lock:
+            if compiled:
+                self.misses += 1
+            else:
+                self.hits += 1
+
+        function_name, code, line_map = entry
+        lines = array('i')
+        lines.frombytes(line_map)
+
+        source_map = SourceMap(
+            name, code_filename(function_name), lines, template_source
+        )
+        return _create_template(
+            function_name, code, loader, options, source_map
+        )
+
+    def get(self, key):
+        '''
+            从缓存中读取(函数名, code对象, 行号映射的bytes)
+            没有时返回None
+        '''
+        with self.__lock:
+            if key not in self.__index:
+                fcntl.flock(self.__file, fcntl.LOCK_SH)
+                try:
+                    self.__refresh()
+                finally:
+                    fcntl.flock(self.__file, fcntl.LOCK_UN)
+
+            return self.__read(key)
+
+    def __read(self, key):
+        '调用者持有线程锁'
+        position = self.__index.get(key)
+        if position is None:
+            return None
+
+        start, length = position
+        with memoryview(self.__map) as view:
+            with view[start:start + length] as data:
+                # 直接从映射的内存反序列化, 不复制成bytes
+                return marshal.loads(data)
+
+    def __compile(self, key, source, options):
+        # 持有写锁时再检查一次, 其他进程可能刚刚写入了同一个模板
+        with self.__lock:
+            fcntl.flock(self.__file, fcntl.LOCK_EX)
+            try:
+                return self.__compile_locked(key, source, options)
+            finally:
+                fcntl.flock(self.__file, fcntl.LOCK_UN)
+
+    def __compile_locked(self, key, source, options):
+        '''
+            调用者持有线程锁和文件的排他锁
+            返回(缓存项, 是否由本实例编译)
+        '''
+        self.__refresh()
+        entry = self.__read(key)
+        if entry is not None:
+            return entry, False
+
+        # 持有排他锁时, 索引之后的内容只能是写者中途退出留下的
+        if os.fstat(self.__file.fileno()).st_size > self.__scanned:
+            self.__file.truncate(self.__scanned)
+
+        env = CompileWrapper(source, options)
+        function_name, function_code = env.generate()
+        entry = (
+            function_name,
+            compile(function_code, code_filename(function_name), 'exec'),
+            env.line_map.tobytes()
+        )
+        self.__append(key, marshal.dumps(entry))
+        return entry, True
+
+    def __append(self, key, data):
+        'append a record, the caller holds the lock'
+        self.__file.seek(0, os.SEEK_END)
+        if self.__file.tell() == 0:
+            self.__file.write(_MAGIC)
+
+        self.__file.write(
+            _RECORD_HEADER.pack(key, len(data), zlib.crc32(data)) + data
+        )
+        self.__file.flush()
+
+    def __refresh(self):
+        '''
+            文件变长了就重新映射, 并为新追加的记录建立索引
+            调用者持有文件锁, 期间文件不会被截短
+        '''
+        size = os.fstat(self.__file.fileno()).st_size
+        if size <= self.__scanned:
+            return
+
+        if self.__map is not None:
+            self.__map.close()
+        self.__map = mmap.mmap(
+            self.__file.fileno(), size, access=mmap.ACCESS_READ
+        )
+
+        offset = self.__scanned
+        if offset == 0:
+            if self.__map[:len(_MAGIC)] != _MAGIC:
+                return
+            offset = len(_MAGIC)
+
+        with memoryview(self.__map) as view:
+            while offset + _RECORD_HEADER.size <= size:
+                key, length, crc = _RECORD_HEADER.unpack_from(view, offset)
+                start = offset + _RECORD_HEADER.size
+                end = start + length
+
+                # 写者还没写完的记录, 下次再读
+                if end > size:
+                    break
+                with view[start:end] as data:
+                    if zlib.crc32(data) != crc:
+                        break
+
+                self.__index.setdefault(key, (start, length))
+                offset = end
+
+        self.__scanned = offset
+
+
+def _check_trusted(path, status):
+    '''
+        缓存的目录和文件必须属于当前用户, 并且组和其他用户不可写
+        见: 模块文档的安全说明
+    '''
+    if status.st_uid != os.getuid():
+        raise PermissionError(
+            'cache path is not owned by the current user: %s' % path
+        )
+
+    if status.st_mode & (stat.S_IWGRP | stat.S_IWOTH):
+        raise PermissionError(
+            'cache path is writable by group or others: %s' % path
+        )
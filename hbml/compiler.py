@@ -1,10 +1,21 @@
+import builtins
+import functools
 import io
-import uuid
+import itertools
+import re
+import threading
+import types
+import weakref
+from array import array
 
-from . import exceptions
-from .utils import memoized_property, html_escape
-from .parser.parser import Parser
-from . import lang_struct
+from . import exceptions, filters, minify
+from .utils import attribute, html_escape, indent_text, chunked
+from .source_map import SourceMap
+from .template import Template
+
+# 生成代码的格式版本, 修改了生成的代码、行号映射或者它依赖的辅助函数时加一
+# 缓存生成代码的地方以它区分旧的代码, 见: hbml.cache
+CODE_VERSION = 3
 
 
 class CompileWrapper(object):
@@ -16,71 +27,452 @@ class CompileWrapper(object):
         self.__source = source
         self.options = options
         self.__buffer = None
+        self.__pending = []
+        self.__loop_depth = 0
+        self.__loop_nesting = 0
+        self.__loop_helpers = (
+            options['optimize_loops'] or options['hoist_invariants']
+        )
+
+        # 模板代码读取的变量名, 在函数开头绑定为局部变量
+        self.names = set()
+
+        # 编译期常量, 见: constants选项
+        self.constants = dict(options['constants'])
+
+        # 编译期翻译, 见: translations选项和hbml.i18n
+        self.translations = None
+        if options['translations'] is not None:
+            self.translations = dict(options['translations'])
+
+        # 同一串if/elif/else中之前的分支的状态, 见: lang_struct.Expression
+        self.branch = None
+
+        # 提到循环外面的属性链的源代码 -> 局部变量名, 见: begin_hoisting
+        self.hoisted = {}
+        self.__hoisting_count = 0
+
+        # 每一级Python代码块开始时已经写出的行数
+        self.__block_starts = []
+
+        # 在循环中检查输出大小和渲染时间, 见: write_loop_check
+        self.__limited = _limits(options) is not None
+
+        # minify用的上下文: 下一个兄弟元素、当前子block之后是什么,
+        # 以及是否在空白有意义的标签内, 见: hbml.minify
+        self.next_sibling = minify.UNKNOWN
+        self.block_end = minify.UNKNOWN
+        self.preserve_whitespace = 0
+
+        # 生成的代码每一行对应的模板行号, 0表示没有对应的模板代码
+        # 编译结束后保留, 见: hbml.source_map
+        self.line_map = array('i')
 
     def compile(self):
         '将hbml源代码编译成一个Python函数'
 
+        function_name, function_code = self.generate()
+        return load_function(
+            function_name, function_code, self.options['sandbox']
+        )
+
+    def generate(self, name=None):
+        '''
+            将hbml源代码编译成Python函数的源代码
+            返回函数名和函数源代码
+            name用于函数名, 默认为name选项, 见: new_function_name
+            编译结束后释放源代码、语法树和中间缓冲区,
+            避免持有wrapper的对象把它们一直留在内存里
+        '''
+        try:
+            return self.__generate(with_header=True, name=name)
+        finally:
+            self.__release()
+
+    def generate_body(self):
+        '''
+            只生成函数体的源代码, 缩进为一级
+            增量编译时用于单独编译一个顶层block
+            见: hbml.incremental
+        '''
+        try:
+            return self.__generate(with_header=False)[1]
+        finally:
+            self.__release()
+
+    def generate_header(self, function_name, names=()):
+        '''
+            只生成函数的第一行和开头的准备工作
+            和generate_body生成的函数体拼接成完整的函数
+            names是各个函数体读取的变量名
+        '''
+        try:
+            self.names.update(names)
+            self.__indent_width = 0
+            self.__buffer = io.StringIO()
+            self.line_map = array('i')
+            self.write_function_header(function_name)
+            return self.__buffer.getvalue()
+        finally:
+            self.__release()
+
+    def __release(self):
+        self.__source = None
+        self.__buffer = None
+        self.__pending = []
+
+    def __generate(self, with_header, name=None):
         self.__clean_source()
 
         self.__indent_width = 0
         self.__output_indent_width = 0
+        self.__loop_depth = 0
+        self.__loop_nesting = 0
+        self.__block_starts = []
+        self.hoisted = {}
+        self.__hoisting_count = 0
         self.__buffer = io.StringIO()
+        self.line_map = array('i')
 
-        # 使用uuid生成一个唯一标识的函数名
-        function_name = ('template_%s' % uuid.uuid4()).replace('-', '_')
+        function_name = None
+        if with_header:
+            function_name = new_function_name(
+                self.__source, self.options, name
+            )
 
-        # 写下函数的第一行
-        self.writeline('def %s(buffer, **variables):' % function_name)
-
-        # 函数体之前要缩进一下
+        # 函数头要绑定函数体读取的变量, 先生成函数体
         self.indent()
 
-        # 将variables展开为变量
-        # TODO: 总感觉这样实现不够优雅
-        # 有空可以看看jinja2是怎么实现变量展开的
-        self.writeline('globals().update(variables)')
+        # 语法分析和语法结构只在真正编译时才需要, 这时才导入
+        # 只渲染已编译模板的进程不会加载ply
+        from . import lang_struct
 
         # 编译block
-        parser = Parser()
-        parse_result = parser.parse(self.__source)
+        parse_result = get_parser().parse(self.__source)
 
         lang = lang_struct.create(parse_result)
         lang.compile(self)
+        self.__flush_frame()
+
+        if with_header:
+            self.__prepend_function_header(function_name)
+
+        if with_header and self.options['batch']:
+            # 批量渲染的版本, 同一棵语法树再编译一次
+            # 见: Template.render_many
+            self.__indent_width = 0
+            self.write_batch_function_header(function_name + '_batch')
+            lang.compile(self)
+            self.write_batch_function_footer()
 
         # 全部编译完成后, self.__buffer中包含整个函数的源代码
-        # 调试时可直接输出function_code查看中间结果
-        function_code = self.__buffer.getvalue()
+        # 调试时可通过Template.function_code查看中间结果
+        return function_name, self.__buffer.getvalue()
+
+    def __prepend_function_header(self, function_name):
+        '把函数头写在已经生成的函数体之前'
+        body = self.__buffer.getvalue()
+        body_line_map = self.line_map
+
+        self.__indent_width = 0
+        self.__buffer = io.StringIO()
+        self.line_map = array('i')
+        self.write_function_header(function_name)
+
+        self.__buffer.write(body)
+        self.line_map.extend(body_line_map)
+
+    def write_function_header(self, function_name):
+        '''
+            写下函数的第一行和开头的准备工作
+            之后的代码缩进一级
+        '''
+        # 函数自己的参数和局部变量都以下划线开头, 不会和模板变量重名,
+        # _buffer只能按位置传入, 名为_buffer的模板变量同样进入_variables
+        self.writeline('def %s(_buffer, /, **_variables):' % function_name)
+
+        # 函数体之前要缩进一下
+        self.indent()
 
-        # 函数执行环境
-        # TODO: 为了防止注入攻击，函数执行环境要封闭起来
-        exec_env = {
-            'escape': html_escape,
-        }
+        # 只取一次write方法, 之后每个片段的输出都是对局部变量的调用
+        # 见: hbml.sinks.OutputSink
+        self.writeline('_write = _buffer.write')
 
-        # 调用Python解释器运行函数代码
-        exec(function_code, exec_env)
+        if self.__limited:
+            self.writeline('_check = _buffer.check')
+            self.writeline('_ticks = 0')
 
-        # 返回函数对象
-        return exec_env[function_name]
+        self.write_variables()
 
-    def writeline(self, source):
+    def write_variables(self, reset=False):
+        '''
+            把模板读取的变量从_variables绑定为局部变量, 常量直接赋值
+            模板函数的全局名字空间由同一个Environment的所有模板共用, 变量不写入其中
+            没有传入的变量不绑定, 读取时和普通的Python代码一样抛出NameError;
+            和内置函数、辅助函数同名的变量没有传入时使用原来的值
+            reset为True时(批量渲染的每条记录), 没有传入的变量要解除绑定,
+            不能沿用上一条记录的值
+        '''
+        for name in sorted(self.names - _RESERVED_NAMES):
+            if name in self.constants:
+                # 没有在编译期替换掉的常量, 例如出现在for语句里
+                self.writeline('%s = %r' % (name, self.constants[name]))
+            elif name in _DEFAULT_NAMES:
+                self.writeline('%s = _variables.get(%r, _defaults[%r])' % (
+                    name, name, name
+                ))
+            else:
+                self.writeline('if %r in _variables: %s = _variables[%r]' % (
+                    name, name, name
+                ))
+                if reset:
+                    self.writeline('else:')
+                    self.indent()
+                    self.writeline('try: del %s' % name)
+                    self.writeline('except NameError: pass')
+                    self.outdent()
+
+    def write_batch_function_header(self, function_name):
+        '''
+            批量渲染函数的开头
+            生成器函数, 对records中的每一组变量产出一个渲染结果
+            记录的循环在生成的代码内部, 静态片段是所有记录共用的常量
+        '''
+        self.writeline('def %s(_records):' % function_name)
+        self.indent()
+        self.writeline('for _variables in _records:')
+        self.indent()
+        self.writeline('_parts = []')
+        self.writeline('_write = _parts.append')
+        self.write_variables(reset=True)
+
+    def write_batch_function_footer(self):
+        empty = b'' if self.options['encoding'] else ''
+        self.writeline('yield %r.join(_parts)' % empty)
+        self.outdent()
+        self.outdent()
+
+    def writeline(self, source, lineno=0):
         '''
             写下一行
             要考虑当前的缩进
+            写之前先输出还没写出的静态文本
+            lineno是这行代码在模板中的行号
         '''
+        self.__flush_frame()
+        self.__writeline(source, lineno)
+
+    def __writeline(self, source, lineno=0):
         self.__buffer.write(' ' * self.__indent_width)
         self.__buffer.write(source)
         self.__buffer.write("\n")
 
+        # 跨行的代码(例如换行的属性值)每一行对应模板中连续的行
+        for i in range(source.count('\n') + 1):
+            self.line_map.append(lineno + i if lineno else 0)
+
+    def write_static(self, text, lineno=0):
+        '''
+            输出一段静态文本
+            相邻的静态文本(包括缩进和换行)在编译期合并,
+            只生成一次_write调用
+            lineno是产生这段文本的模板行号, 只有静态文本的帧对应其中第一行,
+            输出目标写入时抛出的异常也能对应到模板中的位置
+        '''
+        if text:
+            self.__pending.append((None, text, lineno))
+
+    def write_expr(self, expr, lineno=0):
+        '''
+            输出一个结果为str的Python表达式
+            指定了encoding时, 只有这部分动态的值需要在渲染时编码
+            循环体内的表达式先放进当前帧, 和前后的静态文本一起输出
+        '''
+        if self.__loop_depth and self.options['optimize_loops']:
+            self.__pending.append((expr, None, lineno))
+        else:
+            self.__flush_frame()
+            self.__writeline('_write(%s)' % self.__encode_expr(expr), lineno)
+
+    def __encode_expr(self, expr):
+        encoding = self.options['encoding']
+        if encoding:
+            return '(%s).encode(%r)' % (expr, encoding)
+
+        return expr
+
+    def __flush_frame(self):
+        '''
+            把当前帧写成一行_write
+            帧里只有静态文本时, 直接输出合并好的文本
+            有动态的值时, 静态文本组成格式化模板, 一次%运算得到整帧的输出,
+            每个值单独写一行, 出错时能对应到模板中的行
+            指定了encoding时, 静态文本在编译期就编码成bytes,
+            渲染时不需要再编码
+        '''
+        if not self.__pending:
+            return
+
+        items = self.__pending
+        self.__pending = []
+
+        exprs = [
+            (expr, lineno) for expr, text, lineno in items if expr is not None
+        ]
+
+        if not exprs:
+            text = ''.join(text for expr, text, lineno in items)
+        elif len(items) == 1:
+            expr, lineno = exprs[0]
+            self.__writeline('_write(%s)' % self.__encode_expr(expr), lineno)
+            return
+        else:
+            text = ''.join(
+                '%s' if expr is not None else text.replace('%', '%%')
+                for expr, text, lineno in items
+            )
+
+        encoding = self.options['encoding']
+        if encoding:
+            text = text.encode(encoding)
+
+        if not exprs:
+            lineno = next(
+                (lineno for expr, text, lineno in items if lineno), 0
+            )
+            self.__writeline('_write(%r)' % text, lineno)
+            return
+
+        self.__writeline('_write(%r %% (' % text, exprs[0][1])
+        self.__indent_width += self.options['indent_width']
+        for expr, lineno in exprs:
+            self.__writeline('%s,' % self.__encode_expr(expr), lineno)
+        self.__indent_width -= self.options['indent_width']
+        self.__writeline('))', exprs[-1][1])
+
+    def write_loop_check(self, lineno=0):
+        '''
+            在循环体的开头检查输出大小和渲染时间
+            每_CHECK_INTERVAL次迭代才调用一次check, 其余迭代只有一次加法和一次比较
+            写在开头而不是结尾, continue也不会跳过
+            lineno是循环语句的行号, 超出限制时指向这个循环
+            只检查最外层循环, 内层循环的每次迭代不再有额外的开销
+            没有指定限制时不生成任何代码
+        '''
+        if not self.__limited or self.__loop_nesting != 1:
+            return
+
+        self.writeline('_ticks += 1', lineno)
+        self.writeline(
+            'if not _ticks & %d: _check()' % (_CHECK_INTERVAL - 1), lineno
+        )
+
+    def add_names(self, names):
+        '记录模板代码读取的变量名, 见: write_variables'
+        self.names.update(names)
+
+    def begin_loop(self):
+        '''
+            进入一个循环
+            最外层循环之前把循环体要用的内置函数绑定为局部变量,
+            optimize_loops和hoist_invariants都会开启
+        '''
+        self.__loop_nesting += 1
+        if not self.__loop_helpers:
+            return
+
+        if self.__loop_depth == 0:
+            self.writeline('_str = str')
+            self.writeline('_escape = escape')
+            self.writeline('_attribute = attribute')
+
+        self.__loop_depth += 1
+
+    def end_loop(self):
+        self.__loop_nesting -= 1
+        if self.__loop_helpers:
+            self.__loop_depth -= 1
+
+    def begin_hoisting(self, chains, lineno=0):
+        '''
+            hoist_invariants选项: 循环不变的属性链只求值一次
+            chains是[(链的源代码, 根变量名, 模板行号)], 见: lang_struct._loop_invariants
+            在循环语句之前写出标志变量, 返回(标志变量名, [(局部变量名, 链, 行号)]);
+            之后循环体内的表达式中这些链都替换为局部变量, 直到end_hoisting
+            没有要提出的链时返回None
+        '''
+        assignments = []
+        for chain, root, chain_lineno in chains:
+            if chain in self.hoisted:
+                continue
+
+            name = '_hoisted_%d' % self.__hoisting_count
+            self.__hoisting_count += 1
+            self.hoisted[chain] = name
+            self.add_names([root])
+            assignments.append((name, chain, chain_lineno))
+
+        if not assignments:
+            return None
+
+        flag = '_first_%d' % self.__hoisting_count
+        self.writeline('%s = True' % flag, lineno)
+        return flag, assignments
+
+    def write_hoisting(self, hoisting):
+        '''
+            在循环体的开头写出属性链的求值
+            只在第一次迭代时求值: 循环一次也不执行时不会求值,
+            也就不会抛出原来不会出现的异常
+        '''
+        flag, assignments = hoisting
+        self.writeline('if %s:' % flag)
+        self.indent()
+        self.writeline('%s = False' % flag)
+        for name, chain, lineno in assignments:
+            self.writeline('%s = %s' % (name, chain), lineno)
+        self.outdent()
+
+    def end_hoisting(self, hoisting):
+        '循环结束, 之后的表达式不再使用begin_hoisting的局部变量'
+        if hoisting is None:
+            return
+
+        for name, chain, lineno in hoisting[1]:
+            del self.hoisted[chain]
+
+    def helper(self, name):
+        '''
+            生成代码中内置函数的名字
+            循环体内使用begin_loop绑定好的局部变量
+        '''
+        if self.__loop_depth:
+            return '_' + name
+
+        return name
+
     def indent(self):
-        '增加一级缩进'
+        '''
+            增加一级缩进
+            缩进变化之前的静态文本属于之前的代码块, 要先写出
+        '''
+        self.__flush_frame()
         self.__indent_width += self.options['indent_width']
+        self.__block_starts.append(len(self.line_map))
 
     def outdent(self):
         '''
             减少一级缩进
             如果结果小于0, 就报错
         '''
+        self.__flush_frame()
+
+        # 代码块的内容在编译期全部被消去时, 补上pass
+        if self.__block_starts and self.__block_starts.pop() == len(
+            self.line_map
+        ):
+            self.__writeline('pass')
+
         self.__indent_width -= self.options['indent_width']
 
         if self.__indent_width < 0:
@@ -104,9 +496,174 @@ class CompileWrapper(object):
             self.__source = self.__source + '\n'
 
 
+# 函数名中模板名的部分, 只保留能出现在标识符中的字符
+_NAME_PATTERN = re.compile(r'[^0-9a-zA-Z_]+')
+_NAME_MAX_LENGTH = 40
+
+
+def new_function_name(source, options, name=None):
+    '''
+        由模板名和源代码、编译选项的hash得到函数名
+        同样的模板总是得到同样的名字, profile和traceback里也能看出是哪个模板
+    '''
+    # 只在编译时用到, 不在导入hbml时加载
+    import hashlib
+
+    digest = hashlib.blake2b(digest_size=8)
+    digest.update(repr(sorted(options.items())).encode('utf-8'))
+    digest.update(source.encode('utf-8'))
+
+    name = _NAME_PATTERN.sub('_', name or options['name'] or '').strip('_')
+    if name:
+        return 'template_%s_%s' % (
+            name[-_NAME_MAX_LENGTH:].lstrip('_'), digest.hexdigest()
+        )
+
+    return 'template_%s' % digest.hexdigest()
+
+
+def load_function(function_name, function_code, sandboxed=False,
+                  filename='<string>', loader=None, environment=None):
+    '执行生成的源代码, 返回其中定义的模板函数'
+    return load_namespace(
+        function_code, sandboxed, filename, loader, environment
+    )[function_name]
+
+
+def load_namespace(function_code, sandboxed=False, filename='<string>',
+                   loader=None, environment=None):
+    '''
+        创建生成的源代码中定义的函数, 返回函数名 -> 函数的dict
+        函数的全局名字空间是environment的名字空间, 默认为default_environment
+        sandboxed为True时, 名字空间只提供白名单中的内置函数
+        见: hbml.sandbox
+        提供了loader时, 生成的代码以filename登记到linecache,
+        traceback中需要显示时才调用loader重新生成
+    '''
+    namespace = (environment or default_environment).namespace(sandboxed)
+
+    # 也可以直接传入编译好的code对象, 见: hbml.cache
+    if isinstance(function_code, str):
+        function_code = builtins.compile(function_code, filename, 'exec')
+
+    # 生成的代码只包含函数定义, 不执行模块代码,
+    # 直接用其中的code对象创建函数, 函数不留在共用的名字空间里
+    functions = {}
+    for const in function_code.co_consts:
+        if isinstance(const, types.CodeType):
+            functions[const.co_name] = types.FunctionType(const, namespace)
+
+    if loader is not None and functions:
+        # 模板函数释放后, linecache中的登记也随之删除
+        _register_source(filename, loader)
+        weakref.finalize(
+            next(iter(functions.values())), _unregister_source, filename
+        )
+
+    return functions
+
+
+# 同样的模板得到同样的文件名, 按文件名记录还有几个模板在使用linecache中的登记
+_source_references = {}
+# 释放模板函数的finalize可能在持有锁时由垃圾回收触发, 所以要可重入
+_source_references_lock = threading.RLock()
+
+
+def _register_source(filename, loader):
+    import linecache
+
+    with _source_references_lock:
+        count = _source_references.get(filename, 0)
+        if not count:
+            linecache.lazycache(filename, {
+                '__name__': filename,
+                '__loader__': _CodeLoader(loader),
+            })
+        _source_references[filename] = count + 1
+
+
+def _unregister_source(filename):
+    import linecache
+
+    with _source_references_lock:
+        count = _source_references.pop(filename, 1) - 1
+        if count:
+            _source_references[filename] = count
+        else:
+            linecache.cache.pop(filename, None)
+
+
+class _CodeLoader(object):
+    'linecache通过__loader__.get_source按需取得生成的代码'
+    __slots__ = ('loader', )
+
+    def __init__(self, loader):
+        self.loader = loader
+
+    def get_source(self, name):
+        return self.loader()
+
+
+def code_filename(function_name):
+    '''
+        生成的代码的文件名
+        linecache不会为<...>形式的文件名取源代码, 所以不用尖括号
+    '''
+    return 'hbml:%s' % function_name
+
+
+_parser_local = threading.local()
+
+
+def get_parser():
+    '''
+        创建yacc分析表的开销很大, 每个线程只创建一次Parser
+        ply的parser在一次parse中会把状态存在自身上, 所以不在线程间共享
+    '''
+    parser = getattr(_parser_local, 'parser', None)
+    if parser is None:
+        # 第一次编译时才导入ply, 见: CompileWrapper.__generate
+        from .parser.parser import Parser
+        parser = _parser_local.parser = Parser()
+
+    return parser
+
+
 _DEFAULT_OPTIONS = dict(
     indent_width=2,
-    compress_output=True
+    compress_output=True,
+    # 为True时, 由字符串编译的模板会保留源代码,
+    # 以便按需重新生成调试用的中间代码
+    debug=False,
+    # 指定encoding时, 模板直接输出编码后的bytes
+    encoding=None,
+    # 循环体内每次迭代的输出合并成一次_write
+    # 只在write的开销大的输出上有收益(例如直接写文件或socket),
+    # 输出到JoinSink等在内存中拼接的sink时反而略慢, 默认关闭
+    optimize_loops=False,
+    # 同时编译批量渲染的版本, 见: Template.render_many
+    batch=False,
+    # 受限的执行环境, 见: hbml.sandbox
+    sandbox=False,
+    # 模板名, 渲染出错时显示, 从文件编译时默认为文件路径
+    name=None,
+    # 编译期进一步压缩静态的html, 见: hbml.minify
+    minify=False,
+    # 渲染输出的最大长度(str按字符, bytes按字节)和最长渲染时间(秒)
+    # 超出时抛出RenderLimitError, 见: hbml.sinks.LimitedSink
+    max_output_size=None,
+    max_render_time=None,
+    # 编译期常量, 名字 -> 标量值, 例如dict(DEBUG=False, LOCALE='en')
+    # 表达式中的常量在编译期替换和折叠, 条件为常量的if分支在编译期选定
+    constants=(),
+    # 循环体中每次迭代都要求值、根变量在循环中不被赋值的属性链(例如 user.profile.name)
+    # 只在第一次迭代时求值一次, 见: CompileWrapper.begin_hoisting
+    # 假设属性访问没有副作用, 并且循环中属性的值不变
+    hoist_invariants=False,
+    # 编译期翻译, 原文 -> 译文, 见: hbml.i18n
+    # 指定时, 静态文本、标签文本和 _('...') 的字面量在编译期替换为译文,
+    # 没有译文的保持原文; 为None时 _() 照常在渲染时调用
+    translations=None,
 )
 
 
@@ -120,32 +677,271 @@ def _fill_options(options):
         if k not in result:
             result[k] = v
 
+    # minify总是在压缩输出的基础上进行
+    if result['minify']:
+        result['compress_output'] = True
+
+    # 常量按名字排序后存为元组, 选项可以作为hash的key,
+    # 同一组常量的模板得到同样的函数名和缓存key
+    constants = dict(result['constants'] or ())
+    for name, value in constants.items():
+        if not isinstance(value, _CONSTANT_TYPES):
+            raise exceptions.CompileError(
+                'constant %s must be a str, bytes, number, bool or None, '
+                'got %s' % (name, type(value).__name__)
+            )
+    result['constants'] = tuple(sorted(constants.items()))
+
+    # 译文和常量一样存为排序后的元组
+    if result['translations'] is not None:
+        translations = dict(result['translations'])
+        for message, translation in translations.items():
+            if not isinstance(message, str) or \
+                    not isinstance(translation, str):
+                raise exceptions.CompileError(
+                    'translation of %r must be a str, got %s' % (
+                        message, type(translation).__name__
+                    )
+                )
+        result['translations'] = tuple(sorted(translations.items()))
+
+    # 批量渲染把所有记录写进同一个函数的局部list, 没有可以检查的输出目标
+    if result['batch'] and _limits(result) is not None:
+        raise exceptions.CompileError(
+            'output limits are not supported with batch rendering'
+        )
+
     return result
 
 
-def compile(source, variables=None, output=None, **options):
-    options = _fill_options(options)
+def _limits(options):
+    '(最大输出长度, 最长渲染时间), 都没有指定时为None'
+    if options['max_output_size'] is None and \
+            options['max_render_time'] is None:
+        return None
+
+    return options['max_output_size'], options['max_render_time']
+
+
+_CONSTANT_TYPES = (str, bytes, int, float, bool, type(None))
+
 
-    if variables is None:
-        variables = {}
+def _generate_code(source, options):
+    'debug用: 重新生成模板函数的源代码'
+    return CompileWrapper(source, options).generate()[1]
 
-    # 创建一个编译时环境，用于保存编译过程中的相关数据
-    env = CompileWrapper(source, options)
-    # 中间的编译结果是一个Python函数
-    template_function = env.compile()
 
-    if output:
-        template_function(output, **variables)
+def _generate_file_code(path, options):
+    'debug用: 重新读取模板文件并生成模板函数的源代码'
+    with open(path, 'r', encoding='utf-8') as f:
+        return CompileWrapper(f.read(), options).generate(path)[1]
+
+
+class Environment(object):
+    '''
+        模板的执行环境
+        同一个Environment编译的模板共用一个模块式的全局名字空间,
+        其中只有内置函数和生成的代码用到的辅助函数;
+        模板变量在函数开头绑定为局部变量, 不写入这个名字空间
+        编译大量小模板时, 不需要为每个模板各建一个globals
+
+            env = Environment()
+            templates = [env.compile_template(source) for source in sources]
+
+        hbml.compile_template等函数使用default_environment
+    '''
+    def __init__(self):
+        # sandboxed -> 名字空间
+        self.__namespaces = {}
+
+    def namespace(self, sandboxed=False):
+        '模板函数的全局名字空间, 受限的执行环境另用一个'
+        namespace = self.__namespaces.get(sandboxed)
+        if namespace is None:
+            # 多个线程同时第一次编译时, 只有一个名字空间会被留下
+            namespace = self.__namespaces.setdefault(
+                sandboxed, _create_namespace(sandboxed)
+            )
+
+        return namespace
+
+    def compile_template(self, source, **options):
+        '''
+            将源代码编译为Template对象
+            Template只持有渲染所需的函数
+        '''
+        options = _fill_options(options)
+
+        # 创建一个编译时环境，用于保存编译过程中的相关数据
+        # 编译完成后env即被丢弃, 只留下行号映射
+        env = CompileWrapper(source, options)
+        function_name, function_code = env.generate()
+
+        loader = None
+        if options['debug']:
+            loader = functools.partial(_generate_code, source, options)
+
+        source_map = SourceMap(
+            options['name'] or '<template>',
+            code_filename(function_name),
+            env.line_map,
+            source if options['debug'] else None
+        )
+
+        return _create_template(
+            function_name, function_code, loader, options, source_map, self
+        )
+
+    def compile_template_file(self, path, **options):
+        '''
+            将模板文件编译为Template对象
+            调试信息需要时从文件重新生成, 只需保留文件路径
+        '''
+        options = _fill_options(options)
+
+        with open(path, 'r', encoding='utf-8') as f:
+            env = CompileWrapper(f.read(), options)
+            function_name, function_code = env.generate(path)
+
+        source_map = SourceMap(
+            options['name'] or path,
+            code_filename(function_name),
+            env.line_map
+        )
+
+        return _create_template(
+            function_name,
+            function_code,
+            functools.partial(_generate_file_code, path, options),
+            options,
+            source_map,
+            self
+        )
+
+
+# 生成的代码用到的辅助函数
+_HELPERS = {
+    'escape': html_escape,
+    'attribute': attribute,
+    '_indent': indent_text,
+    '_filters': filters.registry,
+}
+
+# 和这些名字同名的模板变量没有传入时, 使用名字空间里原来的值
+_DEFAULT_NAMES = frozenset(dir(builtins)) | frozenset(_HELPERS)
+
+# 生成的函数自己的局部变量, 不能被模板变量覆盖
+_RESERVED_NAMES = frozenset([
+    '_buffer', '_variables', '_records', '_parts', '_write', '_check',
+    '_ticks'
+])
+
+# 循环每迭代这么多次检查一次限制, 必须是2的幂
+_CHECK_INTERVAL = 128
+
+
+def _create_namespace(sandboxed):
+    namespace = dict(_HELPERS)
+
+    if sandboxed:
+        from . import sandbox
+        namespace['__builtins__'] = sandbox.SAFE_BUILTINS
+        defaults = dict(sandbox.SAFE_BUILTINS)
     else:
-        buffer = io.StringIO()
-        # 执行编译出来的函数，传入外部变量
-        template_function(buffer, **variables)
+        defaults = dict(vars(builtins))
+
+    defaults.update(_HELPERS)
+    namespace['_defaults'] = defaults
+    return namespace
+
+
+default_environment = Environment()
+
+
+def compile_template(source, **options):
+    '''
+        将源代码编译为Template对象
+        见: Environment.compile_template
+    '''
+    return default_environment.compile_template(source, **options)
 
-        # 如果未提供output，则单纯地返回编译结果字符串
-        return buffer.getvalue()
+
+def _create_template(function_name, function_code, loader, options,
+                     source_map, environment=None):
+    functions = load_namespace(
+        function_code, options['sandbox'], source_map.filename, loader,
+        environment
+    )
+
+    return Template(
+        functions[function_name],
+        loader,
+        options['encoding'],
+        functions.get(function_name + '_batch'),
+        source_map,
+        _limits(options)
+    )
+
+
+def compile_template_file(path, **options):
+    '''
+        将模板文件编译为Template对象
+        见: Environment.compile_template_file
+    '''
+    return default_environment.compile_template_file(path, **options)
+
+
+def compile(source, variables=None, output=None, **options):
+    # 中间的编译结果是一个Template对象
+    # 如果未提供output，则单纯地返回编译结果字符串
+    return compile_template(source, **options).render(variables, output)
 
 
 def compile_file(path, variables=None, **options):
     'compile from a file'
     with open(path, 'r', encoding='utf-8') as f:
         return compile(f.read(), variables, **options)
+
+
+def render_many(source, records, executor=None, chunk_size=1000, **options):
+    '''
+        把同一个模板对records中的每一组变量各渲染一次, 返回结果列表
+        executor可以是线程池或进程池,
+        使用进程池时每个进程各自编译一次模板
+    '''
+    # concurrent.futures会导入logging等模块, 只在用到时导入
+    import concurrent.futures
+
+    options['batch'] = True
+    options = _fill_options(options)
+
+    if isinstance(executor, concurrent.futures.ProcessPoolExecutor):
+        results = executor.map(
+            _render_chunk,
+            itertools.repeat(source),
+            itertools.repeat(options),
+            chunked(records, chunk_size)
+        )
+        return list(itertools.chain.from_iterable(results))
+
+    template = compile_template(source, **options)
+    return template.render_many(records, executor, chunk_size)
+
+
+# 进程池的每个工作进程里已经编译好的模板
+_worker_templates = {}
+_WORKER_TEMPLATES_MAX_SIZE = 64
+
+
+def _render_chunk(source, options, records):
+    key = (source, tuple(sorted(options.items())))
+    template = _worker_templates.get(key)
+    if template is None:
+        if len(_worker_templates) >= _WORKER_TEMPLATES_MAX_SIZE:
+            _worker_templates.clear()
+
+        template = _worker_templates[key] = compile_template(
+            source, **options
+        )
+
+    return template.render_many(records)
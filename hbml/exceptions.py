@@ -4,3 +4,54 @@ class Base(Exception):
 
 class CompileError(Base):
     pass
+
+
+class BufferOverflowError(Base):
+    pass
+
+
+class TemplateSyntaxError(CompileError):
+    '''
+        模板中的Python代码有语法错误
+        lineno是出错代码在模板中的行号
+    '''
+    def __init__(self, message, lineno=None, text=None):
+        super().__init__(message, lineno, text)
+        self.message = message
+        self.lineno = lineno
+        self.text = text
+
+    def __str__(self):
+        result = self.message
+        if self.lineno is not None:
+            result = 'line %d: %s' % (self.lineno, result)
+        if self.text:
+            result = '%s\n    %s' % (result, self.text)
+
+        return result
+
+
+class SandboxError(TemplateSyntaxError):
+    '模板中的Python代码使用了sandbox不允许的名字、属性或语句'
+
+
+class RenderLimitError(Base):
+    '''
+        渲染超出了max_output_size或max_render_time的限制, 渲染被中止
+        reason:    'size'或'time'
+        size:      中止时已经输出的长度, str输出按字符计, bytes输出按字节计
+        fragments: 已经输出的片段数
+        elapsed:   已经用去的渲染时间(秒)
+    '''
+    def __init__(self, reason, size, fragments, elapsed):
+        super().__init__(reason, size, fragments, elapsed)
+        self.reason = reason
+        self.size = size
+        self.fragments = fragments
+        self.elapsed = elapsed
+
+    def __str__(self):
+        return 'render %s limit exceeded: %d written in %d fragments, ' \
+            '%.3fs elapsed' % (
+                self.reason, self.size, self.fragments, self.elapsed
+            )
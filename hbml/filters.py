@@ -0,0 +1,144 @@
+'''
+    过滤器
+
+    标签后面的 :name 表示用过滤器处理标签下的文本, 例如
+
+        %style:css
+          body {
+            margin: 0;
+          }
+
+    过滤器是一个str -> str的函数, 用register_filter注册
+    static=True的过滤器在编译期运行一次, 结果作为静态文本嵌入模板,
+    并按(过滤器名, 文本内容的hash)缓存, 多个模板中相同的内容只处理一次
+    其余过滤器在每次渲染时对文本调用一次
+'''
+import re
+import textwrap
+
+from . import exceptions
+
+
+class Filter(object):
+    __slots__ = ('name', 'function', 'static')
+
+    def __init__(self, name, function, static):
+        self.name = name
+        self.function = function
+        self.static = static
+
+    def __call__(self, text):
+        return self.function(text)
+
+
+# 过滤器名 -> Filter, 生成的代码在渲染时也从这里取非static的过滤器
+registry = {}
+
+
+def register_filter(name, function=None, static=False):
+    '''
+        注册一个过滤器, 同名的过滤器会被替换
+        可以直接调用, 也可以作为装饰器使用:
+
+            @register_filter('upper', static=True)
+            def upper(text):
+                return text.upper()
+    '''
+    if function is None:
+        return lambda function: register_filter(name, function, static)
+
+    registry[name] = Filter(name, function, static)
+
+    # 同名的过滤器换了实现, 之前缓存的结果不再有效
+    _static_cache.clear()
+    return function
+
+
+def get_filter(name):
+    '按名字取得过滤器, 没有注册时返回None'
+    return registry.get(name)
+
+
+# (过滤器名, 文本的hash) -> 过滤结果
+_static_cache = {}
+_STATIC_CACHE_MAX_SIZE = 1024
+
+
+def apply_static(filter, text):
+    '在编译期运行static过滤器, 相同的内容只运行一次'
+    import hashlib
+
+    key = (
+        filter.name,
+        hashlib.blake2b(text.encode('utf-8'), digest_size=16).digest()
+    )
+
+    result = _static_cache.get(key)
+    if result is None:
+        result = filter(text)
+        if len(_static_cache) >= _STATIC_CACHE_MAX_SIZE:
+            _static_cache.clear()
+        _static_cache[key] = result
+
+    return result
+
+
+def _plain(text):
+    '这个filter表示将内容不作处理原样输出'
+    return text
+
+
+def _collapse(text):
+    '把连续的空白(包括换行)合并成一个空格'
+    return ' '.join(text.split())
+
+
+_CSS_COMMENT_PATTERN = re.compile(r'/\*.*?\*/', re.S)
+# 这些符号两边的空白可以去掉
+# 不包括 : + ~, 它们两边的空白在选择器或calc()里有意义
+_CSS_PUNCTUATION_PATTERN = re.compile(r'\s*([{};,>])\s*')
+
+
+def _css(text):
+    '压缩CSS: 去掉注释和多余的空白'
+    text = _CSS_COMMENT_PATTERN.sub('', text)
+    text = ' '.join(text.split())
+    text = _CSS_PUNCTUATION_PATTERN.sub(r'\1', text)
+    return text.replace(';}', '}')
+
+
+def _js(text):
+    '''
+        保守地压缩JavaScript: 去掉每行的缩进、空行和整行的//注释
+        保留换行, 不影响自动插入分号
+        跨行的模板字符串会被去掉缩进, 这种脚本请使用:plain
+    '''
+    lines = []
+    for line in text.splitlines():
+        line = line.strip()
+        if line and not line.startswith('//'):
+            lines.append(line)
+
+    return '\n'.join(lines)
+
+
+def _markdown(text):
+    '''
+        markdown转换为html, 需要安装markdown
+        markdown本身导入很慢, 第一次用到这个过滤器时才导入
+    '''
+    try:
+        import markdown
+    except ImportError:
+        raise exceptions.CompileError(
+            'the markdown filter requires the markdown package'
+        )
+
+    return markdown.markdown(textwrap.dedent(text))
+
+
+register_filter('plain', _plain, static=True)
+register_filter('collapse', _collapse, static=True)
+register_filter('css', _css, static=True)
+register_filter('js', _js, static=True)
+register_filter('markdown', _markdown, static=True)
@@ -0,0 +1,204 @@
+'''
+    国际化
+
+    模板中要翻译的原文有:
+      * 普通文本行和标签后面的文本, 一行是一条原文
+      * 表达式、属性值和简单语句中 _("...") 调用的字符串字面量
+    extract_messages在编译期把它们提取出来, format_pot生成gettext的.pot文件,
+    交给翻译工具得到各个语言的译文
+
+    编译时指定translations选项, 原文在编译期就被替换为译文:
+    每个语言各编译一个模板函数, 本地化的静态文本和没有本地化的文本一样是静态文本,
+    渲染时没有任何查找
+
+        template = LocalizedTemplate.from_file('index.hbml', {
+            'de': gettext.translation('site', 'locale', ['de']),
+            'fr': {'Hello': 'Bonjour'},
+        })
+        html = template.render('de', variables)
+
+    过滤器下面的文本、复合语句(for、if等)中的 _() 不翻译;
+    参数不是字符串字面量的 _() 照常在渲染时调用, 复数形式也需要在渲染时处理
+'''
+import ast
+
+from . import analysis
+from .compiler import compile_template, get_parser
+
+
+def message_text(text):
+    '''
+        静态文本中要翻译的原文: 去掉首尾的空白
+        不含字母的文本(例如标点和数字)不需要翻译, 返回None
+    '''
+    message = text.strip()
+    if any(c.isalpha() for c in message):
+        return message
+
+
+def extract_messages(source):
+    '''
+        提取模板中要翻译的原文
+        返回[(行号, 原文)], 按在模板中出现的顺序, 同一条原文出现几次就有几项
+    '''
+    if not source.endswith('\n'):
+        source = source + '\n'
+
+    result = []
+    _extract(get_parser().parse(source), result)
+    return result
+
+
+def _extract(tree, result):
+    if tree[0] == 'multi_blocks':
+        for sub_tree in tree[1]:
+            _extract(sub_tree, result)
+        return
+
+    head, body = tree[1], tree[2]
+    if head[0] == 'plaintext':
+        _add_text(head[1], head[2], result)
+    elif head[0] == 'tag':
+        if head[2]:
+            for _, key, val, lineno in head[2][1]:
+                node = analysis.parse_expression(val, lineno)
+                _add_messages(node, lineno, result)
+
+        if head[3] and head[3] != '/':
+            _add_text(ast.literal_eval(head[3]), head[4], result)
+
+        # 过滤器下面的文本不翻译
+        if any(brief[1] == ':' for brief in head[1][1]):
+            return
+    elif head[0] == 'expression':
+        expr_type, expr_body, lineno = head[1:]
+        if expr_type == 'EXPR_FLAG':
+            node, compound = analysis.parse_statement(expr_body, lineno)
+            if node is not None and not compound:
+                _add_messages(node, lineno, result)
+        else:
+            node = analysis.parse_expression(expr_body, lineno)
+            _add_messages(node, lineno, result)
+
+    if body:
+        _extract(body, result)
+
+
+def _add_text(text, lineno, result):
+    message = message_text(text)
+    if message:
+        result.append((lineno, message))
+
+
+def _add_messages(node, lineno, result):
+    for message in analysis.messages(node):
+        result.append((lineno, message))
+
+
+def format_pot(entries):
+    '''
+        生成gettext的.pot文件的内容
+        entries是[(文件名, 行号, 原文)], 同一条原文只输出一次, 列出所有出现的位置
+
+            entries = [
+                (path, lineno, message)
+                for path in paths
+                for lineno, message in extract_messages(read(path))
+            ]
+    '''
+    references = {}
+    for filename, lineno, message in entries:
+        references.setdefault(message, []).append(
+            '%s:%d' % (filename, lineno)
+        )
+
+    lines = [
+        'msgid ""',
+        'msgstr ""',
+        '"Content-Type: text/plain; charset=UTF-8\\n"',
+        '',
+    ]
+    for message, locations in references.items():
+        lines.append('#: %s' % ' '.join(locations))
+        lines.append('msgid %s' % _po_string(message))
+        lines.append('msgstr ""')
+        lines.append('')
+
+    return '\n'.join(lines)
+
+
+def _po_string(text):
+    return '"%s"' % (
+        text.replace('\\', '\\\\').replace('"', '\\"')
+        .replace('\n', '\\n').replace('\t', '\\t')
+    )
+
+
+class LocalizedTemplate(object):
+    '''
+        一个模板的各个语言的版本
+        translations是语言 -> 译文, 译文可以是原文 -> 译文的dict,
+        也可以是有gettext方法的对象, 例如gettext.GNUTranslations
+        每个语言第一次用到时编译一次, 之后使用缓存的Template
+        translations中没有的语言输出原文, 共用同一个Template
+    '''
+    def __init__(self, source, translations, **options):
+        self.__source = source
+        self.translations = dict(translations)
+        self.options = options
+
+        # 模板中的原文, 去掉重复
+        self.messages = list(dict.fromkeys(
+            message for lineno, message in extract_messages(source)
+        ))
+
+        # 语言 -> Template, None是原文的版本
+        self.__templates = {}
+
+    @classmethod
+    def from_file(cls, path, translations, **options):
+        '从模板文件创建, 模板名默认为文件路径'
+        with open(path, 'r', encoding='utf-8') as f:
+            source = f.read()
+
+        options.setdefault('name', path)
+        return cls(source, translations, **options)
+
+    def catalog(self, locale):
+        '模板中的原文在这个语言中的译文, 原文 -> 译文, 没有译文的原文不在其中'
+        translations = self.translations.get(locale)
+        if translations is None:
+            return {}
+
+        gettext = getattr(translations, 'gettext', None)
+
+        result = {}
+        for message in self.messages:
+            if gettext is not None:
+                translation = gettext(message)
+            else:
+                translation = translations.get(message)
+
+            if translation and translation != message:
+                result[message] = translation
+
+        return result
+
+    def template(self, locale):
+        '这个语言的Template'
+        if locale not in self.translations:
+            locale = None
+
+        template = self.__templates.get(locale)
+        if template is None:
+            # 多个线程同时编译同一个语言时, 只有一个会被留下
+            template = self.__templates.setdefault(locale, compile_template(
+                self.__source, translations=self.catalog(locale),
+                **self.options
+            ))
+
+        return template
+
+    def render(self, locale, variables=None, output=None):
+        '用这个语言的版本渲染, 见: Template.render'
+        return self.template(locale).render(variables, output)
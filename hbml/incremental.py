@@ -0,0 +1,267 @@
+'''
+    开发环境和热加载用的增量编译
+
+    模板按顶层block切分: HbmlLexer的缩进栈回到0、
+    并且不在属性列表等多行结构之内的行开始一个新的顶层block,
+    它后面缩进的行(子元素, 过滤器内容)和换行的属性都属于这个block, 见: _split
+
+    每个顶层block生成的函数体代码和行号映射按block的源代码缓存,
+    修改模板后只有内容变化了的block需要重新语法分析和生成代码,
+    其余block直接复用缓存的代码拼接成新的模板函数
+    minify省略结束标签要看下一个兄弟元素, 所以block之后的标签名也计入缓存的key
+'''
+import functools
+import re
+
+from . import exceptions, minify
+from .compiler import (
+    CompileWrapper, _fill_options, _limits, code_filename, load_function,
+    new_function_name
+)
+from .source_map import SourceMap
+from .template import Template
+
+
+# 这些子句和前面的语句是一个整体, 不能单独编译
+_CLAUSE_PATTERN = re.compile(r'-\s*(elif|else|except|finally)\b')
+
+
+# 标签开头的简写: %tag .class #id :filter
+_BRIEF_TOKENS = frozenset(['PERCENTAGE', 'DOT', 'SHARP', 'COLON'])
+
+# 换行和缩进变化的token位置在换行符上, 不是一行的内容
+_LAYOUT_TOKENS = frozenset(['NEWLINE', 'INDENT', 'OUTDENT'])
+
+
+def split_blocks(source):
+    '''
+        把源代码切分成顶层block的源代码列表
+        空行归属于前一个block; elif、else等子句归属于前面的语句所在的block
+    '''
+    return [block for block, tag_name in _split(source, {})]
+
+
+def _split(source, lexed):
+    '''
+        返回[(顶层block的源代码, 它的第一个元素的标签名)]
+        标签名和lang_struct._tag_name相同, 不是标签时为minify.UNKNOWN
+
+        缩进为0的行是可能的block边界, 每一段单独做词法分析:
+        前一段结束时HbmlLexer回到了初始状态(不在属性列表之内)、缩进栈回到0,
+        之后的一段单独分析和在整个模板中分析的结果相同, 边界成立;
+        否则和之后的一段合并, 再做一次词法分析
+        lexed是段的源代码 -> _lex_block的结果, 增量编译时复用没有变化的段
+    '''
+    result = []
+    pending = ''
+    for chunk in _split_lines(source):
+        pending += chunk
+
+        summary = lexed.get(pending)
+        if summary is None:
+            summary = lexed[pending] = _lex_block(pending)
+
+        closed, tag_name = summary
+        if closed:
+            result.append((pending, tag_name))
+            pending = ''
+
+    # 到结尾都没有闭合, 留给编译报告错误
+    if pending:
+        result.append((pending, minify.UNKNOWN))
+
+    return result
+
+
+def _split_lines(source):
+    '按缩进为0的行切分, elif、else等子句和前面的行在一起'
+    lines = []
+    for line in source.splitlines(True):
+        if (
+            lines and line[:1] not in (' ', '\n', '\r', '') and
+            not _CLAUSE_PATTERN.match(line)
+        ):
+            yield ''.join(lines)
+            lines = []
+
+        lines.append(line)
+
+    if lines:
+        yield ''.join(lines)
+
+
+def _lex_block(source):
+    '''
+        对一段源代码做词法分析, 返回(是否闭合, 第一个元素的标签名)
+        结束时还在属性列表之内或者有词法错误时不闭合
+    '''
+    from .parser.lexer import HbmlLexer
+
+    lexer = HbmlLexer()
+    lexer.input(source)
+
+    # 只保留开头的几个token, 足够确定标签名
+    tokens = []
+    try:
+        for token in lexer:
+            if (
+                len(tokens) < 2 * len(_BRIEF_TOKENS) and
+                token.type not in _LAYOUT_TOKENS
+            ):
+                tokens.append(token)
+    except ValueError:
+        return False, minify.UNKNOWN
+
+    if lexer.lexer.current_state().startswith('tagattr'):
+        return False, minify.UNKNOWN
+
+    return True, _tag_name(tokens, 0)
+
+
+def _tag_name(tokens, index):
+    'tokens[index]开始的元素的标签名'
+    if index >= len(tokens) or tokens[index].type not in _BRIEF_TOKENS:
+        return minify.UNKNOWN
+
+    while (
+        index + 1 < len(tokens) and tokens[index].type in _BRIEF_TOKENS and
+        tokens[index + 1].type == 'KEYWORD'
+    ):
+        if tokens[index].type == 'PERCENTAGE':
+            return tokens[index + 1].value
+        index += 2
+
+    from .lang_struct import Tag
+    return Tag._DEFAULT_TAG_NAME
+
+
+class IncrementalCompiler(object):
+    '''
+        增量编译器
+        同一个模板反复修改、反复编译时使用,
+        每个实例对应一个模板
+
+            compiler = IncrementalCompiler(compress_output=False)
+            template = compiler.compile(source)
+            ...
+            template = compiler.compile(edited_source)
+    '''
+    def __init__(self, **options):
+        self.options = _fill_options(options)
+
+        # (顶层block源代码, 之后的标签名) -> 函数体代码
+        self.__cache = {}
+
+        # 段的源代码 -> 词法分析的结果, 见: _split
+        self.__lexed = {}
+
+        # 最近一次编译中复用和重新编译的block数
+        self.reused_count = 0
+        self.compiled_count = 0
+
+    def compile(self, source):
+        'compile source to a Template, reusing unchanged top-level blocks'
+        if not source.endswith('\n'):
+            source = source + '\n'
+
+        lexed = dict(self.__lexed)
+        split = _split(source, lexed)
+
+        # 只保留当前版本的block的词法分析结果
+        self.__lexed = dict(
+            (block, lexed[block]) for block, tag_name in split
+            if block in lexed
+        )
+
+        # 每个block之后的兄弟元素的标签名, 只有minify时才影响生成的代码
+        # block和它一起作为缓存的key
+        blocks = []
+        for i, (block, tag_name) in enumerate(split):
+            next_sibling = minify.UNKNOWN
+            if self.options['minify'] and i + 1 < len(split):
+                next_sibling = split[i + 1][1]
+            blocks.append((block, next_sibling))
+
+        cache = {}
+        self.reused_count = 0
+        self.compiled_count = 0
+
+        # 每个block的第一行在整个模板中的行号
+        linenos = []
+        first_lineno = 1
+        for block, next_sibling in blocks:
+            linenos.append(first_lineno)
+            first_lineno += block.count('\n')
+
+        for block, lineno in zip(blocks, linenos):
+            if block in cache:
+                continue
+
+            compiled = self.__cache.get(block)
+            if compiled is None:
+                compiled = self.__compile_block(block, lineno)
+                self.compiled_count += 1
+            else:
+                self.reused_count += 1
+
+            cache[block] = compiled
+
+        # 只保留当前版本用到的block, 旧版本的缓存随之释放
+        self.__cache = cache
+
+        function_name = new_function_name(source, self.options)
+        header = CompileWrapper('', self.options)
+        function_code = [header.generate_header(function_name, set().union(
+            *(cache[block][2] for block in cache)
+        ))]
+
+        # block的行号映射从1开始, 拼接时换算成整个模板中的行号
+        line_map = header.line_map
+        for block, lineno in zip(blocks, linenos):
+            body, block_line_map, names = cache[block]
+            function_code.append(body)
+            line_map.extend(
+                n + lineno - 1 if n else 0 for n in block_line_map
+            )
+        function_code = ''.join(function_code)
+
+        loader = None
+        if self.options['debug']:
+            loader = functools.partial(str, function_code)
+
+        source_map = SourceMap(
+            self.options['name'] or '<template>',
+            code_filename(function_name),
+            line_map,
+            source if self.options['debug'] else None
+        )
+
+        return Template(
+            load_function(
+                function_name,
+                function_code,
+                self.options['sandbox'],
+                source_map.filename,
+                loader
+            ),
+            loader,
+            self.options['encoding'],
+            source_map=source_map,
+            limits=_limits(self.options)
+        )
+
+    def __compile_block(self, block, lineno):
+        '''
+            编译一个顶层block, block是(源代码, 之后的标签名)
+            返回函数体代码、block内的行号映射和读取的变量名
+        '''
+        source, next_sibling = block
+        env = CompileWrapper(source, self.options)
+        env.block_end = next_sibling
+        try:
+            return env.generate_body(), env.line_map, env.names
+        except exceptions.TemplateSyntaxError as e:
+            # block单独编译时的行号从1开始, 换算成整个模板中的行号
+            if e.lineno is not None:
+                e.lineno += lineno - 1
+            raise
@@ -1,3 +1,9 @@
+import ast
+
+from . import analysis, exceptions, filters, i18n, minify, sandbox
+from .utils import attribute, html_escape, indent_text
+
+
 class LangStructBase(object):
     def __init__(self, parse_tree):
         self._parse_tree = parse_tree
@@ -14,6 +20,9 @@ class Tag(LangStructBase):
 
         attrs = []
 
+        # minify时决定能否省略结束标签, 要在编译子元素之前取得
+        next_sibling = env.next_sibling
+
         for brief in self._parse_tree[1][1]:
             # 按brief的第一个字符区分含义
             # # 表示id
@@ -31,18 +40,20 @@ class Tag(LangStructBase):
                 _filter = brief[2]
 
         # 将id和class names拼装成和tag_attrs相同的格式
+        tag_lineno = self._parse_tree[4]
         if _id:
-            attrs.append(('id', '"%s"' % _id))
+            attrs.append(('id', '"%s"' % _id, tag_lineno))
         if class_names:
             attrs.append((
                 'class',
-                '"%s"' % ' '.join(class_names)
+                '"%s"' % ' '.join(class_names),
+                tag_lineno
             ))
 
         tag_attrs = self._parse_tree[2]
         if tag_attrs:
             for attr in tag_attrs[1]:
-                attrs.append((attr[1], attr[2]))
+                attrs.append((attr[1], attr[2], attr[3]))
 
         tag_text = self._parse_tree[3]
         self_closing = False
@@ -54,109 +65,491 @@ class Tag(LangStructBase):
 
         # output indent
         if not env.options['compress_output']:
-            env.writeline("buffer.write('%s')" % (' ' * env.output_indent))
+            env.write_static(' ' * env.output_indent, tag_lineno)
+
+        _minify = env.options['minify']
+        preserve_whitespace = tag_name in minify.WHITESPACE_SENSITIVE_TAGS
+        if preserve_whitespace:
+            env.preserve_whitespace += 1
 
         # 输出编译结果
-        if attrs:
-            env.writeline("buffer.write('<%s')" % tag_name)
-            for key, val in attrs:
-                env.writeline("buffer.write(' %s=')" % key)
-                env.writeline('''buffer.write('"')''')
-                env.writeline(
-                    r'''buffer.write(str(%s).replace('"', r'\"'))''' % val
-                )
-                env.writeline('''buffer.write('"')''')
+        env.write_static('<%s' % tag_name, tag_lineno)
+        for key, val, lineno in attrs:
+            _compile_attr(key, val, lineno, env)
 
-            if self_closing:
-                env.writeline("buffer.write(' />')")
-            else:
-                env.writeline("buffer.write('>')")
+        if not self_closing:
+            env.write_static('>', tag_lineno)
+        elif _minify and tag_name in minify.VOID_TAGS:
+            env.write_static('>', tag_lineno)
         else:
-            if self_closing:
-                env.writeline("buffer.write('<%s />')" % tag_name)
-            else:
-                env.writeline("buffer.write('<%s>')" % tag_name)
+            env.write_static(' />', tag_lineno)
 
         if tag_text:
-            env.writeline("buffer.write(%s)" % tag_text)
+            # tag_text是文本的Python字面量, 见parser.p_tag_tail_text
+            env.write_static(
+                _text(_translate(ast.literal_eval(tag_text), env), env),
+                tag_lineno
+            )
 
         if block:
             if not env.options['compress_output']:
-                env.writeline("buffer.write('\\n')")
+                env.write_static('\n', tag_lineno)
                 env.indent_output()
 
+            # 子元素中最后一个的后面是这个标签的结束
+            block_end = env.block_end
+            env.block_end = minify.PARENT_END
+
             if _filter is None:
                 # 编译子元素
                 # 这是个递归
                 block.compile(env)
             else:
-                filter_function = _FILTER_FUNCTION_MAP[_filter]
-                filter_function(block, env)
+                _compile_filter(_filter, block, tag_lineno, env)
+
+            env.block_end = block_end
+
+        if preserve_whitespace:
+            env.preserve_whitespace -= 1
 
         # 自闭合标签没有结尾标记
         # 见: tests/templates/self_closing_tag.hbml
         if not self_closing:
             if block and not env.options['compress_output']:
                 env.outdent_output()
-                env.writeline("buffer.write('%s')" % (' ' * env.output_indent))
+                env.write_static(' ' * env.output_indent, tag_lineno)
 
-            env.writeline("buffer.write('</%s>')" % tag_name)
+            if not (
+                _minify and minify.can_omit_end_tag(tag_name, next_sibling)
+            ):
+                env.write_static('</%s>' % tag_name, tag_lineno)
 
         if not env.options['compress_output']:
-            env.writeline("buffer.write('\\n')")
+            env.write_static('\n', tag_lineno)
 
 
 class Expression(LangStructBase):
     def compile(self, block, env):
-        expr_type, expr_body = self._parse_tree[1:]
+        expr_type, expr_body, lineno = self._parse_tree[1:]
 
         if expr_type == 'EXPR_FLAG':
             # EXPR_FLAG 表示这是个Python语句
-            env.writeline(self._parse_tree[2])
-            env.indent()
-            block.compile(env)
-            env.outdent()
-        elif expr_type == 'ECHO_FLAG':
-            # ECHO_FLAG 表示这是个Python表达式
-            # 并且输出表达式的值
-            if not env.options['compress_output']:
-                env.writeline("buffer.write('%s')" % (' ' * env.output_indent))
+            # 编译期先检查语法, 错误信息带有模板中的行号
+            node, compound = analysis.parse_statement(expr_body, lineno)
+
+            # 简单语句中的 _("...") 在编译期翻译, 见: translations选项
+            if env.translations is not None and node is not None and \
+                    not compound:
+                translated = analysis.translate_messages(
+                    node, env.translations
+                )
+                if translated is not node:
+                    node = translated
+                    expr_body = analysis.unparse_statement(node)
 
-            env.writeline(
-                'buffer.write(str(%s))' % expr_body
-            )
+            if env.options['sandbox']:
+                sandbox.check(node, expr_body, lineno)
+            _check_constants(node, expr_body, lineno, env)
 
-            if not env.options['compress_output']:
-                env.writeline("buffer.write('\\n')")
+            if compound and not block:
+                raise exceptions.TemplateSyntaxError(
+                    'expected an indented block', lineno, expr_body
+                )
+            if block and not compound:
+                raise exceptions.TemplateSyntaxError(
+                    'unexpected indented block', lineno, expr_body
+                )
+
+            # 只有注释的行什么也不生成, 也不打断if/elif/else
+            if node is None and not compound:
+                return
+
+            keyword = _keyword(expr_body)
+            if compound and keyword in _BRANCH_KEYWORDS:
+                self.__compile_branch(
+                    keyword, node, expr_body, block, lineno, env
+                )
+                return
+
+            env.branch = None
+            if node is not None:
+                env.add_names(analysis.variable_names(node))
+
+            # for和while语句开始一个循环, 见: CompileWrapper.begin_loop
+            is_loop = isinstance(node, (ast.For, ast.While))
+            hoisting = None
+            if is_loop:
+                env.begin_loop()
+                if env.options['hoist_invariants']:
+                    hoisting = env.begin_hoisting(
+                        _loop_invariants(node, block, env), lineno
+                    )
+
+            env.writeline(expr_body, lineno)
+            if block:
+                _compile_block(
+                    block, env, loop_lineno=is_loop and lineno,
+                    hoisting=hoisting
+                )
+
+            if is_loop:
+                env.end_hoisting(hoisting)
+                env.end_loop()
+            return
+
+        # 输出表达式不能出现在if和else之间
+        env.branch = None
+
+        if expr_type == 'ECHO_FLAG':
+            # ECHO_FLAG 表示这是个Python表达式
+            # 并且输出表达式的值
+            self.__write_value(expr_body, lineno, False, env)
         elif expr_type == 'ESCAPE_ECHO_FLAG':
             # ESCAPE_ECHO_FLAG 表示这是个Python表达式
             # 输出表达式的值
             # 并且要html转义
-            if not env.options['compress_output']:
-                env.writeline("buffer.write('%s')" % (' ' * env.output_indent))
-
-            env.writeline(
-                'buffer.write(escape(str(%s)))' % expr_body
-            )
-
-            if not env.options['compress_output']:
-                env.writeline("buffer.write('\\n')")
+            self.__write_value(expr_body, lineno, True, env)
         else:
             # 未知类型，报错
             raise ValueError('unknow expr type: %s' % expr_type)
 
+    def __compile_branch(self, keyword, node, expr_body, block, lineno, env):
+        '''
+            if/elif/else的条件在编译期确定时, 只编译会执行的分支, 见: constants选项
+            env.branch记录同一串if/elif/else中之前的分支:
+                None            之前的分支照原样输出了, 或者不知道之前是什么
+                _BRANCH_SKIPPED 之前的条件都为假, 全部被消去, 还没有输出if
+                _BRANCH_TAKEN   之前已经确定了要执行的分支, 之后的子句全部消去
+            if相当于之前的分支全部被消去时的elif
+        '''
+        state = _BRANCH_SKIPPED if keyword == 'if' else env.branch
+
+        if state is _BRANCH_TAKEN:
+            env.branch = None if keyword == 'else' else _BRANCH_TAKEN
+            return
+
+        if keyword == 'else':
+            if state is _BRANCH_SKIPPED:
+                _compile_block(block, env, inline=True)
+            else:
+                env.writeline(expr_body, lineno)
+                _compile_block(block, env)
+
+            env.branch = None
+            return
+
+        test = analysis.substitute_constants(node.test, env.constants)
+        env.add_names(analysis.variable_names(test))
+
+        if analysis.is_constant(test):
+            if analysis.constant_value(test):
+                if state is _BRANCH_SKIPPED:
+                    _compile_block(block, env, inline=True)
+                else:
+                    env.writeline('else:', lineno)
+                    _compile_block(block, env)
+                env.branch = _BRANCH_TAKEN
+            else:
+                # 条件为假的分支整个消去
+                env.branch = state
+            return
+
+        if state is _BRANCH_SKIPPED:
+            head = 'if'
+        else:
+            head = 'elif'
+
+        if test is not node.test:
+            env.writeline('%s %s:' % (head, ast.unparse(test)), lineno)
+        elif head != keyword:
+            # 之前的分支都被消去了, elif改写为if
+            env.writeline('if' + expr_body.strip()[len(keyword):], lineno)
+        else:
+            env.writeline(expr_body, lineno)
+
+        _compile_block(block, env)
+        env.branch = None
+
+    def __write_value(self, expr_body, lineno, escape, env):
+        if not env.options['compress_output']:
+            env.write_static(' ' * env.output_indent, lineno)
+
+        node, expr_body = _parse_expression(expr_body, lineno, env)
+        if analysis.is_constant(node):
+            # 常量表达式在编译期求值, 作为静态文本输出
+            text = str(analysis.constant_value(node))
+            if escape:
+                text = html_escape(text)
+            env.write_static(_indent_static(text, env), lineno)
+        else:
+            expr = '%s(%s)' % (env.helper('str'), expr_body)
+            if escape:
+                expr = '%s(%s)' % (env.helper('escape'), expr)
+            env.write_expr(_indent_expr(expr, env), lineno)
+
+        if not env.options['compress_output']:
+            env.write_static('\n', lineno)
+
+
+_BRANCH_KEYWORDS = frozenset(['if', 'elif', 'else'])
+
+_BRANCH_SKIPPED = 'skipped'
+_BRANCH_TAKEN = 'taken'
+
+
+def _keyword(source):
+    '语句开头的关键字, 例如 else: 的else'
+    source = source.strip()
+    if not source:
+        return ''
+
+    return source.split(None, 1)[0].split(':', 1)[0]
+
+
+def _compile_block(block, env, inline=False, loop_lineno=0, hoisting=None):
+    '''
+        编译语句的子block
+        inline为True时子block直接写在当前缩进, 用于编译期选定的分支
+        子block是循环体时, loop_lineno是循环语句的行号,
+        见: CompileWrapper.write_loop_check
+        hoisting是提到循环外面的属性链, 见: CompileWrapper.begin_hoisting
+    '''
+    # 语句的子block之后是什么要到渲染时才知道
+    block_end = env.block_end
+    env.block_end = minify.UNKNOWN
+
+    if inline:
+        block.compile(env)
+    else:
+        env.indent()
+        if loop_lineno:
+            env.write_loop_check(loop_lineno)
+        if hoisting is not None:
+            env.write_hoisting(hoisting)
+        block.compile(env)
+        env.outdent()
+
+    env.block_end = block_end
+
+
+def _tag_name(block_tree):
+    '''
+        block的标签名, 用来判断前一个兄弟元素能否省略结束标签
+        不是标签的block返回minify.UNKNOWN
+    '''
+    head = block_tree[1]
+    if head[0] != 'tag':
+        return minify.UNKNOWN
+
+    for brief in head[1][1]:
+        if '%' == brief[1]:
+            return brief[2]
+
+    return Tag._DEFAULT_TAG_NAME
+
+
+def _compile_attr(key, val, lineno, env):
+    '''
+        常量属性值在编译期完成转换
+        动态的属性整个交给一次attribute调用, 见: hbml.utils.attribute
+    '''
+    node, val = _parse_expression(val, lineno, env)
+    if analysis.is_constant(node):
+        value = analysis.constant_value(node)
+        if env.options['minify']:
+            env.write_static(minify.attribute(key, value), lineno)
+        else:
+            env.write_static(attribute(key, value), lineno)
+    else:
+        env.write_expr(
+            '%s(%r, %s)' % (env.helper('attribute'), key, val), lineno
+        )
+
+
+def _text(text, env):
+    'minify时合并静态文本中的空白'
+    if env.options['minify'] and not env.preserve_whitespace:
+        return minify.collapse_whitespace(text)
+
+    return text
+
+
+def _translate(text, env):
+    '静态文本换成译文, 首尾的空白保持原样, 见: translations选项'
+    if env.translations is None:
+        return text
+
+    message = i18n.message_text(text)
+    translation = env.translations.get(message) if message else None
+    if not translation:
+        return text
+
+    start = text.index(message)
+    return text[:start] + translation + text[start + len(message):]
+
+
+def _parse_expression(source, lineno, env):
+    '''
+        解析一个表达式并替换其中的常量
+        返回语法树和生成代码用的源代码, 替换了常量时源代码由语法树重新生成
+    '''
+    parsed = node = analysis.parse_expression(source, lineno)
+
+    # _("...") 在编译期替换为译文, 之后按常量处理, 见: translations选项
+    if env.translations is not None:
+        node = analysis.translate_messages(node, env.translations)
+
+    if env.options['sandbox']:
+        sandbox.check(node, source, lineno)
+    _check_constants(node, source, lineno, env)
+
+    node = analysis.substitute_constants(node, env.constants)
+    env.add_names(analysis.variable_names(node))
+
+    # 循环中提出去的属性链换成局部变量, 见: hoist_invariants选项
+    if env.hoisted:
+        node = analysis.replace_chains(node, env.hoisted)
+
+    if node is not parsed:
+        source = ast.unparse(node)
+
+    return node, source
+
+
+def _check_constants(node, source, lineno, env):
+    '''
+        常量在编译期已经替换掉了, 模板代码给常量赋值不会有效果, 直接报错
+        lambda的参数、推导式的目标可以和常量同名, 见: analysis.substitute_constants
+    '''
+    if not env.constants:
+        return
+
+    names = analysis.scope_assigned_names(node) & env.constants.keys()
+    if names:
+        raise exceptions.TemplateSyntaxError(
+            'cannot assign to constant %r' % min(names), lineno, source.strip()
+        )
+
+
+def _loop_invariants(node, block, env):
+    '''
+        循环体中可以提到循环外面的属性链, 见: hoist_invariants选项
+        node是循环语句的语法树, block是循环体
+        返回[(链的源代码, 根变量名, 第一次使用的模板行号)]
+
+        只考虑循环体中每次迭代都一定会输出的表达式和属性值:
+        嵌套的if、for等语句之下的不算, break、continue、raise之后的也不算;
+        链的根变量在循环中任何地方被赋值时不提出
+        只有一次属性访问、也只用到一次的链提出来没有好处, 不提出
+    '''
+    body = _LoopBody(env.constants)
+    try:
+        body.scan(block._parse_tree)
+    except exceptions.TemplateSyntaxError:
+        # 错误留给之后编译循环体时报出
+        return []
+
+    assigned = body.assigned | analysis.assigned_names(node)
+    return [
+        (chain, root, lineno)
+        for chain, (root, accesses, lineno) in body.chains.items()
+        if root not in assigned and not root.startswith('_') and accesses > 1
+    ]
+
+
+class _LoopBody(object):
+    '''
+        在编译之前扫描循环体的语法结构
+        assigned: 循环中赋值的变量名
+        chains:   每次迭代都会求值的属性链 -> (根变量名, 属性访问的总次数, 行号)
+    '''
+    def __init__(self, constants):
+        self.constants = constants
+        self.assigned = set()
+        self.chains = {}
+        self.exited = False
+
+    def scan(self, tree, conditional=False):
+        if tree[0] == 'multi_blocks':
+            for sub_tree in tree[1]:
+                self.scan(sub_tree, conditional)
+            return
+
+        head, body = tree[1], tree[2]
+        if head[0] == 'tag':
+            if head[2]:
+                for _, key, val, lineno in head[2][1]:
+                    self.__use(val, lineno, conditional)
+
+            # 过滤器的子元素是文本, 不是模板代码
+            has_filter = any(brief[1] == ':' for brief in head[1][1])
+            if body and not has_filter:
+                self.scan(body, conditional)
+        elif head[0] == 'expression':
+            expr_type, expr_body, lineno = head[1:]
+            if expr_type != 'EXPR_FLAG':
+                self.__use(expr_body, lineno, conditional)
+                return
+
+            statement, compound = analysis.parse_statement(expr_body, lineno)
+            self.assigned.update(analysis.assigned_names(statement))
+            statements = [statement]
+            if isinstance(statement, ast.Module):
+                statements = statement.body
+            if any(
+                isinstance(item, (ast.Break, ast.Continue, ast.Raise))
+                for item in statements
+            ):
+                self.exited = True
+
+            # 语句的子block不一定执行
+            if body:
+                self.scan(body, True)
+
+    def __use(self, source, lineno, conditional):
+        node = analysis.parse_expression(source, lineno)
+        node = analysis.substitute_constants(node, self.constants)
+        self.assigned.update(analysis.assigned_names(node))
+        if conditional or self.exited:
+            return
+
+        for chain, root, depth in analysis.attribute_chains(node):
+            _, accesses, first_lineno = self.chains.get(
+                chain, (root, 0, lineno)
+            )
+            self.chains[chain] = (root, accesses + depth, first_lineno)
+
+
+def _indent_expr(expr, env):
+    '''
+        不压缩输出时, 多行的动态值要和当前输出缩进对齐
+    '''
+    if env.options['compress_output'] or not env.output_indent:
+        return expr
+
+    return '_indent(%s, %r)' % (expr, ' ' * env.output_indent)
+
+
+def _indent_static(text, env):
+    '和_indent_expr相同, 用于编译期已知的文本'
+    if env.options['compress_output'] or not env.output_indent:
+        return text
+
+    return indent_text(text, ' ' * env.output_indent)
+
 
 class PlainText(LangStructBase):
     def compile(self, block, env):
+        lineno = self._parse_tree[2]
         if not env.options['compress_output']:
-            env.writeline("buffer.write('%s')" % (' ' * env.output_indent))
+            env.write_static(' ' * env.output_indent, lineno)
 
-        env.writeline(
-            'buffer.write(%s)' % repr(self._parse_tree[1])
+        env.write_static(
+            _text(_translate(self._parse_tree[1], env), env), lineno
         )
 
         if not env.options['compress_output']:
-            env.writeline("buffer.write('\\n')")
+            env.write_static('\n', lineno)
 
     @property
     def source(self):
@@ -175,7 +568,6 @@ class Block(LangStructBase):
 
     @property
     def source(self):
-        result = ''
         head = create(self._parse_tree[1])
 
         body = self._parse_tree[2]
@@ -190,9 +582,26 @@ class Block(LangStructBase):
 
 class MultiBlocks(LangStructBase):
     def compile(self, env):
-        for sub_tree in self._parse_tree[1]:
+        sub_trees = self._parse_tree[1]
+        block_end = env.block_end
+
+        # 新的一组兄弟节点, 之前的if和这里的else没有关系
+        # 子block中的if也不能影响外面: for、while、try的else紧跟在子block之后
+        branch = env.branch
+        env.branch = None
+        for i, sub_tree in enumerate(sub_trees):
+            if i + 1 < len(sub_trees):
+                env.next_sibling = _tag_name(sub_trees[i + 1])
+            else:
+                env.next_sibling = block_end
+
+            if sub_tree[1][0] != 'expression':
+                env.branch = None
+
             create(sub_tree).compile(env)
 
+        env.branch = branch
+
     @property
     def source(self):
         return ''.join([
@@ -215,13 +624,23 @@ def create(parse_tree):
     return struct_type(parse_tree)
 
 
-def _filter_plain(block, env):
-    '这个filter表示将内容不作处理原样输出'
-    env.writeline("buffer.write(%s)" % repr(block.source))
-    if not env.options['compress_output']:
-        env.writeline("buffer.write('\\n')")
+def _compile_filter(name, block, lineno, env):
+    '''
+        用过滤器处理标签下的文本, 见: hbml.filters
+        static过滤器在编译期运行, 其余的在渲染时运行
+    '''
+    _filter = filters.get_filter(name)
+    if _filter is None:
+        raise exceptions.TemplateSyntaxError(
+            'unknown filter: %s' % name, lineno
+        )
 
+    if _filter.static:
+        env.write_static(
+            _text(filters.apply_static(_filter, block.source), env), lineno
+        )
+    else:
+        env.write_expr('_filters[%r](%r)' % (name, block.source), lineno)
 
-_FILTER_FUNCTION_MAP = {
-    'plain': _filter_plain,
-}
+    if not env.options['compress_output']:
+        env.write_static('\n', lineno)
@@ -0,0 +1,104 @@
+'''
+    minify选项的编译期规则
+
+    minify=True时, 在compress_output的基础上, 编译期对静态的部分做进一步压缩:
+      * 标签文本和过滤器输出中连续的空白合并为一个空格
+        pre、textarea、script、style内部保持原样
+      * 常量属性值不含特殊字符时去掉引号
+      * 布尔属性只保留属性名
+      * void元素不写 />
+      * 可以省略的结束标签不输出
+    动态的值原样输出, 渲染时没有额外的开销
+'''
+import re
+
+from .utils import attribute as _attribute
+
+# 内部的空白有意义, 不做合并
+WHITESPACE_SENSITIVE_TAGS = frozenset(['pre', 'textarea', 'script', 'style'])
+
+BOOLEAN_ATTRIBUTES = frozenset([
+    'allowfullscreen', 'async', 'autofocus', 'autoplay', 'checked',
+    'controls', 'default', 'defer', 'disabled', 'formnovalidate', 'hidden',
+    'inert', 'ismap', 'itemscope', 'loop', 'multiple', 'muted', 'nomodule',
+    'novalidate', 'open', 'playsinline', 'readonly', 'required', 'reversed',
+    'selected',
+])
+
+VOID_TAGS = frozenset([
+    'area', 'base', 'br', 'col', 'embed', 'hr', 'img', 'input', 'link',
+    'meta', 'param', 'source', 'track', 'wbr',
+])
+
+# 下一个兄弟元素的标签名
+# PARENT_END表示之后是父元素的结束标签, UNKNOWN表示之后是文本或者Python代码
+PARENT_END = ''
+UNKNOWN = None
+
+_P_CLOSERS = frozenset([
+    'address', 'article', 'aside', 'blockquote', 'details', 'div', 'dl',
+    'fieldset', 'figcaption', 'figure', 'footer', 'form',
+    'h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'header', 'hgroup', 'hr', 'main',
+    'menu', 'nav', 'ol', 'p', 'pre', 'section', 'table', 'ul',
+])
+
+# 标签 -> 紧跟着哪些兄弟元素时可以省略结束标签
+# 见: https://html.spec.whatwg.org/multipage/syntax.html#optional-tags
+_OPTIONAL_END_TAGS = {
+    'li': frozenset(['li', PARENT_END]),
+    'dt': frozenset(['dt', 'dd']),
+    'dd': frozenset(['dt', 'dd', PARENT_END]),
+    'p': _P_CLOSERS,
+    'option': frozenset(['option', 'optgroup', PARENT_END]),
+    'optgroup': frozenset(['optgroup', PARENT_END]),
+    'thead': frozenset(['tbody', 'tfoot']),
+    'tbody': frozenset(['tbody', 'tfoot', PARENT_END]),
+    'tfoot': frozenset([PARENT_END]),
+    'tr': frozenset(['tr', PARENT_END]),
+    'td': frozenset(['td', 'th', PARENT_END]),
+    'th': frozenset(['td', 'th', PARENT_END]),
+    'head': frozenset(['body']),
+}
+
+# 之后的内容总会被解析进这些元素, 结束标签总是可以省略
+_ALWAYS_OPTIONAL_END_TAGS = frozenset(['html', 'body'])
+
+
+def can_omit_end_tag(tag_name, next_sibling):
+    '结束标签是否可以省略, next_sibling的含义见PARENT_END和UNKNOWN'
+    if tag_name in _ALWAYS_OPTIONAL_END_TAGS:
+        return True
+
+    if next_sibling is UNKNOWN:
+        return False
+
+    return next_sibling in _OPTIONAL_END_TAGS.get(tag_name, ())
+
+
+_WHITESPACE_PATTERN = re.compile(r'\s+')
+
+
+def collapse_whitespace(text):
+    '连续的空白合并为一个空格, 首尾的空白也保留一个, 它们在行内元素之间有意义'
+    return _WHITESPACE_PATTERN.sub(' ', text)
+
+
+# 不需要引号的属性值, 见HTML规范中的unquoted attribute value
+_UNQUOTED_VALUE_PATTERN = re.compile(r'[^\s"\'=<>`&]+\Z')
+
+
+def attribute(key, value):
+    '''
+        一个常量属性的静态文本
+        value是属性值的Python对象
+        其余情况和hbml.utils.attribute相同
+    '''
+    if key in BOOLEAN_ATTRIBUTES and (value == '' or value == key):
+        return ' %s' % key
+
+    if isinstance(value, (str, int, float)) and not isinstance(value, bool):
+        text = str(value)
+        if _UNQUOTED_VALUE_PATTERN.match(text):
+            return ' %s=%s' % (key, text)
+
+    return _attribute(key, value)
@@ -1,3 +1,5 @@
+import bisect
+
 from ply import lex
 
 
@@ -315,13 +317,33 @@ class HbmlLexer:
     def t_error(self, t):
         raise ValueError('t_error: %s' % repr(t))
 
+    # 第一个实例创建的ply lexer, 之后的实例都从它clone
+    # lex.lex()要校验规则并编译正则表达式, 开销很大
+    _master_lexer = None
+
     def __init__(self):
-        self.lexer = lex.lex(module=self)
+        master = type(self).__dict__.get('_master_lexer')
+        if master is None:
+            master = lex.lex(module=self)
+            type(self)._master_lexer = master
+
+        # clone是浅复制, 状态栈要换成自己的
+        self.lexer = master.clone(self)
+        self.lexer.lexstatestack = []
+        self.lexer.begin('INITIAL')
+
         self.indents = [0]
         self.next_line_state = None
 
+        # 当前token所在的行号和lexer的位置
+        # yacc的tracking模式会读取lexer.lineno和lexer.lexpos
+        self.lineno = 1
+        self.lexpos = 0
+        self.__newlines = []
+
     def input(self, text):
         self.lexer.input(text)
+        self.__newlines = list(_newline_positions(text))
 
     def __iter__(self):
         while True:
@@ -332,4 +354,20 @@ class HbmlLexer:
                 break
 
     def token(self):
-        return self.lexer.token()
+        token = self.lexer.token()
+        self.lexpos = self.lexer.lexpos
+        if token:
+            # 规则里会用skip回退, ply自带的行号计数不可靠
+            # 按lexpos之前的换行符个数计算行号
+            token.lineno = self.lineno = bisect.bisect_left(
+                self.__newlines, token.lexpos
+            ) + 1
+
+        return token
+
+
+def _newline_positions(text):
+    position = text.find('\n')
+    while position >= 0:
+        yield position
+        position = text.find('\n', position + 1)
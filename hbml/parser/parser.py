@@ -69,7 +69,7 @@ def p_tag(p):
     '''
         tag : tag_brief_part tag_attrs_part tag_tail_part NEWLINE
     '''
-    p[0] = ('tag', p[1], p[2], p[3])
+    p[0] = ('tag', p[1], p[2], p[3], p.lineno(1))
 
 
 def p_tag_brief_part(p):
@@ -153,7 +153,7 @@ def p_tag_attr_item(p):
     '''
         tag_attr_item : KEYWORD EQUAL EXPR
     '''
-    p[0] = ('tag_attr_item', p[1], p[3])
+    p[0] = ('tag_attr_item', p[1], p[3], p.lineno(3))
 
 
 def p_empty(p):
@@ -165,7 +165,7 @@ def p_expression(p):
     '''
         expression : expression_flag EXPR NEWLINE
     '''
-    p[0] = ('expression', p[1], p[2])
+    p[0] = ('expression', p[1], p[2], p.lineno(2))
 
 
 def p_expression_flag(p):
@@ -181,7 +181,7 @@ def p_plaintext(p):
     '''
         plaintext : PLAINTEXT
     '''
-    p[0] = ('plaintext', p[1])
+    p[0] = ('plaintext', p[1], p.lineno(1))
 
 
 # Error rule for syntax errors
@@ -202,9 +202,11 @@ class Parser(object):
     def parse(self, text):
         # self._debug_parse_tokens(text)
 
+        # tracking=True: 非终结符也带上行号, 见: p_tag
         return self.__parser.parse(
             text,
-            lexer=self._get_lexer()
+            lexer=self._get_lexer(),
+            tracking=True
         )
 
     def _debug_parse_tokens(self, s):
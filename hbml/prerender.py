@@ -0,0 +1,396 @@
+'''
+    整站静态预渲染
+
+    把一组页面渲染成输出目录下的文件, 每个页面由输出路径、模板文件和变量组成
+    输出目录下的清单文件记录每个输出依赖的内容:
+      * 模板: 模板文件内容和编译选项的hash
+      * 变量: 模板读取的每个变量名的值的hash, 没有传入的变量记为null
+    再次渲染时, 依赖都没有变化、输出文件也还在的页面直接跳过
+    传入了模板没有读取的变量, 它的变化不会引起重新渲染
+
+    输出先写入同一目录下的临时文件, 再用os.replace替换,
+    同时读取这个文件的web服务器不会读到写了一半的内容
+
+        renderer = Prerenderer('public', minify=True)
+        renderer.render([
+            Page('index.html', 'templates/index.hbml', dict(posts=posts)),
+            Page('about.html', 'templates/about.hbml'),
+        ], executor=concurrent.futures.ProcessPoolExecutor())
+
+    也可以从命令行运行, 见: main
+
+    注意: 变量的值用json或pickle序列化后计算hash,
+    序列化结果不稳定的值(例如字符串的set)每次都会被当作变化了;
+    无法序列化的值总是引起重新渲染
+    过滤器的实现不在依赖之内, 修改了过滤器后要用force重新渲染全部页面
+'''
+import functools
+import json
+import os
+
+from .compiler import (
+    CompileWrapper, _create_template, _fill_options, _generate_file_code,
+    code_filename
+)
+from .source_map import SourceMap
+
+# 输出目录下的清单文件
+MANIFEST_NAME = '.hbml-prerender.json'
+_MANIFEST_VERSION = 1
+
+# 无法序列化的变量的hash, 和任何值都不相等
+_UNKNOWN = '*'
+
+
+class Page(object):
+    '''
+        一个要预渲染的页面
+        path:      输出文件相对于输出目录的路径
+        template:  模板文件的路径
+        variables: 渲染用的变量
+    '''
+    __slots__ = ('path', 'template', 'variables')
+
+    def __init__(self, path, template, variables=None):
+        self.path = path
+        self.template = template
+        self.variables = variables or {}
+
+
+class Prerenderer(object):
+    '''
+        预渲染到一个输出目录, options是编译选项
+        rendered和skipped是最近一次render中重新渲染和跳过的页面的输出路径
+    '''
+    def __init__(self, directory, **options):
+        self.directory = directory
+        self.options = _fill_options(options)
+
+        self.rendered = []
+        self.skipped = []
+
+    @property
+    def manifest_path(self):
+        return os.path.join(self.directory, MANIFEST_NAME)
+
+    def render(self, pages, executor=None, force=False):
+        '''
+            渲染依赖有变化的页面, 返回重新渲染的页面数
+            executor可以是线程池或进程池, 使用进程池时每个进程各自编译用到的模板
+            force为True时不管依赖是否变化, 全部重新渲染
+            有页面渲染失败时, 已经完成的页面仍然记入清单, 然后抛出异常
+        '''
+        pages = list(pages)
+        for page in pages:
+            _check_path(page.path)
+
+        manifest = {} if force else self.__load_manifest()
+        template_digests = {}
+
+        stale = []
+        self.skipped = []
+        for page in pages:
+            entry = manifest.get(page.path)
+            if self.__is_fresh(page, entry, template_digests):
+                self.skipped.append(page.path)
+            else:
+                stale.append(page)
+
+        # 清单只保留这次传入的页面
+        entries = dict(
+            (path, manifest[path]) for path in self.skipped
+        )
+
+        self.rendered = []
+        try:
+            if executor is None:
+                results = map(self.__render_page, stale)
+            else:
+                results = executor.map(
+                    _render_page,
+                    [self.directory] * len(stale),
+                    [self.options] * len(stale),
+                    [page.path for page in stale],
+                    [page.template for page in stale],
+                    [page.variables for page in stale],
+                )
+
+            for page, (digest, inputs) in zip(stale, results):
+                entries[page.path] = dict(
+                    template=page.template, digest=digest, inputs=inputs
+                )
+                self.rendered.append(page.path)
+        finally:
+            self.__save_manifest(entries)
+
+        return len(self.rendered)
+
+    def __render_page(self, page):
+        return _render_page(
+            self.directory, self.options, page.path, page.template,
+            page.variables
+        )
+
+    def __is_fresh(self, page, entry, template_digests):
+        if entry is None or entry.get('template') != page.template:
+            return False
+
+        if not os.path.exists(os.path.join(self.directory, page.path)):
+            return False
+
+        # 同一个模板的多个页面只读一次模板文件
+        digest = template_digests.get(page.template)
+        if digest is None:
+            try:
+                digest = template_digests[page.template] = _template_digest(
+                    _read_source(page.template), self.options
+                )
+            except OSError:
+                return False
+
+        if entry.get('digest') != digest:
+            return False
+
+        for name, value_digest in entry.get('inputs', {}).items():
+            if value_digest == _UNKNOWN or value_digest != _variable_digest(
+                page.variables, name
+            ):
+                return False
+
+        return True
+
+    def __load_manifest(self):
+        try:
+            with open(self.manifest_path, 'r', encoding='utf-8') as f:
+                manifest = json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+        if not isinstance(manifest, dict) or \
+                manifest.get('version') != _MANIFEST_VERSION:
+            return {}
+
+        return manifest.get('pages', {})
+
+    def __save_manifest(self, entries):
+        data = json.dumps(
+            dict(version=_MANIFEST_VERSION, pages=entries),
+            indent=1, sort_keys=True
+        )
+        write_atomic(self.manifest_path, data.encode('utf-8'))
+
+
+def write_atomic(path, data):
+    '''
+        把bytes写入文件, 读者只会看到原来的内容或者完整的新内容
+        文件已经存在时保留它的权限, 否则为0644
+    '''
+    import tempfile
+
+    directory = os.path.dirname(path) or '.'
+    os.makedirs(directory, exist_ok=True)
+
+    try:
+        mode = os.stat(path).st_mode & 0o777
+    except OSError:
+        mode = 0o644
+
+    fd, temp_path = tempfile.mkstemp(
+        dir=directory, prefix='.%s.' % os.path.basename(path), suffix='.tmp'
+    )
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.chmod(temp_path, mode)
+        os.replace(temp_path, path)
+    except BaseException:
+        try:
+            os.unlink(temp_path)
+        except OSError:
+            pass
+        raise
+
+
+def _check_path(path):
+    '输出路径必须是输出目录之内的相对路径'
+    normalized = os.path.normpath(path)
+    if os.path.isabs(path) or normalized == os.curdir or \
+            normalized.split(os.sep, 1)[0] == os.pardir:
+        raise ValueError(
+            'output path must be inside the directory: %r' % path
+        )
+
+
+def _read_source(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        return f.read()
+
+
+def _template_digest(source, options):
+    '模板内容和编译选项的hash'
+    import hashlib
+
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(repr(sorted(
+        (k, v) for k, v in options.items() if k != 'name'
+    )).encode('utf-8'))
+    digest.update(source.encode('utf-8'))
+    return digest.hexdigest()
+
+
+def _variable_digest(variables, name):
+    '''
+        变量值的hash, 没有传入时为None
+        json能表示的值按排序后的json计算, 不受dict中键的顺序影响;
+        其余的值用pickle, 都不能序列化时为_UNKNOWN
+    '''
+    if name not in variables:
+        return None
+
+    import hashlib
+
+    value = variables[name]
+    try:
+        data = b'j' + json.dumps(
+            value, sort_keys=True, separators=(',', ':')
+        ).encode('utf-8')
+    except (TypeError, ValueError):
+        import pickle
+        try:
+            data = b'p' + pickle.dumps(value, 4)
+        except Exception:
+            return _UNKNOWN
+
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+
+# 每个进程里已经编译好的模板: (模板路径, 模板的hash) -> (Template, 读取的变量名)
+_templates = {}
+_TEMPLATES_MAX_SIZE = 64
+
+
+def _load_template(path, options):
+    '''
+        编译模板文件, 返回(模板的hash, Template, 模板读取的变量名)
+        模板文件没有变化时使用本进程中已经编译好的模板
+    '''
+    source = _read_source(path)
+    digest = _template_digest(source, options)
+
+    key = (path, digest)
+    entry = _templates.get(key)
+    if entry is None:
+        env = CompileWrapper(source, options)
+        function_name, function_code = env.generate(path)
+
+        source_map = SourceMap(
+            options['name'] or path, code_filename(function_name),
+            env.line_map
+        )
+        template = _create_template(
+            function_name,
+            function_code,
+            functools.partial(_generate_file_code, path, options),
+            options,
+            source_map
+        )
+
+        if len(_templates) >= _TEMPLATES_MAX_SIZE:
+            _templates.clear()
+        entry = _templates[key] = (template, sorted(env.names))
+
+    return (digest,) + entry
+
+
+def _render_page(directory, options, path, template_path, variables):
+    '''
+        渲染一个页面并写入输出文件, 在进程池的工作进程中运行
+        返回(模板的hash, 模板读取的变量名 -> 值的hash)
+    '''
+    digest, template, names = _load_template(template_path, options)
+
+    result = template.render(variables)
+    if not options['encoding']:
+        result = result.encode('utf-8')
+    write_atomic(os.path.join(directory, path), result)
+
+    return digest, dict(
+        (name, _variable_digest(variables, name)) for name in names
+    )
+
+
+def main(argv=None):
+    '''
+        命令行入口: python -m hbml.prerender site.json [--jobs N] [--force]
+        site.json描述输出目录、编译选项和页面, 其中的相对路径相对于site.json所在的目录:
+
+            {
+                "output": "public",
+                "options": {"minify": true},
+                "pages": [
+                    {"path": "index.html", "template": "templates/index.hbml",
+                     "variables": {"title": "Home"}},
+                    {"path": "posts.html", "template": "templates/posts.hbml",
+                     "variables": "data/posts.json"}
+                ]
+            }
+
+        variables可以是变量的dict, 也可以是一个内容为dict的json文件的路径
+        默认用和CPU核数相同的进程并行渲染
+    '''
+    import argparse
+    import concurrent.futures
+
+    parser = argparse.ArgumentParser(
+        prog='python -m hbml.prerender',
+        description='render hbml templates to static files'
+    )
+    parser.add_argument('site', help='site description json file')
+    parser.add_argument(
+        '-j', '--jobs', type=int, default=None,
+        help='number of worker processes, 1 renders in this process'
+    )
+    parser.add_argument(
+        '--force', action='store_true', help='render all pages'
+    )
+    args = parser.parse_args(argv)
+
+    base = os.path.dirname(os.path.abspath(args.site))
+    with open(args.site, 'r', encoding='utf-8') as f:
+        site = json.load(f)
+
+    pages = []
+    for item in site['pages']:
+        variables = item.get('variables') or {}
+        if isinstance(variables, str):
+            with open(
+                os.path.join(base, variables), 'r', encoding='utf-8'
+            ) as f:
+                variables = json.load(f)
+
+        pages.append(Page(
+            item['path'], os.path.join(base, item['template']), variables
+        ))
+
+    renderer = Prerenderer(
+        os.path.join(base, site.get('output', '.')),
+        **site.get('options', {})
+    )
+
+    if args.jobs == 1:
+        renderer.render(pages, force=args.force)
+    else:
+        with concurrent.futures.ProcessPoolExecutor(args.jobs) as executor:
+            renderer.render(pages, executor, force=args.force)
+
+    print('rendered %d, skipped %d' % (
+        len(renderer.rendered), len(renderer.skipped)
+    ))
+    return 0
+
+
+if __name__ == '__main__':
+    import sys
+    sys.exit(main())
@@ -0,0 +1,107 @@
+'''
+    受限的模板执行环境
+
+    编译时指定sandbox=True, 模板里的Python代码只能使用白名单中的内置函数,
+    也不能访问以下划线开头的名字和属性, 只有i18n的_函数例外
+
+    所有检查都在编译期对ast完成:
+    Python的属性名、变量名在语法树里都是静态的,
+    能动态取属性的getattr、str.format等入口本身就不允许出现,
+    所以渲染时不需要任何额外的检查, 唯一的区别是函数执行环境的__builtins__换成了白名单
+'''
+import ast
+import builtins
+
+from . import exceptions
+
+
+# 模板中可以使用的内置函数和异常
+SAFE_BUILTIN_NAMES = frozenset([
+    'abs', 'all', 'any', 'ascii', 'bin', 'bool', 'bytearray', 'bytes',
+    'callable', 'chr', 'complex', 'dict', 'divmod', 'enumerate', 'filter',
+    'float', 'frozenset', 'hash', 'hex', 'int', 'isinstance', 'issubclass',
+    'iter', 'len', 'list', 'map', 'max', 'min', 'next', 'oct', 'ord', 'pow',
+    'range', 'repr', 'reversed', 'round', 'set', 'slice', 'sorted', 'str',
+    'sum', 'tuple', 'zip',
+    'ArithmeticError', 'AssertionError', 'AttributeError', 'Exception',
+    'IndexError', 'KeyError', 'LookupError', 'StopIteration', 'TypeError',
+    'ValueError', 'ZeroDivisionError',
+])
+
+SAFE_BUILTINS = dict(
+    (name, getattr(builtins, name)) for name in SAFE_BUILTIN_NAMES
+)
+
+# 其余的内置名字在编译期直接拒绝
+# 运行时它们不在__builtins__里, 即使漏过检查也只会得到NameError
+UNSAFE_BUILTIN_NAMES = frozenset(
+    name for name in dir(builtins) if name not in SAFE_BUILTIN_NAMES
+)
+
+# 不以下划线开头, 但能拿到函数内部状态或者动态访问属性的属性名
+UNSAFE_ATTRIBUTES = frozenset([
+    'format', 'format_map', 'mro',
+    'gi_frame', 'gi_code', 'gi_yieldfrom',
+    'cr_frame', 'cr_code', 'cr_await',
+    'ag_frame', 'ag_code', 'ag_await',
+    'f_back', 'f_builtins', 'f_code', 'f_globals', 'f_locals',
+    'tb_frame', 'tb_next',
+])
+
+# 例外: i18n标记翻译文本的函数, 见: hbml.i18n
+_ALLOWED_NAMES = frozenset(['_'])
+
+# 生成的模板函数自己的局部变量, 见: compiler._RESERVED_NAMES
+# 它们都以下划线开头, 这里单独列出, 放宽下划线的规则时也不会漏掉
+_INTERNAL_NAMES = frozenset([
+    '_buffer', '_variables', '_records', '_parts', '_write', '_check',
+    '_ticks', '_str', '_escape', '_attribute',
+])
+
+# 会破坏生成的模板函数, 或者能引入外部代码的语句
+_UNSAFE_NODES = (
+    ast.Import, ast.ImportFrom, ast.Global, ast.Nonlocal,
+    ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef,
+    ast.Return, ast.Yield, ast.YieldFrom, ast.Await,
+)
+
+
+def check(node, source, lineno=None):
+    '''
+        检查一段模板代码的语法树, 不安全时抛出SandboxError
+        node为None(例如else子句)时不做检查
+    '''
+    if node is None:
+        return
+
+    for child in ast.walk(node):
+        reason = _check_node(child)
+        if reason:
+            raise exceptions.SandboxError(reason, lineno, source.strip())
+
+
+def _unsafe_name(name):
+    if name in _INTERNAL_NAMES:
+        return True
+    return name.startswith('_') and name not in _ALLOWED_NAMES
+
+
+def _check_node(node):
+    if isinstance(node, ast.Name):
+        if _unsafe_name(node.id):
+            return 'name %r is not allowed in sandbox' % node.id
+        if node.id in UNSAFE_BUILTIN_NAMES:
+            return 'builtin %r is not allowed in sandbox' % node.id
+    elif isinstance(node, ast.Attribute):
+        if node.attr.startswith('_') or node.attr in UNSAFE_ATTRIBUTES:
+            return 'attribute %r is not allowed in sandbox' % node.attr
+    elif isinstance(node, ast.arg):
+        if _unsafe_name(node.arg):
+            return 'name %r is not allowed in sandbox' % node.arg
+    elif isinstance(node, ast.ExceptHandler):
+        if node.name and _unsafe_name(node.name):
+            return 'name %r is not allowed in sandbox' % node.name
+    elif isinstance(node, _UNSAFE_NODES):
+        return '%s statement is not allowed in sandbox' % (
+            type(node).__name__.lower()
+        )
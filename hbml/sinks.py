@@ -0,0 +1,384 @@
+'''
+    模板输出的目标
+    生成的模板函数只调用 output.write(fragment)
+'''
+import abc
+import collections
+import time
+
+from . import exceptions
+
+
+class OutputSink(abc.ABC):
+    '''
+        输出目标的协议
+
+        生成的模板函数在开头取一次 _write = output.write,
+        之后每个片段都直接调用这个局部变量
+        所以write最好直接是一个内置方法(例如list.append),
+        这样每个片段只有一次C层面的调用, 没有Python函数调用的开销
+
+        任何有write方法的对象(文件, io.StringIO等)都可以作为输出目标,
+        继承OutputSink只是为了得到flush和close的默认实现
+        子类必须提供write, 可以是方法, 也可以是__slots__中的实例属性
+        渲染结束后由使用者调用flush或close
+    '''
+    __slots__ = ()
+
+    @abc.abstractmethod
+    def write(self, fragment):
+        '写入一个片段'
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, errtype, value, trace):
+        self.close()
+
+
+class JoinSink(OutputSink):
+    '''
+        内存中的输出目标
+        所有片段先放进list, 取值时一次join
+        str和bytes的片段都可以, empty指定join用的空值
+    '''
+    __slots__ = ('parts', 'write', '__empty')
+
+    def __init__(self, empty=''):
+        self.parts = []
+        self.write = self.parts.append
+        self.__empty = empty
+
+    def getvalue(self):
+        return self.__empty.join(self.parts)
+
+    def clear(self):
+        self.parts.clear()
+
+
+class BufferedFileSink(OutputSink):
+    '''
+        带缓冲的文件输出
+        片段累积到flush_size个字符(或字节)以后才写一次文件,
+        适合无缓冲的文件或者每次write都要加锁的文件对象
+    '''
+    __slots__ = ('file', 'flush_size', '__parts', '__size', '__empty')
+
+    def __init__(self, file, flush_size=64 * 1024, empty=''):
+        self.file = file
+        self.flush_size = flush_size
+        self.__parts = []
+        self.__size = 0
+        self.__empty = empty
+
+    def write(self, fragment):
+        self.__parts.append(fragment)
+        self.__size += len(fragment)
+        if self.__size >= self.flush_size:
+            self.flush()
+
+    def flush(self):
+        if self.__parts:
+            self.file.write(self.__empty.join(self.__parts))
+            self.__parts.clear()
+            self.__size = 0
+
+    def close(self):
+        self.flush()
+        self.file.flush()
+
+
+class SocketSink(OutputSink):
+    '''
+        带缓冲的socket输出, 片段必须是bytes
+        累积到flush_size字节后用sendmsg一次发出所有片段,
+        不需要先把片段拼接起来
+        平台没有sendmsg时退化为join之后sendall
+    '''
+    __slots__ = ('socket', 'flush_size', '__parts', '__size')
+
+    # sendmsg一次最多能带的缓冲区个数(IOV_MAX)
+    MAX_BUFFERS = 1024
+
+    def __init__(self, socket, flush_size=64 * 1024):
+        self.socket = socket
+        self.flush_size = flush_size
+        self.__parts = []
+        self.__size = 0
+
+    def write(self, fragment):
+        self.__parts.append(fragment)
+        self.__size += len(fragment)
+        if self.__size >= self.flush_size:
+            self.flush()
+
+    def flush(self):
+        parts = self.__parts
+        if not parts:
+            return
+
+        if hasattr(self.socket, 'sendmsg'):
+            for start in range(0, len(parts), self.MAX_BUFFERS):
+                self.__sendmsg(parts[start:start + self.MAX_BUFFERS])
+        else:
+            self.socket.sendall(b''.join(parts))
+
+        parts.clear()
+        self.__size = 0
+
+    def __sendmsg(self, buffers):
+        buffers = [memoryview(buffer) for buffer in buffers]
+        while buffers:
+            sent = self.socket.sendmsg(buffers)
+
+            # 只发出了一部分, 跳过已经发完的缓冲区后继续
+            while buffers and sent >= len(buffers[0]):
+                sent -= len(buffers[0])
+                buffers.pop(0)
+
+            if sent:
+                buffers[0] = buffers[0][sent:]
+
+
+class CountingSink(OutputSink):
+    '''
+        统计输出的片段数和长度
+        指定target时转发给target, 否则丢弃输出
+    '''
+    __slots__ = ('target', 'size', 'count')
+
+    def __init__(self, target=None):
+        self.target = target
+        self.size = 0
+        self.count = 0
+
+    def write(self, fragment):
+        self.size += len(fragment)
+        self.count += 1
+        if self.target is not None:
+            self.target.write(fragment)
+
+    def flush(self):
+        if self.target is not None and hasattr(self.target, 'flush'):
+            self.target.flush()
+
+
+class DiscardSink(OutputSink):
+    '''
+        丢弃所有输出, 用于测量模板本身的渲染开销
+    '''
+    __slots__ = ()
+
+    # 任何只接受一个参数的内置函数都可以当作最便宜的空操作
+    write = staticmethod(len)
+
+
+class BytearraySink(OutputSink):
+    '''
+        把编码后的输出追加到一个bytearray中
+        可以传入调用者自己的bytearray
+        渲染结束后用getbuffer()取得memoryview,
+        可直接交给socket.sendmsg或WSGI, 不需要再复制一次
+    '''
+    __slots__ = ('buffer', 'write')
+
+    def __init__(self, buffer=None):
+        if buffer is None:
+            buffer = bytearray()
+
+        self.buffer = buffer
+        self.write = buffer.extend
+
+    def getbuffer(self):
+        return memoryview(self.buffer)
+
+    def getvalue(self):
+        return bytes(self.buffer)
+
+    def clear(self):
+        del self.buffer[:]
+
+
+class MemoryviewSink(OutputSink):
+    '''
+        把编码后的输出写进一块预先分配好的可写内存
+        空间不足时抛出BufferOverflowError
+    '''
+    __slots__ = ('view', 'position')
+
+    def __init__(self, buffer):
+        view = memoryview(buffer)
+        if view.readonly:
+            raise ValueError('buffer must be writable')
+
+        self.view = view.cast('B')
+        self.position = 0
+
+    def write(self, data):
+        end = self.position + len(data)
+        if end > len(self.view):
+            raise exceptions.BufferOverflowError(
+                'need %d bytes, buffer has %d' % (end, len(self.view))
+            )
+
+        self.view[self.position:end] = data
+        self.position = end
+
+    def getbuffer(self):
+        return self.view[:self.position]
+
+    def getvalue(self):
+        return bytes(self.getbuffer())
+
+    def clear(self):
+        self.position = 0
+
+
+class BytearrayPool(object):
+    '''
+        可复用的BytearraySink池
+        避免每次渲染都重新分配并扩容bytearray
+
+            with pool.sink() as sink:
+                template.render(variables, sink)
+                sock.sendmsg([sink.getbuffer()])
+    '''
+    def __init__(self, max_size=16):
+        self.__max_size = max_size
+        # deque的append和pop是线程安全的
+        self.__free = collections.deque()
+
+    def acquire(self):
+        try:
+            return self.__free.pop()
+        except IndexError:
+            return BytearraySink()
+
+    def release(self, sink):
+        sink.clear()
+        if len(self.__free) < self.__max_size:
+            self.__free.append(sink)
+
+    def sink(self):
+        return _PooledSink(self)
+
+
+class _PooledSink(object):
+    __slots__ = ('pool', 'sink')
+
+    def __init__(self, pool):
+        self.pool = pool
+        self.sink = None
+
+    def __enter__(self):
+        self.sink = self.pool.acquire()
+        return self.sink
+
+    def __exit__(self, errtype, value, trace):
+        # 使用者在with块内必须用完getbuffer()返回的memoryview,
+        # 否则bytearray无法被清空复用
+        self.pool.release(self.sink)
+        self.sink = None
+
+
+class LimitedSink(OutputSink):
+    '''
+        限制输出大小和渲染时间的输出目标
+        见: max_output_size和max_render_time选项
+
+        没有target时片段放进list, write仍然是list.append,
+        check时把新增的片段拼接成一段, 长度取自拼接结果,
+        比逐个统计片段的长度快, 最后的拼接也只剩少数几段
+        生成的代码在最外层循环中每隔一定的迭代次数调用一次check,
+        渲染结束时Template调用finish, 用拼接结果的长度作为输出大小
+        有target时每个片段都先计数再转发, 超出大小时立即中止
+    '''
+    __slots__ = (
+        'target', 'max_size', 'max_time', 'size', 'fragments', 'write',
+        '__parts', '__counted', '__start', '__empty'
+    )
+
+    def __init__(self, target=None, max_size=None, max_time=None, empty=''):
+        self.target = target
+        self.max_size = max_size
+        self.max_time = max_time
+        self.size = 0
+        self.fragments = 0
+        self.__parts = []
+        self.__counted = 0
+        self.__start = time.monotonic()
+        self.__empty = empty
+
+        if target is None:
+            self.write = self.__parts.append
+        else:
+            self.write = self.__forward
+
+    def __forward(self, fragment):
+        self.size += len(fragment)
+        self.fragments += 1
+        if self.max_size is not None and self.size > self.max_size:
+            self.__abort('size')
+        self.target.write(fragment)
+
+    def check(self):
+        '超出限制时抛出RenderLimitError'
+        parts = self.__parts
+        if len(parts) > self.__counted:
+            chunk = self.__empty.join(parts[self.__counted:])
+            self.fragments += len(parts) - self.__counted
+            self.size += len(chunk)
+            del parts[self.__counted:]
+            parts.append(chunk)
+            self.__counted = len(parts)
+
+        self.__check_limits()
+
+    def finish(self):
+        '''
+            渲染结束时的检查
+            没有target时返回拼接好的输出, 长度直接取自拼接结果,
+            不再逐个统计剩下的片段
+        '''
+        if self.target is not None:
+            self.check()
+            return None
+
+        parts = self.__parts
+        value = self.__empty.join(parts)
+        self.fragments += len(parts) - self.__counted
+        self.size = len(value)
+        self.__counted = len(parts)
+        self.__check_limits()
+        return value
+
+    def __check_limits(self):
+        if self.max_size is not None and self.size > self.max_size:
+            self.__abort('size')
+
+        if self.max_time is not None and self.elapsed > self.max_time:
+            self.__abort('time')
+
+    @property
+    def elapsed(self):
+        return time.monotonic() - self.__start
+
+    def __abort(self, reason):
+        # 已经输出的部分不再需要, 先释放
+        self.__parts.clear()
+        raise exceptions.RenderLimitError(
+            reason, self.size, self.fragments, self.elapsed
+        )
+
+    def getvalue(self):
+        return self.__empty.join(self.__parts)
+
+    def flush(self):
+        if self.target is not None and hasattr(self.target, 'flush'):
+            self.target.flush()
@@ -0,0 +1,71 @@
+'''
+    模板运行时错误的行号映射
+
+    编译时CompileWrapper记录生成的代码每一行对应的模板行号,
+    存为一个array('i'), 每行只占4个字节
+    渲染正常时完全用不到它; 只有渲染抛出异常时,
+    才根据traceback找到出错的模板行, 在异常上附加模板名、行号和那一行的代码
+'''
+class SourceMap(object):
+    '''
+        一个模板的行号映射
+        name:     模板名, 从文件编译时是文件路径
+        filename: 生成的代码的文件名, 用来在traceback中找到模板函数的帧
+        lines:    生成的代码第i + 1行对应的模板行号, 0表示没有对应
+        source:   模板源代码, 只在debug模式下由字符串编译时保留
+    '''
+    __slots__ = ('name', 'filename', 'lines', '__source')
+
+    def __init__(self, name, filename, lines, source=None):
+        self.name = name
+        self.filename = filename
+        self.lines = lines
+        self.__source = source
+
+    def template_lineno(self, code_lineno):
+        '生成的代码的行号对应的模板行号, 没有对应时返回None'
+        if 0 < code_lineno <= len(self.lines):
+            return self.lines[code_lineno - 1] or None
+
+    def template_line(self, lineno):
+        '模板第lineno行的代码, 得不到时返回空字符串'
+        if self.__source is not None:
+            lines = self.__source.splitlines()
+            if 0 < lineno <= len(lines):
+                return lines[lineno - 1]
+            return ''
+
+        # 从文件编译的模板按需读取文件, 由linecache缓存
+        # linecache只在出错时才需要, 不在导入时加载
+        import linecache
+        return linecache.getline(self.name, lineno).rstrip('\n')
+
+    def locate(self, traceback):
+        '''
+            在traceback中找到最内层的模板函数帧
+            返回对应的模板行号, 找不到时返回None
+        '''
+        lineno = None
+        while traceback is not None:
+            if traceback.tb_frame.f_code.co_filename == self.filename:
+                lineno = self.template_lineno(traceback.tb_lineno)
+            traceback = traceback.tb_next
+
+        return lineno
+
+    def annotate(self, error):
+        '''
+            给渲染时抛出的异常附加出错的模板位置
+            异常类型不变, 调用者原来的except照常工作
+        '''
+        lineno = self.locate(error.__traceback__)
+        if lineno is None or not hasattr(error, 'add_note'):
+            return
+
+        note = '  File "%s", line %d, in template' % (self.name, lineno)
+        for existing in getattr(error, '__notes__', ()):
+            if existing.startswith(note):
+                return
+
+        text = self.template_line(lineno).strip()
+        error.add_note('%s\n    %s' % (note, text) if text else note)
@@ -0,0 +1,346 @@
+r'''
+    按列渲染表格
+
+    大表格通常是 - for row in rows: 加一个固定的行模板
+    TableRow把行模板编译成静态片段和列引用,
+    渲染时每一列整体转换为字符串并转义,
+    再和静态片段交错排列, 最后只做一次join,
+    不需要对每一行解释执行一遍行模板
+
+        row = compile_row(
+            "%tr(data-id = id)\n"
+            "  %td\n"
+            "    =% name\n"
+        )
+        html = row.render(dict(id=ids, name=names))
+
+    列可以是list等序列, 安装了NumPy时也可以是NumPy数组
+    NumPy数组先用tolist()转换成Python对象再按list处理, 不会比list更快
+'''
+import ast
+import builtins
+import functools
+import itertools
+
+from . import analysis, exceptions
+from .compiler import CompileWrapper, _fill_options, default_environment
+from .utils import attribute, escape_attribute, html_escape
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+class _RowCollector(CompileWrapper):
+    '''
+        编译行模板用的环境
+        不生成代码, 只按顺序收集静态片段和动态表达式
+    '''
+    def __init__(self, source, options):
+        super().__init__(source, options)
+        self.fragments = []
+
+    def write_static(self, text, lineno=0):
+        if not text:
+            return
+
+        if self.fragments and isinstance(self.fragments[-1], str):
+            self.fragments[-1] += text
+        else:
+            self.fragments.append(text)
+
+    def write_expr(self, expr, lineno=0):
+        self.fragments.append(_Column(expr))
+
+    def writeline(self, source, lineno=0):
+        raise exceptions.CompileError(
+            'row template cannot contain python statements: %s' % source
+        )
+
+
+class _Column(object):
+    'a dynamic value of the row template'
+    __slots__ = ('expr', )
+
+    def __init__(self, expr):
+        self.expr = expr
+
+
+def compile_row(source, **options):
+    'compile a row template to a TableRow'
+    options = _fill_options(options)
+    if options['encoding']:
+        raise exceptions.CompileError('row templates render str only')
+
+    collector = _RowCollector(source, options)
+    collector.generate_body()
+
+    statics = []
+    exprs = []
+    for fragment in collector.fragments:
+        if isinstance(fragment, str):
+            statics.append(fragment)
+        else:
+            if len(statics) == len(exprs):
+                statics.append('')
+            exprs.append(fragment.expr)
+
+    if len(statics) == len(exprs):
+        statics.append('')
+
+    return TableRow(statics, exprs, options['sandbox'])
+
+
+class TableRow(object):
+    '''
+        编译好的行模板
+        statics比exprs多一个, 一行的输出是
+        statics[0] exprs[0] statics[1] ... exprs[-1] statics[-1]
+        每个表达式的解析、识别和编译都在创建时完成, 见: _ColumnExpr
+    '''
+    def __init__(self, statics, exprs, sandboxed=False):
+        self.statics = statics
+        self.exprs = exprs
+
+        # 复制一份名字空间, eval写入的__builtins__不影响模板共用的名字空间
+        self.__globals = dict(default_environment.namespace(sandboxed))
+        self.__columns = [
+            _ColumnExpr(expr, self.__globals) for expr in exprs
+        ]
+
+    def render(self, columns, output=None):
+        '''
+            columns是列名到列数据的映射, 所有列的长度必须相同
+            提供了output时写入output, 否则返回字符串
+        '''
+        length = None
+        for name, column in columns.items():
+            if length is None:
+                length = len(column)
+            elif len(column) != length:
+                raise ValueError('column %s has %d rows, expected %d' % (
+                    name, len(column), length
+                ))
+
+        # 同一列可能被多个表达式引用, 转换成字符串的结果只算一次
+        strings_cache = {}
+        result = self.__interleave(
+            [
+                self.__convert(column_expr, columns, length, strings_cache)
+                for column_expr in self.__columns
+            ],
+            length or 0
+        )
+
+        if output is not None:
+            output.write(result)
+        else:
+            return result
+
+    def __interleave(self, values, length):
+        statics = self.statics
+
+        if not length:
+            return ''
+
+        if not values:
+            return statics[0] * length
+
+        # 每一行的结尾和下一行的开头是相邻的静态片段, 合并在一起
+        # parts按行排列: [joint, v0, s1, v1, s2, ..., vk], 最后补上结尾
+        width = 2 * len(values)
+        joint = statics[-1] + statics[0]
+
+        parts = [joint] * (width * length)
+        for i, column in enumerate(values):
+            parts[2 * i + 1::width] = column
+            if i + 1 < len(values):
+                parts[2 * i + 2::width] = [statics[i + 1]] * length
+
+        parts[0] = statics[0]
+        parts.append(statics[-1])
+        return ''.join(parts)
+
+    def __convert(self, column_expr, columns, length, strings_cache):
+        '把一个动态表达式作用于整列, 返回字符串的list'
+        kind, name, key = column_expr.kind, column_expr.name, column_expr.key
+        if name not in columns:
+            # 名字不是列, 例如全局的函数, 按一般的表达式处理
+            kind = None
+
+        if kind == 'attr' and not _is_scalar_column(columns[name]):
+            # None、True、list等值各自有不同的输出, 逐个调用attribute
+            return list(map(
+                functools.partial(attribute, key), _column_values(columns[name])
+            ))
+
+        if kind is not None:
+            strings = strings_cache.get(name)
+            if strings is None:
+                strings = strings_cache[name] = _column_strings(columns[name])
+
+            if kind == 'escape':
+                return _map_column(html_escape, strings)
+            elif kind == 'attr':
+                prefix = ' %s="' % key
+                return [
+                    prefix + s + '"'
+                    for s in _map_column(escape_attribute, strings)
+                ]
+            return strings
+
+        # 其他表达式: 以用到的名字为参数的函数, 逐行计算
+        # 不是列的名字从名字空间取值, 每一行都相同
+        if not length:
+            return []
+
+        args = []
+        has_column = False
+        for arg in column_expr.args:
+            if arg in columns:
+                args.append(columns[arg])
+                has_column = True
+            else:
+                args.append(itertools.repeat(self.__lookup(arg)))
+
+        if not has_column:
+            return [column_expr.function(*map(next, args))] * length
+
+        return list(map(column_expr.function, *args))
+
+    def __lookup(self, name):
+        '名字空间中的值, 和模板函数读取全局名字的顺序相同'
+        try:
+            return self.__globals[name]
+        except KeyError:
+            pass
+
+        namespace = self.__globals.get('__builtins__', builtins)
+        if not isinstance(namespace, dict):
+            namespace = vars(namespace)
+
+        try:
+            return namespace[name]
+        except KeyError:
+            raise NameError('name %r is not defined' % name) from None
+
+
+class _ColumnExpr(object):
+    '''
+        行模板中的一个动态表达式, 创建时完成解析和编译
+        kind, name, key: 可以整列转换时的形式, 见: _match_column_expr
+        args:            表达式读取的外部名字
+        function:        以args为参数计算表达式的函数
+    '''
+    __slots__ = ('kind', 'name', 'key', 'args', 'function')
+
+    def __init__(self, expr, namespace):
+        node = analysis.parse_expression(expr)
+        self.kind, self.name, self.key = _match_column_expr(node)
+        self.args = sorted(analysis.free_names(node))
+        self.function = eval(
+            'lambda %s: %s' % (', '.join(self.args), expr), namespace
+        )
+
+
+_STR_NAMES = ('str', '_str')
+_ESCAPE_NAMES = ('escape', '_escape')
+_ATTRIBUTE_NAMES = ('attribute', '_attribute')
+
+
+def _match_column_expr(node):
+    '''
+        识别可以整列转换的表达式
+            str(column)                 -> ('str', column, None)
+            escape(str(column))         -> ('escape', column, None)
+            attribute('key', column)    -> ('attr', column, 'key')
+        其他情况返回(None, None, None)
+        column是一个名字, 渲染时它是列才能整列转换
+    '''
+
+    def match_call(node, names, nargs=1):
+        if (
+            isinstance(node, ast.Call) and
+            isinstance(node.func, ast.Name) and
+            node.func.id in names and
+            len(node.args) == nargs and
+            not node.keywords
+        ):
+            return node.args
+
+    def match_column(node):
+        if isinstance(node, ast.Name):
+            return node.id
+
+    def match_str(node):
+        args = match_call(node, _STR_NAMES)
+        if args:
+            return match_column(args[0])
+
+    name = match_str(node)
+    if name:
+        return 'str', name, None
+
+    args = match_call(node, _ESCAPE_NAMES)
+    name = args and match_str(args[0])
+    if name:
+        return 'escape', name, None
+
+    args = match_call(node, _ATTRIBUTE_NAMES, 2)
+    if args and isinstance(args[0], ast.Constant):
+        name = match_column(args[1])
+        if name:
+            return 'attr', name, args[0].value
+
+    return None, None, None
+
+
+# 这些类型的属性值总是输出 key="str(value)"
+_SCALAR_TYPES = frozenset([str, int, float])
+
+
+def _column_values(column):
+    'NumPy数组先用tolist()一次转换成Python对象'
+    if numpy is not None and isinstance(column, numpy.ndarray):
+        return column.tolist()
+
+    return column
+
+
+def _column_strings(column):
+    '整列转换为字符串'
+    if numpy is not None and isinstance(column, numpy.ndarray) and \
+            column.dtype.kind == 'U':
+        return column.tolist()
+
+    return list(map(str, _column_values(column)))
+
+
+def _is_scalar_column(column):
+    '列中的值是否都是str、int、float(不包括bool)'
+    if numpy is not None and isinstance(column, numpy.ndarray):
+        return column.dtype.kind in 'iufU'
+
+    return set(map(type, column)) <= _SCALAR_TYPES
+
+
+# 拼接整列时使用的分隔符, 转义函数不会改变它
+_SEPARATOR = '\0'
+
+
+def _map_column(function, strings):
+    '''
+        对整列字符串做同一个转换
+        先用分隔符把整列拼成一个字符串, 只调用一次function, 再切分回来,
+        替换操作都在C层面对一个大字符串完成
+        值里本身含有分隔符时, 退回逐个转换
+    '''
+    if not strings:
+        return strings
+
+    joined = _SEPARATOR.join(strings)
+    if joined.count(_SEPARATOR) != len(strings) - 1:
+        return list(map(function, strings))
+
+    return function(joined).split(_SEPARATOR)
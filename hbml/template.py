@@ -0,0 +1,163 @@
+import itertools
+import threading
+
+from .sinks import BytearraySink, JoinSink, LimitedSink
+from .utils import chunked
+
+
+class Template(object):
+    '''
+        编译完成的模板
+        只保留渲染需要的Python函数
+        调试用的中间代码不常驻内存, 需要时再通过loader重新生成
+    '''
+    __slots__ = (
+        'function', 'encoding', 'batch_function', 'source_map', 'limits',
+        '__loader'
+    )
+
+    def __init__(self, function, loader=None, encoding=None,
+                 batch_function=None, source_map=None, limits=None):
+        self.function = function
+        self.encoding = encoding
+        self.batch_function = batch_function
+        self.source_map = source_map
+        # (最大输出长度, 最长渲染时间), 见: max_output_size选项
+        self.limits = limits
+        self.__loader = loader
+
+    def render(self, variables=None, output=None):
+        '''
+            渲染模板
+            如果提供了output, 结果写入output
+            否则返回渲染结果字符串
+            编译时指定了encoding的模板返回bytes
+            渲染出错时, 异常上会附加出错的模板位置, 见: hbml.source_map
+            超出编译时指定的输出大小或渲染时间时抛出RenderLimitError
+        '''
+        if variables is None:
+            variables = {}
+
+        try:
+            if self.limits is not None:
+                return self.__render_limited(variables, output)
+            elif output is not None:
+                self.function(output, **variables)
+            else:
+                return self.__render_pooled(variables)
+        except Exception as e:
+            self._annotate(e)
+            raise
+
+    def __render_pooled(self, variables):
+        '''
+            渲染到当前线程的池中的输出目标, 渲染结束后清空放回
+            生成的函数没有共享的可变状态, 输出目标又是线程自己的,
+            多个线程可以同时渲染同一个模板
+        '''
+        pool = _sink_pool(self.encoding)
+        if pool:
+            sink = pool.pop()
+        elif self.encoding:
+            sink = BytearraySink()
+        else:
+            sink = JoinSink()
+
+        try:
+            self.function(sink, **variables)
+            return sink.getvalue()
+        finally:
+            sink.clear()
+            if len(pool) < _SINK_POOL_MAX_SIZE:
+                pool.append(sink)
+
+    def __render_limited(self, variables, output):
+        sink = LimitedSink(
+            output, *self.limits, empty=b'' if self.encoding else ''
+        )
+        self.function(sink, **variables)
+        return sink.finish()
+
+    def render_many(self, records, executor=None, chunk_size=1000):
+        '''
+            对records中的每一组变量渲染一次, 返回结果列表
+            见: iter_render
+        '''
+        return list(self.iter_render(records, executor, chunk_size))
+
+    def iter_render(self, records, executor=None, chunk_size=1000):
+        '''
+            对records中的每一组变量渲染一次, 按顺序逐个产出结果
+
+            编译时指定了batch=True的模板, 对记录的循环在生成的代码内部
+            提供executor(例如ThreadPoolExecutor)时,
+            records按chunk_size分块后交给executor并行渲染
+            进程池需要能pickle的参数, 请使用hbml.render_many
+        '''
+        if executor is None:
+            return self._render_chunk(records)
+
+        # concurrent.futures会导入logging等模块, 只在用到时导入
+        import concurrent.futures
+
+        if isinstance(executor, concurrent.futures.ProcessPoolExecutor):
+            raise TypeError(
+                'compiled templates cannot be pickled, '
+                'use hbml.render_many() with a process pool'
+            )
+
+        results = executor.map(
+            self._render_chunk_list, chunked(records, chunk_size)
+        )
+        return itertools.chain.from_iterable(results)
+
+    def _render_chunk(self, records):
+        function = self.batch_function
+        if function is None:
+            return (self.render(variables) for variables in records)
+
+        # 变量都是批量渲染函数的局部变量, 多个线程同时渲染也互不影响
+        return self._annotate_errors(function(records))
+
+    def _annotate_errors(self, results):
+        try:
+            yield from results
+        except Exception as e:
+            self._annotate(e)
+            raise
+
+    def _annotate(self, error):
+        # 只在出错时才查行号映射, 正常渲染没有额外开销
+        if self.source_map is not None:
+            self.source_map.annotate(error)
+
+    def _render_chunk_list(self, records):
+        return list(self._render_chunk(records))
+
+    @property
+    def function_code(self):
+        '''
+            生成的Python源代码, 仅用于调试
+            每次访问都重新生成, 不缓存在模板对象上
+            没有loader时返回None
+        '''
+        if self.__loader is None:
+            return None
+
+        return self.__loader()
+
+
+# 每个线程自己的空闲输出目标, 省去每次渲染创建输出目标的开销
+# 模板中嵌套调用另一个模板的render时, 从池中取得的是另一个对象, 互不干扰
+_sink_local = threading.local()
+_SINK_POOL_MAX_SIZE = 4
+
+
+def _sink_pool(encoding):
+    '当前线程的空闲输出目标列表, str和bytes的输出各用一个'
+    try:
+        pools = _sink_local.pools
+    except AttributeError:
+        pools = _sink_local.pools = ([], [])
+
+    return pools[1] if encoding else pools[0]
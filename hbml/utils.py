@@ -1,11 +1,140 @@
-from functools import lru_cache
 import html
+import itertools
+import re
 
 
-def memoized_property(func):
-    'memoize property'
-    return property(lru_cache(maxsize=None)(func))
+class memoized_property(object):
+    '''
+        memoize property
+        结果缓存在实例自身的__dict__中, 随实例一起释放
+        使用__slots__的类需要声明名为 _memoized_<属性名> 的slot
+    '''
+    def __init__(self, func):
+        self.__func = func
+        self.__name = func.__name__
+        self.__slot_name = '_memoized_%s' % func.__name__
+        self.__doc__ = func.__doc__
 
+    def __set_name__(self, owner, name):
+        self.__name = name
+        self.__slot_name = '_memoized_%s' % name
 
-def html_escape(s):
-    return html.escape(s)
+    def __get__(self, instance, owner=None):
+        if instance is None:
+            return self
+
+        instance_dict = getattr(instance, '__dict__', None)
+        if instance_dict is not None:
+            # 非数据描述符: 写入__dict__之后,
+            # 再次访问直接命中实例属性, 不再经过__get__
+            value = instance_dict[self.__name] = self.__func(instance)
+            return value
+
+        try:
+            return getattr(instance, self.__slot_name)
+        except AttributeError:
+            value = self.__func(instance)
+            setattr(instance, self.__slot_name, value)
+            return value
+
+
+# 直接使用html.escape, 省去一层Python函数调用
+html_escape = html.escape
+
+
+def escape_attribute(text):
+    '''
+        转义双引号中的属性值
+        只需要&、"和<, 每个replace在值里没有这个字符时几乎没有开销
+    '''
+    return text.replace('&', '&amp;').replace('"', '&quot;').replace(
+        '<', '&lt;'
+    )
+
+
+# 不能出现在属性名中的字符: 空白、引号、>、/、=和控制字符
+# 见: https://html.spec.whatwg.org/multipage/syntax.html#attributes-2
+_INVALID_NAME_PATTERN = re.compile(r'[\s"\'>/=\x00-\x1f\x7f]')
+
+
+def _attribute_name(name):
+    '''
+        dict展开出的属性名和style的属性名来自渲染时的数据, 不能转义,
+        含有非法字符时抛出ValueError, 避免注入新的属性或者跳出标签
+    '''
+    name = str(name)
+    if _INVALID_NAME_PATTERN.search(name):
+        raise ValueError('invalid attribute name: %r' % name)
+
+    return name
+
+
+def attribute(key, value):
+    '''
+        一个属性的完整输出, 包括前面的空格
+            None, False           不输出这个属性
+            True                  只输出属性名
+            list, tuple           非空的元素用空格连接, 例如class=['a', 'b'],
+                                  没有非空的元素时不输出这个属性
+            class的dict           值为真的key, 例如class={'active': is_active}
+            style的dict           key:value;...
+            其他的dict            展开成多个属性, 例如data={'id': 1} -> data-id="1"
+        dict的key不是合法的属性名时抛出ValueError
+    '''
+    # 最常见的情况放在最前面: 不需要转义的字符串只做三次in检查
+    if type(value) is str:
+        if '&' in value or '"' in value or '<' in value:
+            value = escape_attribute(value)
+        return ' %s="%s"' % (key, value)
+
+    if value is None or value is False:
+        return ''
+
+    if value is True:
+        return ' ' + key
+
+    if isinstance(value, dict):
+        if key == 'class':
+            value = [k for k, v in value.items() if v]
+        elif key == 'style':
+            value = ';'.join(
+                '%s:%s' % (_attribute_name(k), v) for k, v in value.items()
+                if v is not None and v is not False
+            )
+        else:
+            return ''.join(
+                attribute('%s-%s' % (key, _attribute_name(k)), v)
+                for k, v in value.items()
+            )
+
+    if isinstance(value, (list, tuple)):
+        value = ' '.join(
+            str(v) for v in value
+            if v is not None and v is not False and v != ''
+        )
+        if not value:
+            return ''
+
+    return ' %s="%s"' % (key, escape_attribute(str(value)))
+
+
+def indent_text(text, prefix):
+    '''
+        给多行文本除第一行以外的每一行加上缩进
+        第一行的缩进由模板的静态部分负责
+    '''
+    if '\n' not in text:
+        return text
+
+    return text.replace('\n', '\n' + prefix)
+
+
+def chunked(iterable, size):
+    '把iterable按size个一组切分成多个list'
+    iterator = iter(iterable)
+    while True:
+        chunk = list(itertools.islice(iterator, size))
+        if not chunk:
+            return
+
+        yield chunk
@@ -0,0 +1,107 @@
+import unittest
+import hbml
+from hbml.utils import attribute
+
+
+class AttributeTestCase(unittest.TestCase):
+    def testEscape(self):
+        self.assertEqual(
+            '<a title="&lt;b> &amp; &quot;c&quot;">x</a>',
+            hbml.compile('%a(title = t) x', dict(t='<b> & "c"'))
+        )
+
+    def testNoneAndFalseOmitted(self):
+        self.assertEqual(
+            '<input></input>',
+            hbml.compile(
+                '%input(value = a, disabled = b)', dict(a=None, b=False)
+            )
+        )
+
+    def testTrueIsBare(self):
+        self.assertEqual(' disabled', attribute('disabled', True))
+        self.assertIn(
+            '<option selected>',
+            hbml.compile('%option(selected = s) x', dict(s=True))
+        )
+
+    def testNumber(self):
+        self.assertEqual(' colspan="2"', attribute('colspan', 2))
+        self.assertEqual(' x="1.5"', attribute('x', 1.5))
+
+    def testClassList(self):
+        self.assertEqual(
+            '<div class="a b"></div>',
+            hbml.compile('%div(class = c)', dict(c=['a', None, '', 'b']))
+        )
+
+    def testEmptyClassOmitted(self):
+        for value in ([], (), [None, ''], {'hidden': False}):
+            with self.subTest(value=value):
+                self.assertEqual('', attribute('class', value))
+        self.assertEqual(
+            '<div></div>', hbml.compile('%div(class = c)', dict(c=[]))
+        )
+
+    def testClassDict(self):
+        self.assertEqual(
+            ' class="active"',
+            attribute('class', {'active': True, 'hidden': False})
+        )
+
+    def testStyleDict(self):
+        self.assertEqual(
+            ' style="color:red;width:1px"',
+            attribute('style', {'color': 'red', 'width': '1px', 'x': None})
+        )
+
+    def testDataDict(self):
+        self.assertEqual(
+            '<div data-id="1" data-name="&quot;n&quot;"></div>',
+            hbml.compile('%div(data = d)', dict(d={'id': 1, 'name': '"n"'}))
+        )
+
+    def testInvalidDictKey(self):
+        for key in [
+            'x onmouseover=alert(1) y', 'a"><script>', "a'", 'a>', 'a/b',
+            'a=b', 'a\tb', 'a\x00',
+        ]:
+            with self.assertRaises(ValueError):
+                attribute('data', {key: 1})
+            with self.assertRaises(ValueError):
+                attribute('style', {key: 'red'})
+
+        with self.assertRaises(ValueError):
+            hbml.compile('%div(data = d)', dict(d={'x onclick=f() y': 1}))
+
+        # class的key在引号内的值里, 照常转义
+        self.assertEqual(
+            ' class="a&quot;b"', attribute('class', {'a"b': True})
+        )
+
+    def testConstant(self):
+        template = hbml.compile_template('%div(title = "a&b")', debug=True)
+        self.assertEqual('<div title="a&amp;b"></div>', template.render())
+        self.assertNotIn('attribute(', template.function_code)
+
+    def testLoop(self):
+        self.assertEqual(
+            '<i title="a"></i><i></i><i title="&lt;"></i>',
+            hbml.compile(
+                '- for t in items:\n'
+                '  %i(title = t)',
+                dict(items=['a', None, '<'])
+            )
+        )
+
+    def testSingleCall(self):
+        template = hbml.compile_template(
+            '%a(href = url, title = t) x', debug=True
+        )
+        self.assertEqual(
+            2, template.function_code.count('attribute(')
+        )
+
+
+if __name__ == '__main__':
+    unittest.main()
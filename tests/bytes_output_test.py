@@ -0,0 +1,76 @@
+import unittest
+import hbml
+from hbml import exceptions
+from hbml.sinks import BytearraySink, MemoryviewSink, BytearrayPool
+
+
+SOURCE = (
+    "%div(title=title)\n"
+    "  %h1 你好\n"
+    "  =% content"
+)
+
+
+class BytesOutputTestCase(unittest.TestCase):
+    def testRenderBytes(self):
+        self.assertEqual(
+            '<div title="标题"><h1>你好</h1>&lt;b&gt;</div>'.encode('utf-8'),
+            hbml.compile(
+                SOURCE,
+                dict(title='标题', content='<b>'),
+                encoding='utf-8'
+            )
+        )
+
+    def testOtherEncoding(self):
+        self.assertEqual(
+            '<div title="t"><h1>你好</h1>x</div>'.encode('gbk'),
+            hbml.compile(
+                SOURCE,
+                dict(title='t', content='x'),
+                encoding='gbk'
+            )
+        )
+
+    def testStaticFragmentsEncodedAtCompileTime(self):
+        template = hbml.compile_template(
+            '%h1 你好', encoding='utf-8', debug=True
+        )
+        self.assertIn(
+            repr('<h1>你好</h1>'.encode('utf-8')),
+            template.function_code
+        )
+
+    def testCallerBytearray(self):
+        buffer = bytearray(b'HTTP/1.1 200 OK\r\n\r\n')
+        template = hbml.compile_template(
+            '%p\n  = 1 + 1', encoding='utf-8'
+        )
+        template.render(None, BytearraySink(buffer))
+        self.assertEqual(b'HTTP/1.1 200 OK\r\n\r\n<p>2</p>', bytes(buffer))
+
+    def testMemoryviewSink(self):
+        template = hbml.compile_template('%p hello', encoding='utf-8')
+
+        storage = bytearray(64)
+        sink = MemoryviewSink(storage)
+        template.render(None, sink)
+        self.assertEqual(b'<p>hello</p>', bytes(sink.getbuffer()))
+
+        sink = MemoryviewSink(bytearray(4))
+        with self.assertRaises(exceptions.BufferOverflowError):
+            template.render(None, sink)
+
+    def testPool(self):
+        template = hbml.compile_template('%p\n  = n', encoding='utf-8')
+        pool = BytearrayPool()
+
+        with pool.sink() as sink:
+            template.render(dict(n=1), sink)
+            self.assertEqual(b'<p>1</p>', bytes(sink.getbuffer()))
+            first = sink
+
+        with pool.sink() as sink:
+            self.assertIs(first, sink)
+            template.render(dict(n=2), sink)
+            self.assertEqual(b'<p>2</p>', bytes(sink.getbuffer()))
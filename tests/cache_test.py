@@ -0,0 +1,197 @@
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import unittest
+from unittest import mock
+from hbml.cache import SharedCodeCache
+
+
+ROOT = os.path.dirname(os.path.dirname(os.path.realpath(__file__)))
+
+SOURCE = (
+    "%ul\n"
+    "  - for i in items:\n"
+    "    %li\n"
+    "      = i\n"
+)
+
+_WORKER = '''
+import sys
+from hbml.cache import SharedCodeCache
+cache = SharedCodeCache(sys.argv[1])
+template = cache.compile_template(%r)
+assert template.render(dict(items=[1])) == '<ul><li>1</li></ul>'
+print(cache.misses, 'ply.yacc' in sys.modules)
+''' % SOURCE
+
+
+class SharedCodeCacheTestCase(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def testCompileOnce(self):
+        with SharedCodeCache(self.directory) as cache:
+            template = cache.compile_template(SOURCE)
+            self.assertEqual(
+                '<ul><li>1</li><li>2</li></ul>',
+                template.render(dict(items=[1, 2]))
+            )
+            self.assertEqual((0, 1), (cache.hits, cache.misses))
+
+        with SharedCodeCache(self.directory) as cache:
+            template = cache.compile_template(SOURCE)
+            self.assertEqual(
+                '<ul><li>3</li></ul>', template.render(dict(items=[3]))
+            )
+            self.assertEqual((1, 0), (cache.hits, cache.misses))
+
+    def testOptionsInKey(self):
+        with SharedCodeCache(self.directory) as cache:
+            cache.compile_template(SOURCE)
+            template = cache.compile_template(SOURCE, encoding='utf-8')
+            self.assertEqual(2, cache.misses)
+            self.assertEqual(b'<ul></ul>', template.render(dict(items=[])))
+
+            # 模板名决定函数名, 不同的模板名各自编译
+            template = cache.compile_template(SOURCE, name='list.hbml')
+            self.assertEqual((0, 3), (cache.hits, cache.misses))
+            self.assertIn('list_hbml', template.function.__name__)
+
+            cache.compile_template(SOURCE, name='list.hbml', debug=True)
+            self.assertEqual(1, cache.hits)
+
+    def testUntrustedDirectory(self):
+        os.chmod(self.directory, 0o777)
+        with self.assertRaises(PermissionError):
+            SharedCodeCache(self.directory)
+
+        os.chmod(self.directory, 0o700)
+        with mock.patch('os.getuid', return_value=os.getuid() + 1):
+            with self.assertRaises(PermissionError):
+                SharedCodeCache(self.directory)
+
+    def testUntrustedFile(self):
+        with SharedCodeCache(self.directory) as cache:
+            path = cache.path
+        self.assertEqual(0o600, os.stat(path).st_mode & 0o777)
+
+        os.chmod(path, 0o666)
+        with self.assertRaises(PermissionError):
+            SharedCodeCache(self.directory)
+
+    def testVersionInKey(self):
+        with SharedCodeCache(self.directory) as cache:
+            cache.compile_template(SOURCE)
+
+        # 升级hbml之后不读旧版本生成的代码
+        with mock.patch('hbml.cache.version', '999'):
+            with SharedCodeCache(self.directory) as cache:
+                cache.compile_template(SOURCE)
+                self.assertEqual((0, 1), (cache.hits, cache.misses))
+
+        with mock.patch('hbml.cache.CODE_VERSION', 999):
+            with SharedCodeCache(self.directory) as cache:
+                cache.compile_template(SOURCE)
+                self.assertEqual((0, 1), (cache.hits, cache.misses))
+
+    def testThreads(self):
+        # 多个线程共用一个实例, 一边写入新的模板一边读取
+        cache = SharedCodeCache(self.directory)
+        barrier = threading.Barrier(8)
+        errors = []
+
+        def work(n):
+            try:
+                barrier.wait()
+                for i in range(20):
+                    template = cache.compile_template('%%p %d' % (i * n))
+                    self.assertEqual(
+                        '<p>%d</p>' % (i * n), template.render()
+                    )
+            except Exception as e:
+                errors.append(e)
+
+        threads = [
+            threading.Thread(target=work, args=(n,)) for n in range(8)
+        ]
+        try:
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        finally:
+            cache.close()
+
+        self.assertEqual([], errors)
+        self.assertEqual(160, cache.hits + cache.misses)
+
+    def testSeesOtherWriters(self):
+        reader = SharedCodeCache(self.directory)
+        writer = SharedCodeCache(self.directory)
+        try:
+            reader.compile_template('%p a')
+            writer.compile_template(SOURCE)
+            reader.compile_template(SOURCE)
+            self.assertEqual((1, 1), (reader.hits, reader.misses))
+        finally:
+            reader.close()
+            writer.close()
+
+    def testSourceMap(self):
+        with SharedCodeCache(self.directory) as cache:
+            cache.compile_template(SOURCE)
+
+        with SharedCodeCache(self.directory) as cache:
+            template = cache.compile_template(SOURCE, name='list.hbml')
+            with self.assertRaises(TypeError) as cm:
+                template.render(dict(items=None))
+
+        self.assertIn(
+            '  File "list.hbml", line 2, in template',
+            cm.exception.__notes__
+        )
+
+    def testTruncatedRecord(self):
+        with SharedCodeCache(self.directory) as cache:
+            cache.compile_template('%p a')
+            path = cache.path
+
+        # 写者写了一半就退出
+        with open(path, 'ab') as f:
+            f.write(b'\x01' * 30)
+
+        with SharedCodeCache(self.directory) as cache:
+            cache.compile_template(SOURCE)
+            cache.compile_template('%p a')
+            self.assertEqual((1, 1), (cache.hits, cache.misses))
+
+        with SharedCodeCache(self.directory) as cache:
+            cache.compile_template(SOURCE)
+            self.assertEqual((1, 0), (cache.hits, cache.misses))
+
+    def testProcesses(self):
+        env = dict(os.environ, PYTHONPATH=ROOT)
+        workers = [
+            subprocess.Popen(
+                [sys.executable, '-c', _WORKER, self.directory],
+                env=env, stdout=subprocess.PIPE, universal_newlines=True
+            )
+            for i in range(4)
+        ]
+        results = [worker.communicate()[0].split() for worker in workers]
+        self.assertEqual([0] * 4, [worker.returncode for worker in workers])
+
+        # 只有一个进程编译, 其他进程不需要加载ply
+        self.assertEqual(1, sum(int(misses) for misses, ply in results))
+        for misses, ply in results:
+            self.assertEqual(misses == '1', ply == 'True')
+
+
+if __name__ == '__main__':
+    unittest.main()
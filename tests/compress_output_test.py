@@ -24,3 +24,38 @@ class CompressOutputTest(unittest.TestCase):
                 compress_output=False
             )
         )
+
+    def testMultiLineValue(self):
+        self.assertEqual(
+            '<div>\n'
+            '  <p>\n'
+            '    hello\n'
+            '    world\n'
+            '  </p>\n'
+            '</div>\n',
+            hbml.compile(
+                (
+                    "%div\n"
+                    "  %p\n"
+                    "    = content"
+                ),
+                dict(content='hello\nworld'),
+                compress_output=False
+            )
+        )
+
+    def testStaticFragmentsMerged(self):
+        source = (
+            "%div\n"
+            "  %h1 hello\n"
+            "  %p\n"
+            "    = content"
+        )
+        compressed = hbml.compile_template(source, debug=True)
+        pretty = hbml.compile_template(
+            source, compress_output=False, debug=True
+        )
+        self.assertEqual(
+            compressed.function_code.count('_write('),
+            pretty.function_code.count('_write(')
+        )
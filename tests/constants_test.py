@@ -0,0 +1,226 @@
+import ast
+import unittest
+import hbml
+from hbml import analysis, exceptions
+from hbml.incremental import IncrementalCompiler
+
+
+SOURCE = (
+    "- if DEBUG:\n"
+    "  %p debug\n"
+    "- elif LOCALE == 'en' and x:\n"
+    "  %p en\n"
+    "- elif y:\n"
+    "  %p y\n"
+    "- else:\n"
+    "  %p other\n"
+)
+
+
+def _render(source, constants, variables=None):
+    return hbml.compile(source, variables, constants=constants)
+
+
+def _fold(source, **constants):
+    return ast.unparse(analysis.substitute_constants(
+        analysis.parse_expression(source), constants
+    ))
+
+
+class SubstituteConstantsTestCase(unittest.TestCase):
+    def testFold(self):
+        self.assertEqual('True', _fold('not DEBUG', DEBUG=False))
+        self.assertEqual('x', _fold('DEBUG or x', DEBUG=False))
+        self.assertEqual('False', _fold('DEBUG and x', DEBUG=False))
+        self.assertEqual('x and y', _fold('x and A and y', A=1))
+        self.assertEqual('True', _fold("L in ('en', 'fr')", L='en'))
+        self.assertEqual("'a'", _fold("'a' if F else 'b'", F=True))
+        self.assertEqual("'/x' + p", _fold('BASE + p', BASE='/x'))
+
+    def testScopes(self):
+        # lambda的参数和推导式的目标遮住同名的常量
+        self.assertEqual('[x for x in items]', _fold('[x for x in items]', x=5))
+        self.assertEqual(
+            '(lambda DEBUG: DEBUG)(3)',
+            _fold('(lambda DEBUG: DEBUG)(3)', DEBUG=False)
+        )
+        self.assertEqual(
+            "[(x, 'y') for x in 'ab']",
+            _fold('[(x, Y) for x in X]', X='ab', Y='y')
+        )
+        self.assertEqual(
+            "[x for x in 'ab']", _fold('[x for x in x]', x='ab')
+        )
+        self.assertEqual(
+            'lambda y=False: y', _fold('lambda y=DEBUG: y', DEBUG=False)
+        )
+
+    def testUnchanged(self):
+        node = analysis.parse_expression('x + 1')
+        self.assertIs(node, analysis.substitute_constants(node, {'y': 1}))
+
+
+class ConstantsTestCase(unittest.TestCase):
+    def testBranches(self):
+        variables = dict(x=1, y=1)
+        self.assertEqual(
+            '<p>debug</p>',
+            _render(SOURCE, dict(DEBUG=True, LOCALE='en'), variables)
+        )
+        self.assertEqual(
+            '<p>en</p>',
+            _render(SOURCE, dict(DEBUG=False, LOCALE='en'), variables)
+        )
+        self.assertEqual(
+            '<p>y</p>',
+            _render(SOURCE, dict(DEBUG=False, LOCALE='fr'), variables)
+        )
+        self.assertEqual(
+            '<p>other</p>',
+            _render(SOURCE, dict(DEBUG=False, LOCALE='fr'), dict(y=0))
+        )
+
+    def testDeadBranchRemoved(self):
+        template = hbml.compile_template(
+            SOURCE, debug=True, constants=dict(DEBUG=True, LOCALE='en')
+        )
+        self.assertNotIn('if', template.function_code)
+        self.assertNotIn('other', template.function_code)
+
+        template = hbml.compile_template(
+            SOURCE, debug=True, constants=dict(DEBUG=False, LOCALE='fr')
+        )
+        self.assertIn('if y:', template.function_code)
+        self.assertNotIn('debug', template.function_code)
+        self.assertNotIn('DEBUG', template.function_code)
+
+    def testEmptyBlock(self):
+        self.assertEqual(
+            '<ul></ul>',
+            _render(
+                '%ul\n  - for i in items:\n    - if DEBUG:\n      %li\n',
+                dict(DEBUG=False),
+                dict(items=[1, 2])
+            )
+        )
+
+    def testNested(self):
+        self.assertEqual(
+            '<div><b>1</b><b>2</b></div>',
+            _render(
+                '%div\n'
+                '  - for i in items:\n'
+                '    - if not DEBUG:\n'
+                '      %b\n'
+                '        = i\n'
+                '    - else:\n'
+                '      %i\n'
+                '        = i\n',
+                dict(DEBUG=False),
+                dict(items=[1, 2])
+            )
+        )
+
+    def testSubstituteOutput(self):
+        template = hbml.compile_template(
+            "%a(href=BASE + path, title=LOCALE)\n  = LOCALE.upper()",
+            debug=True, constants=dict(BASE='/x', LOCALE='en')
+        )
+        self.assertEqual(
+            '<a href="/x/p" title="en">EN</a>',
+            template.render(dict(path='/p'))
+        )
+        self.assertIn('title="en"', template.function_code)
+
+    def testLoopElse(self):
+        # 循环体最后的if在编译期选定了分支, 不影响循环的else
+        source = (
+            "- for i in items:\n"
+            "  - if DEBUG:\n"
+            "    %p d\n"
+            "- else:\n"
+            "  %p done\n"
+        )
+        for constants in [dict(DEBUG=True), dict(DEBUG=False)]:
+            self.assertEqual(
+                hbml.compile(source, dict(constants, items=[1])),
+                _render(source, constants, dict(items=[1]))
+            )
+        self.assertEqual(
+            '<p>d</p><p>done</p>',
+            _render(source, dict(DEBUG=True), dict(items=[1]))
+        )
+
+    def testTryElse(self):
+        source = (
+            "- try:\n"
+            "  - x = value\n"
+            "- except NameError:\n"
+            "  - if DEBUG:\n"
+            "    %p missing\n"
+            "- else:\n"
+            "  %p ok\n"
+        )
+        self.assertEqual(
+            '<p>ok</p>', _render(source, dict(DEBUG=True), dict(value=1))
+        )
+        self.assertEqual('<p>missing</p>', _render(source, dict(DEBUG=True)))
+
+    def testConstantInStatement(self):
+        self.assertEqual(
+            'en',
+            _render('- locale = LOCALE\n= locale', dict(LOCALE='en'))
+        )
+
+    def testShadowedByComprehension(self):
+        self.assertEqual('[1, 2]', hbml.compile(
+            '= [x for x in items]', dict(items=[1, 2]), constants=dict(x=5)
+        ))
+        self.assertEqual('3', hbml.compile(
+            '= (lambda DEBUG: DEBUG)(3)', constants=dict(DEBUG=False)
+        ))
+
+    def testAssignConstant(self):
+        for source in [
+            "- DEBUG = True\n- if DEBUG:\n  %p debug\n",
+            "- for DEBUG in (1, 2):\n  %p\n",
+            "= (DEBUG := True)\n",
+            "%p(title=[DEBUG := i for i in (1,)])\n",
+        ]:
+            with self.subTest(source=source):
+                with self.assertRaises(exceptions.TemplateSyntaxError) as cm:
+                    _render(source, dict(DEBUG=False))
+                self.assertEqual(1, cm.exception.lineno)
+
+        # 推导式的目标不是给常量赋值
+        self.assertEqual(
+            '[1, 2]', _render('- y = [x for x in (1, 2)]\n= y', dict(x=5))
+        )
+
+    def testOptionsKey(self):
+        a = hbml.compile_template('= 1', constants=dict(A=1, B=2))
+        b = hbml.compile_template('= 1', constants=dict(B=2, A=1))
+        c = hbml.compile_template('= 1', constants=dict(A=2, B=2))
+        self.assertEqual(a.function.__name__, b.function.__name__)
+        self.assertNotEqual(a.function.__name__, c.function.__name__)
+
+    def testInvalidConstant(self):
+        with self.assertRaises(exceptions.CompileError):
+            hbml.compile_template('= 1', constants=dict(A=[1]))
+
+    def testWithoutConstants(self):
+        self.assertEqual(
+            '<p>b</p>',
+            hbml.compile('- if False:\n  %p a\n- else:\n  %p b\n')
+        )
+
+    def testIncremental(self):
+        compiler = IncrementalCompiler(constants=dict(DEBUG=False))
+        template = compiler.compile(
+            "%h1\n- if DEBUG:\n  %p a\n- else:\n  %p b\n"
+        )
+        self.assertEqual('<h1></h1><p>b</p>', template.render())
+
+
+if __name__ == '__main__':
+    unittest.main()
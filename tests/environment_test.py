@@ -0,0 +1,94 @@
+import unittest
+import hbml
+from hbml import Environment
+from hbml.compiler import default_environment
+
+
+class EnvironmentTestCase(unittest.TestCase):
+    def testDeterministicName(self):
+        a = hbml.compile_template('%p = x', name='mail/en.hbml')
+        b = hbml.compile_template('%p = x', name='mail/en.hbml')
+        self.assertEqual(a.function.__name__, b.function.__name__)
+        self.assertTrue(
+            a.function.__name__.startswith('template_mail_en_hbml_')
+        )
+
+        c = hbml.compile_template('%p = y', name='mail/en.hbml')
+        self.assertNotEqual(a.function.__name__, c.function.__name__)
+
+        d = hbml.compile_template('%p = x', name='mail/en.hbml', minify=True)
+        self.assertNotEqual(a.function.__name__, d.function.__name__)
+
+    def testSharedNamespace(self):
+        env = Environment()
+        a = env.compile_template('%p\n  = x')
+        b = env.compile_template('%div\n  = y')
+        self.assertIs(a.function.__globals__, b.function.__globals__)
+        self.assertIs(a.function.__globals__, env.namespace())
+
+        # 模板函数不留在名字空间里
+        self.assertNotIn(a.function.__name__, env.namespace())
+
+        other = hbml.compile_template('%p\n  = x')
+        self.assertIs(
+            default_environment.namespace(), other.function.__globals__
+        )
+        self.assertIsNot(env.namespace(), other.function.__globals__)
+
+    def testSandboxNamespace(self):
+        env = Environment()
+        template = env.compile_template('= x', sandbox=True)
+        self.assertIs(env.namespace(True), template.function.__globals__)
+        self.assertIsNot(env.namespace(), env.namespace(True))
+
+    def testVariablesDoNotLeak(self):
+        template = hbml.compile_template('%p\n  = x')
+        self.assertEqual('<p>1</p>', template.render(dict(x=1)))
+        with self.assertRaises(NameError):
+            template.render()
+
+        self.assertNotIn('x', template.function.__globals__)
+
+    def testShadowBuiltin(self):
+        template = hbml.compile_template('%p\n  = id\n%p\n  = len("ab")')
+        self.assertEqual('<p>3</p><p>2</p>', template.render(dict(id=3)))
+        self.assertEqual(
+            '<p>3</p><p>5</p>',
+            template.render(dict(id=3, len=lambda s: 5))
+        )
+
+    def testAssignedVariable(self):
+        self.assertEqual(
+            '<p>2</p>',
+            hbml.compile('- x = x + 1\n%p\n  = x', dict(x=1))
+        )
+
+    def testMultipleStatements(self):
+        # 分号之后的语句读取的变量同样在函数开头绑定
+        self.assertEqual(
+            '<p>F</p>',
+            hbml.compile('- a = 1; b = foo\n%p\n  = b', dict(foo='F'))
+        )
+
+    def testBatchLocals(self):
+        template = hbml.compile_template('%p\n  = x', batch=True)
+        self.assertEqual(
+            ['<p>1</p>', '<p>2</p>'],
+            template.render_many([dict(x=1), dict(x=2)])
+        )
+        self.assertNotIn('x', template.function.__globals__)
+
+    def testCompileTemplateFile(self):
+        import os
+        path = os.path.join(
+            os.path.dirname(os.path.realpath(__file__)),
+            'templates', 'demo.hbml'
+        )
+        env = Environment()
+        template = env.compile_template_file(path)
+        self.assertIs(env.namespace(), template.function.__globals__)
+        self.assertIn('demo_hbml', template.function.__name__)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,174 @@
+import ast
+import unittest
+import hbml
+from hbml import analysis
+from hbml.exceptions import CompileError, TemplateSyntaxError
+from hbml.incremental import IncrementalCompiler
+
+
+class ExpressionCheckTestCase(unittest.TestCase):
+    def assertSyntaxErrorAt(self, lineno, source):
+        with self.assertRaises(TemplateSyntaxError) as cm:
+            hbml.compile_template(source)
+
+        self.assertEqual(lineno, cm.exception.lineno)
+        self.assertIn('line %d' % lineno, str(cm.exception))
+        return cm.exception
+
+    def testEchoSyntaxError(self):
+        error = self.assertSyntaxErrorAt(3, (
+            "%div\n"
+            "  %p\n"
+            "    = 1 +\n"
+        ))
+        self.assertEqual('1 +', error.text)
+
+    def testStatementSyntaxError(self):
+        self.assertSyntaxErrorAt(2, (
+            "%ul\n"
+            "  - for i in:\n"
+            "    %li\n"
+        ))
+
+    def testAttrSyntaxError(self):
+        self.assertSyntaxErrorAt(4, (
+            "%div\n"
+            "  %p hello\n"
+            "\n"
+            "  %a(href=url., title='x')\n"
+        ))
+
+    def testIsCompileError(self):
+        with self.assertRaises(CompileError):
+            hbml.compile_template('=% )')
+
+    def testMissingBlock(self):
+        self.assertSyntaxErrorAt(2, (
+            "%p hello\n"
+            "- if x:\n"
+        ))
+
+    def testClauses(self):
+        self.assertEqual(
+            '<p>b</p><p>done</p>',
+            hbml.compile(
+                "- try:\n"
+                "  - if x:\n"
+                "    %p a\n"
+                "  - elif y:\n"
+                "    %p b\n"
+                "  - else:\n"
+                "    %p c\n"
+                "- except ValueError:\n"
+                "  %p error\n"
+                "- finally:\n"
+                "  %p done\n",
+                dict(x=False, y=True)
+            )
+        )
+
+    def testSimpleStatement(self):
+        self.assertEqual(
+            '<p>3</p>',
+            hbml.compile("- x = 1 + 2\n%p\n  = x")
+        )
+
+    def testComment(self):
+        self.assertEqual(
+            '<p>a</p>', hbml.compile("%p\n  - # note\n  a\n")
+        )
+
+        # 注释不打断if/else, 条件在编译期确定时也一样
+        source = "- if DEBUG:\n  a\n- # note\n- else:\n  b\n"
+        self.assertEqual('a', hbml.compile(source, dict(DEBUG=True)))
+        self.assertEqual('a', hbml.compile(source, constants=dict(DEBUG=True)))
+        self.assertEqual(
+            'b', hbml.compile(source, constants=dict(DEBUG=False))
+        )
+
+        self.assertSyntaxErrorAt(1, "- # note\n  %p a\n")
+
+    def testIncrementalLineno(self):
+        compiler = IncrementalCompiler()
+        compiler.compile("%p a\n%div\n  %p b\n")
+
+        with self.assertRaises(TemplateSyntaxError) as cm:
+            compiler.compile("%p a\n%div\n  %p b\n%div\n  = [\n")
+
+        self.assertEqual(5, cm.exception.lineno)
+
+    def testConstantFolded(self):
+        template = hbml.compile_template(
+            "%a(href='/', title=\"1 < 2\")\n"
+            "  =% '<b>'\n"
+            "  = 42\n",
+            debug=True
+        )
+        self.assertEqual(
+            '<a href="/" title="1 &lt; 2">&lt;b&gt;42</a>',
+            template.render()
+        )
+        self.assertIn(
+            "_write('<a href=\"/\" title=\"1 &lt; 2\">&lt;b&gt;42</a>')",
+            template.function_code
+        )
+
+    def testConstantAttrEscape(self):
+        self.assertEqual(
+            '<div title="h&quot;"></div>',
+            hbml.compile(r'%div(title="h\"")')
+        )
+
+
+class AnalysisTestCase(unittest.TestCase):
+    def testFreeNames(self):
+        node = analysis.parse_expression(
+            ' [f(x) for x in items if x > limit] + (lambda y: y + z)(1)'
+        )
+        self.assertEqual(
+            frozenset(['f', 'items', 'limit', 'z']),
+            analysis.free_names(node)
+        )
+
+    def testIsConstant(self):
+        for expr in ("'a'", '-1', '1 + 2j', 'None', 'True'):
+            self.assertTrue(
+                analysis.is_constant(analysis.parse_expression(expr)), expr
+            )
+
+        for expr in ('x', '1, 2', '[1]', 'len("a")', "'%d' % 1"):
+            self.assertFalse(
+                analysis.is_constant(analysis.parse_expression(expr)), expr
+            )
+
+    def testIsPure(self):
+        for expr in ('a + b * 2', 'x if y else -z', '(a, [b], {c: 1})'):
+            self.assertTrue(
+                analysis.is_pure(analysis.parse_expression(expr)), expr
+            )
+
+        for expr in ('f(a)', 'a.b', 'a[0]', '(x := 1)'):
+            self.assertFalse(
+                analysis.is_pure(analysis.parse_expression(expr)), expr
+            )
+
+    def testParseStatement(self):
+        node, compound = analysis.parse_statement('for i in range(3):')
+        self.assertIsInstance(node, ast.For)
+        self.assertTrue(compound)
+
+        node, compound = analysis.parse_statement('x = 1')
+        self.assertIsInstance(node, ast.Assign)
+        self.assertFalse(compound)
+
+        node, compound = analysis.parse_statement('else:')
+        self.assertIsNone(node)
+        self.assertTrue(compound)
+
+        node, compound = analysis.parse_statement('# note')
+        self.assertIsNone(node)
+        self.assertFalse(compound)
+
+
+if __name__ == '__main__':
+    unittest.main()
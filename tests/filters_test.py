@@ -0,0 +1,106 @@
+import importlib.util
+import unittest
+import hbml
+from hbml import filters
+from hbml.exceptions import TemplateSyntaxError
+
+
+class FiltersTestCase(unittest.TestCase):
+    def tearDown(self):
+        for name in ('upper', 'counted', 'stamp'):
+            filters.registry.pop(name, None)
+
+    def testUnknownFilter(self):
+        with self.assertRaises(TemplateSyntaxError) as cm:
+            hbml.compile_template("%div\n  %p:nope\n    text\n")
+
+        self.assertEqual(2, cm.exception.lineno)
+        self.assertIn('nope', str(cm.exception))
+
+    def testCss(self):
+        self.assertEqual(
+            '<style>body{margin:0}a:hover,b>i{color:red}</style>',
+            hbml.compile(
+                "%style:css\n"
+                "  /* reset */\n"
+                "  body {\n"
+                "    margin:0;\n"
+                "  }\n"
+                "  a:hover, b > i {\n"
+                "    color:red;\n"
+                "  }\n"
+            )
+        )
+
+    def testJs(self):
+        self.assertEqual(
+            '<script>if (foo) {\nbar(1 + 5)\n}</script>',
+            hbml.compile(
+                "%script:js\n"
+                "  // call bar\n"
+                "  if (foo) {\n"
+                "\n"
+                "     bar(1 + 5)\n"
+                "  }\n"
+            )
+        )
+
+    def testCollapse(self):
+        self.assertEqual(
+            '<p>hbml is a simple templating language</p>',
+            hbml.compile(
+                "%p:collapse\n"
+                "  hbml is a simple\n"
+                "     templating   language\n"
+            )
+        )
+
+    def testStaticFilterEmbedded(self):
+        hbml.register_filter('upper', str.upper, static=True)
+        template = hbml.compile_template(
+            "%p:upper\n  hello\n", debug=True
+        )
+        self.assertEqual('<p>  HELLO</p>', template.render())
+        self.assertIn("'<p>  HELLO</p>'", template.function_code)
+
+    def testStaticResultCached(self):
+        calls = []
+
+        @hbml.register_filter('counted', static=True)
+        def counted(text):
+            calls.append(text)
+            return text.strip()
+
+        source = "%p:counted\n  same text\n"
+        self.assertEqual('<p>same text</p>', hbml.compile(source))
+        self.assertEqual(
+            '<h1>x</h1><p>same text</p>',
+            hbml.compile("%h1 x\n" + source)
+        )
+        self.assertEqual(1, len(calls))
+
+    def testRenderTimeFilter(self):
+        values = iter(['1', '2'])
+        hbml.register_filter('stamp', lambda text: text + next(values))
+        template = hbml.compile_template("%p:stamp\n  v")
+        self.assertEqual('<p>  v1</p>', template.render())
+        self.assertEqual('<p>  v2</p>', template.render())
+
+    @unittest.skipIf(
+        importlib.util.find_spec('markdown') is None,
+        'markdown is not installed'
+    )
+    def testMarkdown(self):
+        self.assertEqual(
+            '<div><h1>Title</h1>\n<p>some <em>text</em></p></div>',
+            hbml.compile(
+                "%div:markdown\n"
+                "  # Title\n"
+                "\n"
+                "  some *text*\n"
+            )
+        )
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,186 @@
+import unittest
+import hbml
+from hbml import analysis
+from hbml.compiler import CompileWrapper, _fill_options
+
+
+class Counted(object):
+    '每次读取value属性都计数'
+    def __init__(self, value):
+        self.reads = 0
+        self.__value = value
+
+    @property
+    def value(self):
+        self.reads += 1
+        return self.__value
+
+
+class User(object):
+    def __init__(self, name):
+        self.profile = Counted(name)
+
+
+def _code(source, **options):
+    options.setdefault('hoist_invariants', True)
+    return CompileWrapper(source, _fill_options(options)).generate()[1]
+
+
+def _render(source, variables, **options):
+    return hbml.compile(source, variables, hoist_invariants=True, **options)
+
+
+class AttributeChainsTestCase(unittest.TestCase):
+    def _chains(self, source):
+        return [
+            chain for chain, root, depth in
+            analysis.attribute_chains(analysis.parse_expression(source))
+        ]
+
+    def testChains(self):
+        self.assertEqual(['a.b.c'], self._chains('a.b.c'))
+        self.assertEqual(['a.b', 'x.y'], self._chains('a.b().c + x.y'))
+        self.assertEqual(['x.y'], self._chains('a.b if x.y else c.d'))
+        self.assertEqual(['a.b'], self._chains('a.b or c.d'))
+        self.assertEqual([], self._chains('[u.name for u in users]'))
+        self.assertEqual([], self._chains('f(x)[0].y'))
+
+    def testAssignedNames(self):
+        node, compound = analysis.parse_statement('for a, (b, c) in x:')
+        self.assertEqual({'a', 'b', 'c'}, analysis.assigned_names(node))
+        node, compound = analysis.parse_statement('y = (z := 1)')
+        self.assertEqual({'y', 'z'}, analysis.assigned_names(node))
+        self.assertEqual(frozenset(), analysis.assigned_names(None))
+
+
+class HoistTestCase(unittest.TestCase):
+    def testHoisted(self):
+        source = (
+            '- for item in items:\n'
+            '  %p(title=user.profile.value)\n'
+            '    = user.profile.value\n'
+        )
+        user = User('Tom')
+        items = range(10)
+        self.assertEqual(
+            hbml.compile(source, dict(user=User('Tom'), items=items)),
+            _render(source, dict(user=user, items=items))
+        )
+        # 每次迭代两次, 提出去之后整个循环只读取一次
+        self.assertEqual(1, user.profile.reads)
+        self.assertIn('_hoisted_0 = user.profile.value', _code(source))
+
+    def testDisabledByDefault(self):
+        source = '- for i in items:\n  = user.profile.value\n'
+        self.assertNotIn('_hoisted_', _code(source, hoist_invariants=False))
+
+    def testLocalHelpers(self):
+        # 只开启hoist_invariants时, 循环体也使用绑定为局部变量的内置函数
+        source = '- for i in items:\n  %p(title=i)\n    = i\n    =% i\n'
+        code = _code(source, optimize_loops=False)
+        for line in ('_str = str', '_escape = escape', '_attribute = attribute'):
+            self.assertIn(line, code)
+        self.assertIn('_attribute(', code)
+        self.assertIn('_escape(_str(i))', code)
+        self.assertEqual(
+            '<p title="1&lt;">1<1&lt;</p>',
+            _render(source, dict(items=['1<']), optimize_loops=False)
+        )
+
+        code = _code(source, hoist_invariants=False)
+        self.assertNotIn('_str = str', code)
+
+    def testEmptyLoop(self):
+        source = '- for item in items:\n  = user.profile.value\n'
+        self.assertEqual('', _render(source, dict(user=None, items=[])))
+
+    def testConditional(self):
+        source = (
+            '- for item in items:\n'
+            '  - if user:\n'
+            '    = user.profile.value\n'
+            '  = user.profile.value if user else item\n'
+        )
+        self.assertNotIn('_hoisted_', _code(source))
+        self.assertEqual('12', _render(source, dict(user=None, items=[1, 2])))
+
+    def testAfterBreak(self):
+        source = (
+            '- for item in items:\n'
+            '  - if item:\n'
+            '    - break\n'
+            '  = user.profile.value\n'
+        )
+        self.assertNotIn('_hoisted_', _code(source))
+
+    def testAssignedInLoop(self):
+        source = (
+            '- for item in items:\n'
+            '  = item.profile.value\n'
+            '  = user.profile.value\n'
+            '  - if item:\n'
+            '    - user = item\n'
+        )
+        self.assertNotIn('_hoisted_', _code(source))
+
+        users = [User('a'), User('b')]
+        self.assertEqual('aabb', _render(
+            '- for user in users:\n'
+            '  = user.profile.value\n'
+            '  = user.profile.value\n',
+            dict(users=users)
+        ))
+
+    def testSingleAccess(self):
+        source = '- for item in items:\n  = user.name\n'
+        self.assertNotIn('_hoisted_', _code(source))
+
+    def testComprehension(self):
+        source = (
+            '- for item in items:\n'
+            '  = user.profile.value\n'
+            '  = [user.profile.value for user in others]\n'
+        )
+        code = _code(source)
+        self.assertIn('for user in others', code)
+        self.assertEqual("a['b']", _render(source, dict(
+            user=User('a'), others=[User('b')], items=[1]
+        )))
+
+    def testNestedLoops(self):
+        source = (
+            '%table\n'
+            '  - for row in rows:\n'
+            '    %tr\n'
+            '      - for cell in row:\n'
+            '        %td\n'
+            '          = site.config.value\n'
+            '          = cell\n'
+        )
+
+        class Site(object):
+            config = Counted('#')
+
+        site = Site()
+        self.assertEqual(
+            '<table><tr><td>#1</td><td>#2</td></tr><tr></tr></table>',
+            _render(source, dict(site=site, rows=[[1, 2], []]))
+        )
+        self.assertEqual(1, Site.config.reads)
+
+    def testConstants(self):
+        source = '- for i in items:\n  = CONFIG.upper() + user.profile.value\n'
+        self.assertEqual('XaXa', _render(
+            source, dict(user=User('a'), items=[1, 2]),
+            constants=dict(CONFIG='x')
+        ))
+
+    def testSandbox(self):
+        source = '- for i in items:\n  = user.profile.value\n'
+        self.assertEqual('aa', _render(
+            source, dict(user=User('a'), items=[1, 2]), sandbox=True
+        ))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,163 @@
+import gettext
+import unittest
+import hbml
+from hbml import exceptions
+from hbml.i18n import (
+    LocalizedTemplate, extract_messages, format_pot, message_text
+)
+
+
+SOURCE = (
+    "%div\n"
+    "  Hello world\n"
+    "  %p Welcome back\n"
+    "  %a(title=_('Home'), href='/') Home\n"
+    "  = _('Bye')\n"
+    "  - title = _('Title')\n"
+    "  = title\n"
+    "  42\n"
+    "  %p:plain\n"
+    "    not translated\n"
+)
+
+GERMAN = {
+    'Hello world': 'Hallo Welt',
+    'Welcome back': 'Willkommen',
+    'Home': 'Startseite',
+    'Bye': 'Tschüss',
+    'Title': 'Titel',
+}
+
+
+class Translations(gettext.NullTranslations):
+    def __init__(self, catalog):
+        super().__init__()
+        self.catalog = catalog
+        self.lookups = 0
+
+    def gettext(self, message):
+        self.lookups += 1
+        return self.catalog.get(message, message)
+
+
+class ExtractTestCase(unittest.TestCase):
+    def testExtract(self):
+        self.assertEqual([
+            (2, 'Hello world'),
+            (3, 'Welcome back'),
+            (4, 'Home'),
+            (4, 'Home'),
+            (5, 'Bye'),
+            (6, 'Title'),
+        ], extract_messages(SOURCE))
+
+    def testComment(self):
+        self.assertEqual([], extract_messages("- # _('note')\n"))
+
+    def testMessageText(self):
+        self.assertEqual('Hello', message_text('  Hello '))
+        self.assertIsNone(message_text(' 42 | '))
+
+    def testFormatPot(self):
+        pot = format_pot([
+            ('a.hbml', 1, 'Hello'),
+            ('b.hbml', 3, 'Hello'),
+            ('b.hbml', 4, 'Say "hi"\n'),
+        ])
+        self.assertIn(
+            '#: a.hbml:1 b.hbml:3\nmsgid "Hello"\nmsgstr ""\n', pot
+        )
+        self.assertIn('msgid "Say \\"hi\\"\\n"\n', pot)
+        self.assertTrue(pot.startswith('msgid ""\nmsgstr ""\n'))
+
+
+class TranslationsOptionTestCase(unittest.TestCase):
+    def testInlined(self):
+        self.assertEqual(
+            '<div>Hallo Welt<p>Willkommen</p>'
+            '<a title="Startseite" href="/">Startseite</a>'
+            'TschüssTitel42<p>    not translated</p></div>',
+            hbml.compile(SOURCE, translations=GERMAN)
+        )
+
+    def testMissingTranslation(self):
+        # 没有译文时输出原文, 不在渲染时调用 _
+        self.assertEqual(
+            '<p>Bye</p>', hbml.compile("%p\n  = _('Bye')\n", translations={})
+        )
+
+    def testStatic(self):
+        from hbml.compiler import CompileWrapper, _fill_options
+        code = CompileWrapper(
+            SOURCE, _fill_options(dict(translations=GERMAN))
+        ).generate()[1]
+        self.assertNotIn("_(", code)
+        self.assertIn('Hallo Welt', code)
+
+    def testDynamicMessage(self):
+        self.assertEqual('<p>HELLO</p>', hbml.compile(
+            "%p\n  = _(word)\n", dict(_=str.upper, word='hello'),
+            translations=GERMAN
+        ))
+
+    def testWhitespace(self):
+        self.assertEqual(
+            '<p>\n  Hallo Welt\n</p>\n',
+            hbml.compile(
+                '%p\n  Hello world\n', translations=GERMAN,
+                compress_output=False
+            )
+        )
+
+    def testEscape(self):
+        self.assertEqual('a &lt;b&gt;', hbml.compile(
+            "=% _('x')\n", translations=dict(x='a <b>')
+        ))
+
+    def testSandbox(self):
+        self.assertEqual('Tschüss', hbml.compile(
+            "= _('Bye')\n", translations=GERMAN, sandbox=True
+        ))
+
+    def testInvalidTranslation(self):
+        with self.assertRaises(exceptions.CompileError):
+            hbml.compile_template('a', translations={'a': 1})
+
+
+class LocalizedTemplateTestCase(unittest.TestCase):
+    def testLocales(self):
+        template = LocalizedTemplate(SOURCE, {
+            'de': GERMAN, 'fr': {'Hello world': 'Bonjour'}
+        })
+        self.assertIn('Hallo Welt', template.render('de'))
+        self.assertIn('Bonjour', template.render('fr'))
+        self.assertIn('<p>Welcome back</p>', template.render('fr'))
+        self.assertIn('Hello world', template.render('en'))
+
+    def testCache(self):
+        template = LocalizedTemplate(SOURCE, {'de': GERMAN})
+        self.assertIs(template.template('de'), template.template('de'))
+
+        # 没有译文的语言共用原文的版本
+        self.assertIs(template.template('en'), template.template('ja'))
+        self.assertIsNot(template.template('de'), template.template('en'))
+
+    def testGettext(self):
+        translations = Translations(GERMAN)
+        template = LocalizedTemplate(SOURCE, {'de': translations})
+        self.assertIn('Hallo Welt', template.render('de'))
+
+        # 每条原文只在编译时查找一次, 渲染时不再查找
+        lookups = translations.lookups
+        self.assertEqual(5, lookups)
+        template.render('de')
+        self.assertEqual(lookups, translations.lookups)
+
+    def testCatalog(self):
+        template = LocalizedTemplate(SOURCE, {'de': {'Bye': 'Tschüss'}})
+        self.assertEqual({'Bye': 'Tschüss'}, template.catalog('de'))
+        self.assertEqual({}, template.catalog('en'))
+
+
+if __name__ == '__main__':
+    unittest.main()
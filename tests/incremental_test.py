@@ -0,0 +1,117 @@
+import os
+import unittest
+import hbml
+from hbml.incremental import IncrementalCompiler, split_blocks
+
+
+DIRPATH = os.path.join(
+    os.path.dirname(os.path.realpath(__file__)),
+    'templates'
+)
+
+
+SOURCE = (
+    "%h1 title\n"
+    "- if flag:\n"
+    "  %p yes\n"
+    "- else:\n"
+    "  %p no\n"
+    "%ul\n"
+    "  - for i in range(2):\n"
+    "    %li\n"
+    "      = i\n"
+)
+
+
+class SplitBlocksTestCase(unittest.TestCase):
+    def testSplit(self):
+        self.assertEqual(
+            [
+                "%h1 title\n",
+                "- if flag:\n  %p yes\n- else:\n  %p no\n",
+                "%ul\n  - for i in range(2):\n    %li\n      = i\n",
+            ],
+            split_blocks(SOURCE)
+        )
+
+    def testBlankLines(self):
+        self.assertEqual(
+            ["%div\n\n  %p\n", "%span\n"],
+            split_blocks("%div\n\n  %p\n%span\n")
+        )
+
+    def testMultilineAttributes(self):
+        # 属性列表之内换行后缩进为0的行不开始新的block
+        self.assertEqual(
+            ['%a(href="x",\ntitle="y") text\n', '%p\n'],
+            split_blocks('%a(href="x",\ntitle="y") text\n%p\n')
+        )
+
+    def testFilter(self):
+        self.assertEqual(
+            ["%p:plain\n  text\n\n", "%li a\n"],
+            split_blocks("%p:plain\n  text\n\n%li a\n")
+        )
+
+
+class IncrementalCompilerTestCase(unittest.TestCase):
+    def testSameAsFullCompile(self):
+        for filename in os.listdir(DIRPATH):
+            filename, extname = os.path.splitext(filename)
+            if extname != '.hbml':
+                continue
+
+            with open(os.path.join(DIRPATH, filename + '.hbml')) as f:
+                source = f.read()
+
+            for options in (
+                dict(compress_output=True),
+                dict(compress_output=False),
+                dict(minify=True),
+            ):
+                with self.subTest(filename=filename, **options):
+                    compiler = IncrementalCompiler(**options)
+                    self.assertEqual(
+                        hbml.compile(source, **options),
+                        compiler.compile(source).render()
+                    )
+
+    def testSameAsFullCompileAcrossBlocks(self):
+        for source, options in [
+            ('%a(href="x",\ntitle="y") text\n%p\n', {}),
+            ('%li a\n%li b\n', dict(minify=True)),
+            ('%p:plain\n  text\n\n%li a\n.x b\n', dict(minify=True)),
+        ]:
+            with self.subTest(source=source):
+                self.assertEqual(
+                    hbml.compile(source, **options),
+                    IncrementalCompiler(**options).compile(source).render()
+                )
+
+    def testNextSiblingChanged(self):
+        # minify时block之后的标签变了, 这个block也要重新编译
+        compiler = IncrementalCompiler(minify=True)
+        self.assertEqual(
+            '<li>a<li>b</li>', compiler.compile('%li a\n%li b\n').render()
+        )
+        self.assertEqual(
+            '<li>a</li><p>b</p>', compiler.compile('%li a\n%p b\n').render()
+        )
+        self.assertEqual(2, compiler.compiled_count)
+
+    def testOnlyChangedBlocksRecompiled(self):
+        compiler = IncrementalCompiler()
+        template = compiler.compile(SOURCE)
+        self.assertEqual(3, compiler.compiled_count)
+        self.assertEqual(
+            '<h1>title</h1><p>yes</p><ul><li>0</li><li>1</li></ul>',
+            template.render(dict(flag=True))
+        )
+
+        template = compiler.compile(SOURCE.replace('%p no', '%p nope'))
+        self.assertEqual(1, compiler.compiled_count)
+        self.assertEqual(2, compiler.reused_count)
+        self.assertEqual(
+            '<h1>title</h1><p>nope</p><ul><li>0</li><li>1</li></ul>',
+            template.render(dict(flag=False))
+        )
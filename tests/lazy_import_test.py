@@ -0,0 +1,63 @@
+import os
+import subprocess
+import sys
+import unittest
+from hbml.compiler import CompileWrapper, _fill_options
+
+
+ROOT = os.path.dirname(os.path.dirname(os.path.realpath(__file__)))
+
+LAZY_MODULES = ('ply', 'hbml.parser', 'hbml.lang_struct', 'markdown')
+
+
+def _run(code):
+    env = dict(os.environ, PYTHONPATH=ROOT)
+    return subprocess.check_output(
+        [sys.executable, '-c', code], env=env, universal_newlines=True
+    )
+
+
+class LazyImportTestCase(unittest.TestCase):
+    def loadedModules(self, code):
+        output = _run(
+            code + '\n'
+            'import sys\n'
+            'print(" ".join(sorted(sys.modules)))\n'
+        )
+        return output.split()
+
+    def assertNotLoaded(self, modules):
+        for name in modules:
+            for prefix in LAZY_MODULES:
+                self.assertFalse(
+                    name == prefix or name.startswith(prefix + '.'),
+                    '%s should not be imported' % name
+                )
+
+    def testImport(self):
+        self.assertNotLoaded(self.loadedModules('import hbml'))
+
+    def testRenderGeneratedCode(self):
+        function_name, function_code = CompileWrapper(
+            "%ul\n  - for i in range(2):\n    %li\n      = i\n",
+            _fill_options({})
+        ).generate()
+
+        modules = self.loadedModules(
+            'import hbml\n'
+            'from hbml.compiler import load_function\n'
+            'from hbml.template import Template\n'
+            'template = Template(load_function(%r, %r))\n'
+            'assert template.render() == "<ul><li>0</li><li>1</li></ul>"\n'
+            % (function_name, function_code)
+        )
+        self.assertNotLoaded(modules)
+
+    def testCompileLoadsParser(self):
+        modules = self.loadedModules('import hbml\nhbml.compile("%p")')
+        self.assertIn('ply.yacc', modules)
+        self.assertIn('hbml.lang_struct', modules)
+
+
+if __name__ == '__main__':
+    unittest.main()
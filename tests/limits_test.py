@@ -0,0 +1,127 @@
+import io
+import unittest
+import hbml
+from hbml import exceptions
+from hbml.sinks import LimitedSink
+
+
+LOOP = "%ul\n  - for i in items:\n    %li\n      = i\n"
+
+
+class LimitedSinkTestCase(unittest.TestCase):
+    def testCountOnCheck(self):
+        sink = LimitedSink(max_size=5)
+        sink.write('abc')
+        sink.write('de')
+        sink.check()
+        self.assertEqual((5, 2), (sink.size, sink.fragments))
+
+        sink.write('f')
+        with self.assertRaises(exceptions.RenderLimitError) as cm:
+            sink.check()
+        self.assertEqual('size', cm.exception.reason)
+        self.assertEqual(6, cm.exception.size)
+        self.assertEqual(3, cm.exception.fragments)
+
+    def testFinish(self):
+        sink = LimitedSink(max_size=5)
+        sink.write('abc')
+        sink.write('de')
+        self.assertEqual('abcde', sink.finish())
+        self.assertEqual((5, 2), (sink.size, sink.fragments))
+
+        sink.write('f')
+        with self.assertRaises(exceptions.RenderLimitError):
+            sink.finish()
+
+    def testForwardToTarget(self):
+        output = io.StringIO()
+        sink = LimitedSink(output, max_size=4)
+        sink.write('abcd')
+        self.assertEqual('abcd', output.getvalue())
+        with self.assertRaises(exceptions.RenderLimitError):
+            sink.write('e')
+        self.assertEqual('abcd', output.getvalue())
+
+    def testTime(self):
+        sink = LimitedSink(max_time=0)
+        with self.assertRaises(exceptions.RenderLimitError) as cm:
+            sink.check()
+        self.assertEqual('time', cm.exception.reason)
+
+
+class RenderLimitTestCase(unittest.TestCase):
+    def testWithinLimit(self):
+        template = hbml.compile_template(LOOP, max_output_size=1000)
+        self.assertEqual(
+            hbml.compile(LOOP, dict(items=range(3))),
+            template.render(dict(items=range(3)))
+        )
+
+    def testSizeLimitInLoop(self):
+        template = hbml.compile_template(LOOP, max_output_size=10000)
+        with self.assertRaises(exceptions.RenderLimitError) as cm:
+            template.render(dict(items=range(10 ** 9)))
+
+        error = cm.exception
+        self.assertEqual('size', error.reason)
+        self.assertGreater(error.size, 10000)
+        self.assertIn('line 2', error.__notes__[0])
+
+    def testSizeLimitWithoutLoop(self):
+        template = hbml.compile_template('= x', max_output_size=3)
+        with self.assertRaises(exceptions.RenderLimitError):
+            template.render(dict(x='abcd'))
+
+    def testTimeLimit(self):
+        template = hbml.compile_template(
+            '- while True:\n  - continue\n', max_render_time=0.05
+        )
+        with self.assertRaises(exceptions.RenderLimitError) as cm:
+            template.render()
+        self.assertEqual('time', cm.exception.reason)
+        self.assertGreaterEqual(cm.exception.elapsed, 0.05)
+
+    def testOutput(self):
+        template = hbml.compile_template(LOOP, max_output_size=20)
+        output = io.StringIO()
+        with self.assertRaises(exceptions.RenderLimitError):
+            template.render(dict(items=range(100)), output)
+        self.assertLessEqual(len(output.getvalue()), 20)
+
+    def testEncoding(self):
+        template = hbml.compile_template(
+            LOOP, encoding='utf-8', max_output_size=1000
+        )
+        self.assertEqual(
+            b'<ul><li>0</li></ul>', template.render(dict(items=[0]))
+        )
+
+    def testNoCheckWithoutLimits(self):
+        template = hbml.compile_template(LOOP, debug=True)
+        self.assertNotIn('_check', template.function_code)
+        self.assertNotIn('_ticks', template.function_code)
+
+    def testOutermostLoopOnly(self):
+        source = (
+            '- for row in rows:\n'
+            '  - for cell in row:\n'
+            '    %td\n'
+            '      = cell\n'
+        )
+        template = hbml.compile_template(
+            source, debug=True, max_output_size=1000
+        )
+        self.assertEqual(1, template.function_code.count('_ticks += 1'))
+        self.assertEqual(
+            hbml.compile(source, dict(rows=[[1, 2], [3]])),
+            template.render(dict(rows=[[1, 2], [3]]))
+        )
+
+    def testBatchNotSupported(self):
+        with self.assertRaises(exceptions.CompileError):
+            hbml.compile_template(LOOP, batch=True, max_render_time=1)
+
+
+if __name__ == '__main__':
+    unittest.main()
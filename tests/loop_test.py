@@ -0,0 +1,77 @@
+import os
+import unittest
+import hbml
+from hbml.sinks import JoinSink
+
+
+DIRPATH = os.path.join(
+    os.path.dirname(os.path.realpath(__file__)),
+    'templates'
+)
+
+
+SOURCE = (
+    "%ul\n"
+    "  - for i in range(3):\n"
+    "    %li(data-id = i)\n"
+    "      100%\n"
+    "      =% '<%d>' % i\n"
+)
+
+
+class LoopTestCase(unittest.TestCase):
+    def testOneWritePerIteration(self):
+        sink = JoinSink()
+        hbml.compile(SOURCE, output=sink, optimize_loops=True)
+        self.assertEqual(
+            [
+                '<ul>',
+                '<li data-id="0">100%&lt;0&gt;</li>',
+                '<li data-id="1">100%&lt;1&gt;</li>',
+                '<li data-id="2">100%&lt;2&gt;</li>',
+                '</ul>',
+            ],
+            sink.parts
+        )
+
+    def testBytes(self):
+        self.assertEqual(
+            hbml.compile(SOURCE, optimize_loops=True).encode('utf-8'),
+            hbml.compile(SOURCE, encoding='utf-8', optimize_loops=True)
+        )
+
+    def testNested(self):
+        source = (
+            "- for i in range(3):\n"
+            "  %p\n"
+            "    - if i % 2:\n"
+            "      = i\n"
+            "    - else:\n"
+            "      - for j in range(i):\n"
+            "        %b\n"
+            "          = j\n"
+        )
+        self.assertEqual(
+            '<p></p><p>1</p><p><b>0</b><b>1</b></p>',
+            hbml.compile(source, optimize_loops=True)
+        )
+
+    def testSameAsUnoptimized(self):
+        for filename in os.listdir(DIRPATH):
+            filename, extname = os.path.splitext(filename)
+            if extname != '.hbml':
+                continue
+
+            with open(os.path.join(DIRPATH, filename + '.hbml')) as f:
+                source = f.read()
+
+            for compress_output in (True, False):
+                with self.subTest(filename=filename, compress=compress_output):
+                    self.assertEqual(
+                        hbml.compile(source, compress_output=compress_output),
+                        hbml.compile(
+                            source,
+                            compress_output=compress_output,
+                            optimize_loops=True
+                        )
+                    )
@@ -0,0 +1,89 @@
+import gc
+import tracemalloc
+import unittest
+import weakref
+
+from hbml.utils import memoized_property
+from hbml.parser.parser import Parser
+from hbml import lang_struct
+
+
+class Foo(object):
+    def __init__(self, data):
+        self.data = data
+        self.call_count = 0
+
+    @memoized_property
+    def double(self):
+        self.call_count += 1
+        return self.data * 2
+
+
+class SlotFoo(object):
+    __slots__ = ('data', '_memoized_double')
+
+    def __init__(self, data):
+        self.data = data
+
+    @memoized_property
+    def double(self):
+        return self.data * 2
+
+
+class MemoizedPropertyTestCase(unittest.TestCase):
+    def testCache(self):
+        a = Foo(1)
+        self.assertEqual(2, a.double)
+        self.assertEqual(2, a.double)
+        self.assertEqual(1, a.call_count)
+
+        b = Foo(2)
+        self.assertEqual(4, b.double)
+        self.assertEqual(1, b.call_count)
+
+    def testSlots(self):
+        a = SlotFoo(3)
+        self.assertEqual(6, a.double)
+        a.data = 4
+        self.assertEqual(6, a.double)
+
+    def testReleaseWithInstance(self):
+        a = Foo(1)
+        a.double
+        ref = weakref.ref(a)
+        del a
+        gc.collect()
+        self.assertIsNone(ref())
+
+
+class SourceLeakTestCase(unittest.TestCase):
+    def testNoLeak(self):
+        parse_tree = Parser().parse(
+            "%p:plain\n"
+            "  hbml is a simple templating\n"
+            "  language writen by Python\n"
+        )
+        # :plain 过滤器下的子树
+        block = parse_tree[1][0][2]
+
+        def compile_many(count):
+            for i in range(count):
+                node = lang_struct.create(block)
+                node.source
+            return weakref.ref(node)
+
+        # 先预热一次, 排除首次调用带来的一次性分配
+        compile_many(1000)
+        gc.collect()
+
+        tracemalloc.start()
+        try:
+            before = tracemalloc.get_traced_memory()[0]
+            ref = compile_many(100000)
+            gc.collect()
+            after = tracemalloc.get_traced_memory()[0]
+        finally:
+            tracemalloc.stop()
+
+        self.assertIsNone(ref())
+        self.assertLess(after - before, 64 * 1024)
@@ -0,0 +1,113 @@
+import os
+import unittest
+import hbml
+
+
+DIRPATH = os.path.join(
+    os.path.dirname(os.path.realpath(__file__)),
+    'templates'
+)
+
+
+def _minify(source, variables=None):
+    return hbml.compile(source, variables, minify=True)
+
+
+class MinifyTestCase(unittest.TestCase):
+    def testCollapseWhitespace(self):
+        self.assertEqual(
+            '<p> hbml is a simple templating language</p>',
+            _minify(
+                "%p:plain\n"
+                "  hbml is a simple\n"
+                "     templating   language\n"
+            )
+        )
+
+    def testPreserveWhitespace(self):
+        self.assertEqual(
+            '<pre>  a\n    b</pre>',
+            _minify("%pre:plain\n  a\n    b\n")
+        )
+
+    def testUnquotedAttributes(self):
+        self.assertEqual(
+            '<a href=/index.html title="a b" data-x="1" data-y=2></a>',
+            _minify(
+                "%a(href='/index.html', title='a b', data-x=x, data-y=2)",
+                dict(x=1)
+            )
+        )
+
+    def testBooleanAttributes(self):
+        self.assertEqual(
+            '<input checked disabled required value=on>',
+            _minify(
+                "%input(checked=True, disabled='disabled', required='',"
+                " value='on')/"
+            )
+        )
+
+    def testOptionalEndTags(self):
+        self.assertEqual(
+            '<ul><li>a<li>b<li>c</ul><p>x</p>',
+            _minify(
+                "%ul\n"
+                "  %li a\n"
+                "  %li b\n"
+                "  %li c\n"
+                "%p x\n"
+            )
+        )
+
+    def testEndTagKeptBeforeText(self):
+        self.assertEqual(
+            '<ul><li>a</li>text</ul>',
+            _minify("%ul\n  %li a\n  text\n")
+        )
+
+    def testEndTagKeptInLoop(self):
+        self.assertEqual(
+            '<ul><li>0</li><li>1</li><p>x</p></ul>',
+            _minify(
+                "%ul\n"
+                "  - for i in range(2):\n"
+                "    %li\n"
+                "      = i\n"
+                "  %p x\n"
+            )
+        )
+
+    def testTable(self):
+        self.assertEqual(
+            '<table><tr><th>a<td>1<tr><th>b<td>2</table>',
+            _minify(
+                "%table\n"
+                "  %tr\n"
+                "    %th a\n"
+                "    %td 1\n"
+                "  %tr\n"
+                "    %th b\n"
+                "    %td 2\n"
+            )
+        )
+
+    def testDocument(self):
+        with open(os.path.join(DIRPATH, 'demo.hbml')) as f:
+            html = _minify(f.read())
+
+        self.assertTrue(html.startswith(
+            '<html lang=en><head><title>hbml page</title>'
+        ))
+        self.assertIn('</script><body><h1>', html)
+        self.assertTrue(html.endswith('</p></div>'))
+
+    def testImpliesCompressOutput(self):
+        self.assertEqual(
+            '<div><p>a</p></div>',
+            hbml.compile("%div\n  %p a\n", minify=True, compress_output=False)
+        )
+
+
+if __name__ == '__main__':
+    unittest.main()
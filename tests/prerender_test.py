@@ -0,0 +1,199 @@
+import concurrent.futures
+import io
+import json
+import os
+import shutil
+import tempfile
+import unittest
+from contextlib import redirect_stdout
+from hbml import prerender
+from hbml.prerender import Page, Prerenderer
+
+
+LIST_SOURCE = (
+    "%ul\n"
+    "  - for i in items:\n"
+    "    %li\n"
+    "      = i\n"
+)
+
+TITLE_SOURCE = "%h1\n  = title\n"
+
+
+class PrerenderTestCase(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.output = os.path.join(self.directory, 'public')
+        self.list_template = self.__write('list.hbml', LIST_SOURCE)
+        self.title_template = self.__write('title.hbml', TITLE_SOURCE)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def __write(self, name, source):
+        path = os.path.join(self.directory, name)
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(source)
+        return path
+
+    def __read(self, path):
+        with open(os.path.join(self.output, path), encoding='utf-8') as f:
+            return f.read()
+
+    def __pages(self, items=(1, 2), title='Home', **extra):
+        return [
+            Page('list.html', self.list_template, dict(items=list(items))),
+            Page('docs/index.html', self.title_template, dict(
+                title=title, **extra
+            )),
+        ]
+
+    def testRender(self):
+        renderer = Prerenderer(self.output)
+        self.assertEqual(2, renderer.render(self.__pages()))
+        self.assertEqual('<ul><li>1</li><li>2</li></ul>', self.__read(
+            'list.html'
+        ))
+        self.assertEqual('<h1>Home</h1>', self.__read('docs/index.html'))
+
+        # 只有输出文件和清单, 没有留下临时文件
+        self.assertEqual(
+            ['.hbml-prerender.json', 'docs', 'list.html'],
+            sorted(os.listdir(self.output))
+        )
+
+    def testSkipUnchanged(self):
+        Prerenderer(self.output).render(self.__pages())
+
+        renderer = Prerenderer(self.output)
+        self.assertEqual(0, renderer.render(self.__pages()))
+        self.assertEqual(['list.html', 'docs/index.html'], renderer.skipped)
+
+    def testChangedVariable(self):
+        Prerenderer(self.output).render(self.__pages())
+
+        renderer = Prerenderer(self.output)
+        renderer.render(self.__pages(title='Docs'))
+        self.assertEqual(['docs/index.html'], renderer.rendered)
+        self.assertEqual('<h1>Docs</h1>', self.__read('docs/index.html'))
+
+    def testUnusedVariable(self):
+        Prerenderer(self.output).render(self.__pages())
+
+        # 模板没有读取的变量不是依赖
+        renderer = Prerenderer(self.output)
+        self.assertEqual(0, renderer.render(self.__pages(unused=1)))
+
+    def testChangedTemplate(self):
+        Prerenderer(self.output).render(self.__pages())
+        self.__write('title.hbml', '%h2\n  = title\n')
+
+        renderer = Prerenderer(self.output)
+        renderer.render(self.__pages())
+        self.assertEqual(['docs/index.html'], renderer.rendered)
+        self.assertEqual('<h2>Home</h2>', self.__read('docs/index.html'))
+
+    def testChangedOptions(self):
+        Prerenderer(self.output).render(self.__pages())
+        self.assertEqual(2, Prerenderer(
+            self.output, compress_output=False
+        ).render(self.__pages()))
+
+    def testMissingOutput(self):
+        Prerenderer(self.output).render(self.__pages())
+        os.remove(os.path.join(self.output, 'list.html'))
+
+        renderer = Prerenderer(self.output)
+        renderer.render(self.__pages())
+        self.assertEqual(['list.html'], renderer.rendered)
+
+    def testForce(self):
+        Prerenderer(self.output).render(self.__pages())
+        self.assertEqual(
+            2, Prerenderer(self.output).render(self.__pages(), force=True)
+        )
+
+    def testUnserializableVariable(self):
+        pages = [Page('a.html', self.title_template, dict(title=lambda: 0))]
+        Prerenderer(self.output).render(pages)
+        self.assertEqual(1, Prerenderer(self.output).render(pages))
+
+    def testPathOutsideDirectory(self):
+        for path in ['../a.html', '/tmp/a.html', '.']:
+            with self.assertRaises(ValueError):
+                Prerenderer(self.output).render([
+                    Page(path, self.title_template)
+                ])
+
+    def testFailure(self):
+        bad_template = self.__write('bad.hbml', '= 1 / 0\n')
+        pages = self.__pages() + [Page('bad.html', bad_template)]
+
+        with self.assertRaises(ZeroDivisionError):
+            Prerenderer(self.output).render(pages)
+
+        # 失败之前完成的页面已经记入清单
+        renderer = Prerenderer(self.output)
+        self.assertEqual(0, renderer.render(self.__pages()))
+
+    def testProcessPool(self):
+        pages = [
+            Page('%d.html' % i, self.list_template, dict(items=[i]))
+            for i in range(10)
+        ]
+        with concurrent.futures.ProcessPoolExecutor(2) as executor:
+            renderer = Prerenderer(self.output)
+            self.assertEqual(10, renderer.render(pages, executor))
+
+        self.assertEqual('<ul><li>7</li></ul>', self.__read('7.html'))
+        self.assertEqual(0, Prerenderer(self.output).render(pages))
+
+    def testEncoding(self):
+        pages = [Page('a.html', self.title_template, dict(title='中'))]
+        Prerenderer(self.output, encoding='utf-8').render(pages)
+        self.assertEqual('<h1>中</h1>', self.__read('a.html'))
+
+    def testMain(self):
+        with open(os.path.join(self.directory, 'items.json'), 'w') as f:
+            json.dump(dict(items=[3]), f)
+
+        site = os.path.join(self.directory, 'site.json')
+        with open(site, 'w') as f:
+            json.dump(dict(output='public', pages=[
+                dict(path='list.html', template='list.hbml',
+                     variables='items.json'),
+                dict(path='title.html', template='title.hbml',
+                     variables=dict(title='T')),
+            ]), f)
+
+        output = io.StringIO()
+        with redirect_stdout(output):
+            self.assertEqual(0, prerender.main([site, '--jobs', '1']))
+            prerender.main([site, '--jobs', '1'])
+        self.assertEqual(
+            'rendered 2, skipped 0\nrendered 0, skipped 2\n',
+            output.getvalue()
+        )
+        self.assertEqual('<ul><li>3</li></ul>', self.__read('list.html'))
+
+
+class WriteAtomicTestCase(unittest.TestCase):
+    def testKeepMode(self):
+        directory = tempfile.mkdtemp()
+        try:
+            path = os.path.join(directory, 'a.txt')
+            prerender.write_atomic(path, b'1')
+            self.assertEqual(0o644, os.stat(path).st_mode & 0o777)
+
+            os.chmod(path, 0o600)
+            prerender.write_atomic(path, b'2')
+            self.assertEqual(0o600, os.stat(path).st_mode & 0o777)
+            with open(path, 'rb') as f:
+                self.assertEqual(b'2', f.read())
+            self.assertEqual(['a.txt'], os.listdir(directory))
+        finally:
+            shutil.rmtree(directory)
+
+
+if __name__ == '__main__':
+    unittest.main()
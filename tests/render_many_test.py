@@ -0,0 +1,92 @@
+import concurrent.futures
+import types
+import unittest
+import hbml
+
+
+SOURCE = (
+    ".card(data-id = id)\n"
+    "  %h2\n"
+    "    =% name\n"
+    "  %p hello"
+)
+
+RECORDS = [dict(id=i, name='<%d>' % i) for i in range(50)]
+
+
+def _expected(encoding=None):
+    return [hbml.compile(SOURCE, r, encoding=encoding) for r in RECORDS]
+
+
+class RenderManyTestCase(unittest.TestCase):
+    def testBatch(self):
+        template = hbml.compile_template(SOURCE, batch=True)
+        self.assertIsNotNone(template.batch_function)
+        self.assertEqual(_expected(), template.render_many(RECORDS))
+
+    def testDifferentKeys(self):
+        # 记录里没有的变量不能沿用上一条记录的值
+        template = hbml.compile_template(
+            "%p\n"
+            "  - if 'title' in dir():\n"
+            "    = title\n"
+            "  - else:\n"
+            "    untitled\n",
+            batch=True
+        )
+        self.assertEqual(
+            ['<p>a</p>', '<p>untitled</p>', '<p>b</p>'],
+            template.render_many([dict(title='a'), dict(), dict(title='b')])
+        )
+
+        template = hbml.compile_template('%p\n  = name', batch=True)
+        with self.assertRaises(NameError):
+            template.render_many([dict(name='a'), dict()])
+
+    def testInternalNames(self):
+        # 和生成的函数内部的名字无关, 模板变量可以叫records、buffer等
+        source = "- for r in records:\n  %p\n    = r\n= buffer + variables\n"
+        record = dict(records=[1, 2], buffer='a', variables='b')
+        self.assertEqual('<p>1</p><p>2</p>ab', hbml.compile(source, record))
+
+        template = hbml.compile_template(source, batch=True)
+        self.assertEqual(
+            ['<p>1</p><p>2</p>ab', '<p>3</p>cd'],
+            template.render_many([
+                record, dict(records=[3], buffer='c', variables='d')
+            ])
+        )
+
+    def testStream(self):
+        template = hbml.compile_template(SOURCE, batch=True)
+        stream = template.iter_render(iter(RECORDS))
+        self.assertIsInstance(stream, types.GeneratorType)
+        self.assertEqual(_expected(), list(stream))
+
+    def testWithoutBatchFunction(self):
+        template = hbml.compile_template(SOURCE)
+        self.assertIsNone(template.batch_function)
+        self.assertEqual(_expected(), template.render_many(RECORDS))
+
+    def testBytes(self):
+        template = hbml.compile_template(SOURCE, batch=True, encoding='utf-8')
+        self.assertEqual(_expected('utf-8'), template.render_many(RECORDS))
+
+    def testThreadPool(self):
+        template = hbml.compile_template(SOURCE, batch=True)
+        with concurrent.futures.ThreadPoolExecutor(4) as executor:
+            self.assertEqual(
+                _expected(),
+                template.render_many(RECORDS, executor, chunk_size=7)
+            )
+
+    def testProcessPool(self):
+        with concurrent.futures.ProcessPoolExecutor(2) as executor:
+            self.assertEqual(
+                _expected(),
+                hbml.render_many(SOURCE, RECORDS, executor, chunk_size=20)
+            )
+
+            template = hbml.compile_template(SOURCE, batch=True)
+            with self.assertRaises(TypeError):
+                template.render_many(RECORDS, executor)
@@ -0,0 +1,123 @@
+import unittest
+import hbml
+from hbml.exceptions import SandboxError
+from hbml.incremental import IncrementalCompiler
+from hbml.table import compile_row
+
+
+class SandboxTestCase(unittest.TestCase):
+    def assertRejected(self, source):
+        with self.assertRaises(SandboxError):
+            hbml.compile_template(source, sandbox=True)
+
+        # 不开启sandbox时可以正常编译
+        hbml.compile_template(source)
+
+    def testRender(self):
+        self.assertEqual(
+            '<ul><li data-id="0">A</li><li data-id="1">B</li></ul>',
+            hbml.compile(
+                "%ul\n"
+                "  - for i, name in enumerate(names):\n"
+                "    %li(data-id = i)\n"
+                "      =% name.upper()\n",
+                dict(names=['a', 'b']),
+                sandbox=True
+            )
+        )
+
+    def testBatch(self):
+        self.assertEqual(
+            ['<p>1</p>', '<p>2</p>'],
+            hbml.render_many(
+                '%p\n  = len(x)', [dict(x='a'), dict(x='ab')], sandbox=True
+            )
+        )
+
+    def testUnsafeBuiltins(self):
+        self.assertRejected("= open('/etc/passwd').read()")
+        self.assertRejected("= getattr(x, 'y')")
+        self.assertRejected("%a(href = eval('1'))")
+        self.assertRejected("- exec('x = 1')")
+        self.assertRejected("= __import__('os')")
+
+    def testUnderscoreNames(self):
+        self.assertRejected("= ().__class__.__bases__")
+        self.assertRejected("= _write")
+        self.assertRejected("= [_x for _x in range(3)]")
+        self.assertRejected("= _buffer")
+        self.assertRejected("= _variables['x']")
+
+    def testMessageFunction(self):
+        self.assertEqual(
+            '<p>HELLO</p>',
+            hbml.compile(
+                '%p\n  = _("hello")', dict(_=str.upper), sandbox=True
+            )
+        )
+
+    def testUnsafeAttributes(self):
+        self.assertRejected("= '{0.__class__}'.format(x)")
+        self.assertRejected("= str.format_map('{x}', {})")
+        self.assertRejected("- for frame in gen.gi_frame.f_back:\n  %p")
+
+    def testUnsafeStatements(self):
+        self.assertRejected("- import os")
+        self.assertRejected("- from os import path")
+        self.assertRejected("- global x")
+        self.assertRejected("- def f():\n  %p")
+        self.assertRejected("- if x:\n  - return")
+
+    def testMultipleStatements(self):
+        # 分号之后的语句同样要检查
+        self.assertRejected("- a = 1; import os")
+        self.assertRejected(
+            "- a = 1; b = [c for c in ().__class__.__base__.__subclasses__()"
+            " if c.__name__=='catch_warnings'][0]()._module.__builtins__"
+            "['__import__']('os').getcwd()\n"
+            "%p\n"
+            "  = b\n"
+        )
+        self.assertEqual('<p>3</p>', hbml.compile(
+            "- a = 1; b = a + 2\n%p\n  = b\n", sandbox=True
+        ))
+
+    def testClauses(self):
+        self.assertRejected("- if x:\n  %p\n- elif eval('1'):\n  %p")
+        self.assertRejected("- try:\n  %p\n- except _E:\n  %p")
+        hbml.compile_template(
+            "- try:\n  %p\n- except KeyError as e:\n  = e.args",
+            sandbox=True
+        )
+
+    def testLineno(self):
+        with self.assertRaises(SandboxError) as cm:
+            hbml.compile_template("%div\n  %p\n    = vars()", sandbox=True)
+
+        self.assertEqual(3, cm.exception.lineno)
+
+    def testRestrictedBuiltinsAtRuntime(self):
+        template = hbml.compile_template("= x", sandbox=True)
+        self.assertEqual('1', template.render(dict(x=1)))
+
+        builtins = template.function.__globals__['__builtins__']
+        self.assertIn('len', builtins)
+        self.assertNotIn('open', builtins)
+        self.assertNotIn('__import__', builtins)
+
+    def testIncremental(self):
+        compiler = IncrementalCompiler(sandbox=True)
+        self.assertEqual('<p>3</p>', compiler.compile('%p\n  = 1 + 2').render())
+        with self.assertRaises(SandboxError):
+            compiler.compile('%p\n  = globals()')
+
+    def testTableRow(self):
+        with self.assertRaises(SandboxError):
+            compile_row("%td\n  = id(x)", sandbox=True)
+
+        row = compile_row("%td\n  = abs(x)", sandbox=True)
+        self.assertEqual('<td>1</td><td>2</td>', row.render(dict(x=[-1, 2])))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,80 @@
+import io
+import socket
+import unittest
+import hbml
+from hbml.sinks import (
+    OutputSink, JoinSink, BufferedFileSink, SocketSink, CountingSink,
+    DiscardSink
+)
+
+
+SOURCE = (
+    "%ul\n"
+    "  - for i in range(3):\n"
+    "    %li\n"
+    "      = i"
+)
+RESULT = '<ul><li>0</li><li>1</li><li>2</li></ul>'
+
+
+class CountingFile(io.StringIO):
+    def __init__(self):
+        super().__init__()
+        self.write_count = 0
+
+    def write(self, s):
+        self.write_count += 1
+        return super().write(s)
+
+
+class SinksTestCase(unittest.TestCase):
+    def testJoinSink(self):
+        sink = JoinSink()
+        hbml.compile(SOURCE, output=sink)
+        self.assertEqual(RESULT, sink.getvalue())
+
+    def testBufferedFileSink(self):
+        f = CountingFile()
+        with BufferedFileSink(f, flush_size=16) as sink:
+            hbml.compile(SOURCE, output=sink)
+
+        self.assertEqual(RESULT, f.getvalue())
+        self.assertLess(f.write_count, 5)
+
+    def testSocketSink(self):
+        a, b = socket.socketpair()
+        try:
+            with SocketSink(a, flush_size=8) as sink:
+                hbml.compile(SOURCE, output=sink, encoding='utf-8')
+            a.close()
+
+            data = b''
+            while True:
+                chunk = b.recv(4096)
+                if not chunk:
+                    break
+                data += chunk
+        finally:
+            a.close()
+            b.close()
+
+        self.assertEqual(RESULT.encode('utf-8'), data)
+
+    def testCountingSink(self):
+        target = JoinSink()
+        sink = CountingSink(target)
+        hbml.compile(SOURCE, output=sink)
+        self.assertEqual(len(RESULT), sink.size)
+        self.assertEqual(RESULT, target.getvalue())
+
+    def testDiscardSink(self):
+        self.assertIsNone(hbml.compile(SOURCE, output=DiscardSink()))
+
+    def testWriteRequired(self):
+        class NoWrite(OutputSink):
+            pass
+
+        with self.assertRaises(TypeError):
+            NoWrite()
+        with self.assertRaises(TypeError):
+            OutputSink()
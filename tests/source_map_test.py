@@ -0,0 +1,126 @@
+import gc
+import linecache
+import os
+import tempfile
+import unittest
+import hbml
+from hbml.exceptions import BufferOverflowError
+from hbml.incremental import IncrementalCompiler
+from hbml.sinks import MemoryviewSink
+
+
+SOURCE = (
+    "%ul\n"
+    "  - for user in users:\n"
+    "    %li(data-id = user['id'])\n"
+    "      =% user['name']\n"
+)
+
+
+class SourceMapTestCase(unittest.TestCase):
+    def assertNote(self, error, name, lineno, text=None):
+        expected = '  File "%s", line %d, in template' % (name, lineno)
+        if text:
+            expected += '\n    ' + text
+        self.assertIn(expected, getattr(error, '__notes__', []))
+
+    def testErrorKeepsType(self):
+        template = hbml.compile_template(SOURCE, name='users.hbml')
+        with self.assertRaises(KeyError) as cm:
+            template.render(dict(users=[dict(id=1)]))
+
+        self.assertNote(cm.exception, 'users.hbml', 4)
+
+    def testAttrLine(self):
+        template = hbml.compile_template(SOURCE, debug=True)
+        with self.assertRaises(KeyError) as cm:
+            template.render(dict(users=[dict(name='a')]))
+
+        self.assertNote(
+            cm.exception, '<template>', 3,
+            "%li(data-id = user['id'])"
+        )
+
+    def testStatementLine(self):
+        template = hbml.compile_template(SOURCE)
+        with self.assertRaises(TypeError) as cm:
+            template.render(dict(users=None))
+
+        self.assertNote(cm.exception, '<template>', 2)
+
+    def testMultiLineAttr(self):
+        template = hbml.compile_template(
+            "%div\n"
+            "  %a(title = 'x',\n"
+            "     href = 1 / 0)\n"
+        )
+        with self.assertRaises(ZeroDivisionError) as cm:
+            template.render()
+
+        self.assertNote(cm.exception, '<template>', 3)
+
+    def testFileTemplate(self):
+        with tempfile.NamedTemporaryFile(
+            'w', suffix='.hbml', delete=False, encoding='utf-8'
+        ) as f:
+            f.write("%div\n  %p\n    = missing\n")
+
+        try:
+            template = hbml.compile_template_file(f.name)
+            with self.assertRaises(NameError) as cm:
+                template.render()
+
+            self.assertNote(cm.exception, f.name, 3, '= missing')
+        finally:
+            os.remove(f.name)
+
+    def testBatch(self):
+        template = hbml.compile_template(SOURCE, batch=True)
+        with self.assertRaises(KeyError) as cm:
+            template.render_many([dict(users=[dict(id=1)])])
+
+        self.assertNote(cm.exception, '<template>', 4)
+
+    def testIncremental(self):
+        compiler = IncrementalCompiler()
+        compiler.compile('%h1 title\n' + SOURCE)
+        template = compiler.compile('%h1 title\n%p\n  = 1\n' + SOURCE)
+        self.assertEqual(2, compiler.reused_count)
+
+        with self.assertRaises(KeyError) as cm:
+            template.render(dict(users=[dict(id=1)]))
+
+        self.assertNote(cm.exception, '<template>', 7)
+
+    def testLinecache(self):
+        template = hbml.compile_template(SOURCE, debug=True)
+        filename = template.source_map.filename
+
+        lines = linecache.getlines(filename)
+        self.assertEqual(template.function_code.count('\n'), len(lines))
+
+        del template
+        gc.collect()
+        self.assertNotIn(filename, linecache.cache)
+
+    def testStaticLine(self):
+        template = hbml.compile_template(
+            '= x\n%div\n  %span long static text\n',
+            encoding='utf-8', debug=True
+        )
+        with self.assertRaises(BufferOverflowError) as cm:
+            template.render(dict(x=1), MemoryviewSink(bytearray(16)))
+
+        self.assertNote(cm.exception, '<template>', 2, '%div')
+
+    def testNoteOnce(self):
+        template = hbml.compile_template(SOURCE)
+        try:
+            template.render(dict(users=[dict(id=1)]))
+        except KeyError as e:
+            template.source_map.annotate(e)
+            self.assertEqual(1, len(e.__notes__))
+
+
+if __name__ == '__main__':
+    unittest.main()
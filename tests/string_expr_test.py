@@ -5,7 +5,7 @@ import hbml
 class StringExprTestCase(unittest.TestCase):
     def testStringEscape(self):
         self.assertEqual(
-            r'<a onclick="alert(\"hello\")">yoyo</a>',
+            '<a onclick="alert(&quot;hello&quot;)">yoyo</a>',
             hbml.compile(
                 r'%a(onclick="alert(\"hello\")") yoyo'
             )
@@ -13,7 +13,7 @@ class StringExprTestCase(unittest.TestCase):
 
     def testStringEscapeAtLast(self):
         self.assertEqual(
-            r'<div title="h\""></div>',
+            '<div title="h&quot;"></div>',
             hbml.compile(
                 r'%div(title="h\"")'
             )
@@ -21,7 +21,7 @@ class StringExprTestCase(unittest.TestCase):
 
     def testMultiAttrStringEscape(self):
         self.assertEqual(
-            r'<a onclick="alert(\"hello\")" href="#">yoyo</a>',
+            '<a onclick="alert(&quot;hello&quot;)" href="#">yoyo</a>',
             hbml.compile(
                 r'%a(onclick="alert(\"hello\")", href="#") yoyo'
             )
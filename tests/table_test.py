@@ -0,0 +1,106 @@
+import unittest
+import hbml
+from hbml import exceptions
+from hbml.table import compile_row
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+ROW = (
+    "%tr(data-id = id, class=\"row\")\n"
+    "  %td\n"
+    "    = id\n"
+    "  %td\n"
+    "    =% name\n"
+    "  %td\n"
+    "    = score * 2\n"
+)
+
+LOOP = "- for id, name, score in zip(ids, names, scores):\n" + ''.join(
+    '  ' + line + '\n' for line in ROW.splitlines()
+)
+
+IDS = [1, 2, 3]
+NAMES = ['a<b', 'c&d', 'e"f']
+SCORES = [1.5, 2, 3]
+
+
+def _expected():
+    return hbml.compile(LOOP, dict(ids=IDS, names=NAMES, scores=SCORES))
+
+
+class TableRowTestCase(unittest.TestCase):
+    def testLists(self):
+        row = compile_row(ROW)
+        self.assertEqual(
+            _expected(),
+            row.render(dict(id=IDS, name=NAMES, score=SCORES))
+        )
+
+    def testEmpty(self):
+        row = compile_row(ROW)
+        self.assertEqual('', row.render(dict(id=[], name=[], score=[])))
+
+    def testStaticOnly(self):
+        row = compile_row('%tr\n  %td x')
+        self.assertEqual(
+            '<tr><td>x</td></tr>' * 2,
+            row.render(dict(id=[1, 2]))
+        )
+
+    def testLengthMismatch(self):
+        row = compile_row(ROW)
+        with self.assertRaises(ValueError):
+            row.render(dict(id=[1], name=[], score=[]))
+
+    def testStatementNotAllowed(self):
+        with self.assertRaises(exceptions.CompileError):
+            compile_row('- if id:\n  %td')
+
+    @unittest.skipIf(numpy is None, 'numpy is not installed')
+    def testNumpy(self):
+        row = compile_row(ROW)
+        self.assertEqual(
+            _expected().replace('>4<', '>4.0<').replace('>6<', '>6.0<'),
+            row.render(dict(
+                id=numpy.array(IDS),
+                name=numpy.array(NAMES),
+                score=numpy.array(SCORES),
+            ))
+        )
+
+    def testGlobalNames(self):
+        # 不是列的名字从模板的名字空间读取, 列可以遮住同名的内置函数
+        row = compile_row('%td\n  = len(name) + max(id, 2)')
+        self.assertEqual(
+            '<td>5</td><td>5</td>',
+            row.render(dict(name=['abc', 'xy'], id=[1, 3]))
+        )
+        self.assertEqual(
+            '<td>2</td><td>3</td>',
+            compile_row('%td\n  = id + 1').render(dict(id=[1, 2]))
+        )
+        self.assertEqual('', compile_row('%td\n  = missing').render({}))
+        with self.assertRaises(NameError):
+            compile_row('%td\n  = missing + x').render(dict(x=[1]))
+
+    def testNamespaceUntouched(self):
+        from hbml.compiler import default_environment
+        compile_row('%td\n  = len(name)').render(dict(name=['a']))
+        self.assertNotIn('__builtins__', default_environment.namespace())
+
+    def testAttributeValues(self):
+        row = compile_row('%tr(title = title, hidden = hidden)')
+        titles = ['a"b', None, 'c&d']
+        flags = [True, False, None]
+        self.assertEqual(
+            hbml.compile(
+                '- for title, hidden in zip(titles, flags):\n'
+                '  %tr(title = title, hidden = hidden)',
+                dict(titles=titles, flags=flags)
+            ),
+            row.render(dict(title=titles, hidden=flags))
+        )
@@ -0,0 +1,47 @@
+import os
+import unittest
+import hbml
+from hbml.compiler import CompileWrapper, _fill_options
+
+
+DIRPATH = os.path.join(
+    os.path.dirname(os.path.realpath(__file__)),
+    'templates'
+)
+
+
+class TemplateObjectTestCase(unittest.TestCase):
+    def testRender(self):
+        template = hbml.compile_template(
+            "%div\n"
+            "  = content"
+        )
+        self.assertEqual(
+            '<div>hello</div>',
+            template.render(dict(content='hello'))
+        )
+        self.assertEqual(
+            '<div>yoyo</div>',
+            template.render(dict(content='yoyo'))
+        )
+
+    def testNoDebugCode(self):
+        template = hbml.compile_template('%div')
+        self.assertIsNone(template.function_code)
+        self.assertFalse(hasattr(template, '__dict__'))
+
+    def testDebugCode(self):
+        template = hbml.compile_template('%div', debug=True)
+        self.assertIn("'<div></div>'", template.function_code)
+
+    def testFileDebugCode(self):
+        template = hbml.compile_template_file(
+            os.path.join(DIRPATH, 'a_tag.hbml')
+        )
+        self.assertIn('def template_', template.function_code)
+
+    def testWrapperReleasesSource(self):
+        env = CompileWrapper('%div', _fill_options({}))
+        env.compile()
+        self.assertIsNone(env._CompileWrapper__source)
+        self.assertIsNone(env._CompileWrapper__buffer)
@@ -0,0 +1,79 @@
+import concurrent.futures
+import unittest
+import hbml
+
+
+TEMPLATE = (
+    "%ul(class=css)\n"
+    "  - for i in range(count):\n"
+    "    %li(data-i=i, title=name)\n"
+    "      = '%s-%d' % (name, i)\n"
+    "%p\n"
+    "  = inner.render(dict(name=name))\n"
+)
+
+INNER = "%b\n  = name.upper()\n"
+
+THREADS = 8
+RENDERS = 400
+
+
+def _variables(n):
+    return dict(
+        css=['list', 'odd' if n % 2 else None],
+        count=n % 7,
+        name='user%d' % n,
+        inner=hbml.compile_template(INNER),
+    )
+
+
+class ThreadSafetyTestCase(unittest.TestCase):
+    def assertSameOutput(self, template, executor):
+        records = [_variables(n) for n in range(RENDERS)]
+        expected = [template.render(variables) for variables in records]
+
+        results = list(executor.map(template.render, records))
+        self.assertEqual(expected, results)
+
+    def testRenderFromThreadPool(self):
+        template = hbml.compile_template(TEMPLATE)
+        with concurrent.futures.ThreadPoolExecutor(THREADS) as executor:
+            self.assertSameOutput(template, executor)
+
+    def testEncodedFromThreadPool(self):
+        template = hbml.compile_template(TEMPLATE, encoding='utf-8')
+        with concurrent.futures.ThreadPoolExecutor(THREADS) as executor:
+            self.assertSameOutput(template, executor)
+
+    def testRenderManyFromThreadPool(self):
+        template = hbml.compile_template(TEMPLATE, batch=True)
+        records = [_variables(n) for n in range(RENDERS)]
+        expected = [template.render(variables) for variables in records]
+
+        with concurrent.futures.ThreadPoolExecutor(THREADS) as executor:
+            self.assertEqual(
+                expected, template.render_many(records, executor, 16)
+            )
+
+    def testCompileFromThreadPool(self):
+        def compile_and_render(n):
+            template = hbml.compile_template(TEMPLATE, debug=True)
+            return template.render(_variables(n))
+
+        with concurrent.futures.ThreadPoolExecutor(THREADS) as executor:
+            results = list(executor.map(compile_and_render, range(64)))
+
+        template = hbml.compile_template(TEMPLATE)
+        self.assertEqual(
+            [template.render(_variables(n)) for n in range(64)], results
+        )
+
+    def testErrorReleasesSink(self):
+        template = hbml.compile_template('%p\n  = 1 / x')
+        with self.assertRaises(ZeroDivisionError):
+            template.render(dict(x=0))
+        self.assertEqual('<p>1.0</p>', template.render(dict(x=1)))
+
+
+if __name__ == '__main__':
+    unittest.main()